@@ -26,6 +26,7 @@ let ebenenHagenKWahl25: Map<string, EbeneConfigType> = new Map([
         virtual: true,
         virtualField: "BRIEFWAHLBEZIRK-NR",
         dissolve: true,
+        dissolvedGeoJson: "ebene_6.Briefwahlbezirke.geojson",
         uniqueId: true
     }],
     ["Wahlbezirke", {
@@ -34,10 +35,12 @@ let ebenenHagenKWahl25: Map<string, EbeneConfigType> = new Map([
         virtual: false,
         virtualField: "gebiet-ebene-2-nr",
         dissolve: true,
+        dissolvedGeoJson: "ebene_6.Wahlbezirke.geojson",
         uniqueId: true
     }],
     ["Stadtbezirke", {
         geoJson: "stadtbezirke.geojson",
+        geometrien: "../geometrien/ebenen/hagen-kommunal2025/stadtbezirke.json",
         keyProp: "BEZEICHNUN",
         uniqueId: true
     }],
@@ -58,6 +61,7 @@ let wahlTerminHagenKWahl25: WahlTerminConfigType = {
             stimmzettelPath: '05914000_14.09.2025_Wahl des Oberbürgermeisters - der Oberbürgermeisterin_Stimmzettel_V0-3_15.09.2025 090603 343.csv',
             //kandidatPath: "05914000_20200913_OB-Wahl_Kandidaten_V0-2_20201024T191200.csv",
             ergebnisPath: '05914000_14.09.2025_Wahl des Oberbürgermeisters - der Oberbürgermeisterin_Wahlergebnisse_V0-3_15.09.2025 090313 809.csv',
+            klassenPath: '05914000_14.09.2025_Wahl des Oberbürgermeisters - der Oberbürgermeisterin_Wahlergebnisse_V0-3_15.09.2025 090313 809.klassen.json',
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenHagenKWahl25
         },
@@ -69,6 +73,7 @@ let wahlTerminHagenKWahl25: WahlTerminConfigType = {
             stimmzettelPath: '05914000_14.09.2025_Wahl der Vertretung der Gemeinde (Rat der Stadt Hagen)_Stimmzettel_V0-3_15.09.2025 090603 343.csv',
             //kandidatPath: "05914000_20200913_Ratswahl_Kandidaten_V0-2_20201024T191200.csv",
             ergebnisPath: '05914000_14.09.2025_Wahl der Vertretung der Gemeinde (Rat der Stadt Hagen)_Wahlergebnisse_V0-3_15.09.2025 090313 809.csv',
+            klassenPath: '05914000_14.09.2025_Wahl der Vertretung der Gemeinde (Rat der Stadt Hagen)_Wahlergebnisse_V0-3_15.09.2025 090313 809.klassen.json',
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenHagenKWahl25
         },
@@ -80,6 +85,7 @@ let wahlTerminHagenKWahl25: WahlTerminConfigType = {
             stimmzettelPath: '05914000_14.09.2025_Wahl der Bezirksvertretung_Stimmzettel_V0-3_15.09.2025 090632 134.csv',
             //kandidatPath: "05914000_20200913_BV-Wahl_Kandidaten_V0-2_20201024T191200.csv",
             ergebnisPath: '05914000_14.09.2025_Wahl der Bezirksvertretung_Wahlergebnisse_V0-3_15.09.2025 090313 809.csv',
+            klassenPath: '05914000_14.09.2025_Wahl der Bezirksvertretung_Wahlergebnisse_V0-3_15.09.2025 090313 809.klassen.json',
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenHagenKWahl25
         },
@@ -90,6 +96,7 @@ let wahlTerminHagenKWahl25: WahlTerminConfigType = {
             gebietePath: '05914000_14.09.2025_Wahl der Vertretung der Verbandsversammlung des Regionalverbandes Ruhr (RVR)_Wahlgebietseinteilungen_V0-3_15.09.2025 090920 186.csv',
             stimmzettelPath: '05914000_14.09.2025_Wahl der Vertretung der Verbandsversammlung des Regionalverbandes Ruhr (RVR)_Stimmzettel_V0-3_15.09.2025 090632 209.csv',
             ergebnisPath: '05914000_14.09.2025_Wahl der Vertretung der Verbandsversammlung des Regionalverbandes Ruhr (RVR)_Wahlergebnisse_V0-3_15.09.2025 090313 809.csv',
+            klassenPath: '05914000_14.09.2025_Wahl der Vertretung der Verbandsversammlung des Regionalverbandes Ruhr (RVR)_Wahlergebnisse_V0-3_15.09.2025 090313 809.klassen.json',
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenHagenKWahl25
         },
@@ -109,6 +116,7 @@ let ebenenHagenKWahl20: Map<string, EbeneConfigType> = new Map([
     }],
     ["Stadtbezirk", {
         geoJson: "stadtbezirke.geojson",
+        geometrien: "../geometrien/ebenen/hagen-kommunal2020/stadtbezirke.json",
         keyProp: "Bez_Nr",
         uniqueId: true
     }],
@@ -200,6 +208,7 @@ let wahlTerminHagenBTW25: WahlTerminConfigType = {
                     virtual: true,
                     virtualField: "BRIEFWAHLBEZIRK-NR", // custom csv field
                     dissolve: true,
+                    dissolvedGeoJson: "05914000_23.02.2025_Wahl zum Deutschen Bundestag_ebene_6.Briefwahlbezirke.geojson",
                     uniqueId: true
                 }],
                 ["Kommunalwahlbezirke", {
@@ -245,10 +254,12 @@ let wahlTerminHagenBTW21: WahlTerminConfigType = {
                     virtual: true,
                     virtualField: "BRIEFWAHLBEZIRK-NR", // custom csv field
                     dissolve: true,
+                    dissolvedGeoJson: "05914000_26.09.2021_Wahl zum Deutschen Bundestag_ebene_6.Briefwahlbezirke.geojson",
                     uniqueId: true
                 }],
                 ["Stadtbezirke", {
                     geoJson: "stadtbezirke.geojson",
+                    geometrien: "../geometrien/ebenen/hagen-btw2021/stadtbezirke.json",
                     keyProp: "BEZEICHNUN",
                     uniqueId: true
                 }],
@@ -287,6 +298,7 @@ let wahlTerminHagenEU19: WahlTerminConfigType = {
                 }],
                 ["Stadtbezirk", {
                     geoJson: "stadtbezirke.geojson",
+                    geometrien: "../geometrien/ebenen/hagen-eu2019/stadtbezirke.json",
                     keyProp: "Bez_Nr",
                     uniqueId: true
                 }],
@@ -368,6 +380,7 @@ let wahlTerminGoettingenEURad24: WahlTerminConfigType = {
                     virtual: true,
                     virtualField: "BRIEFWAHLBEZIRK-NR", // custom csv field
                     dissolve: true,
+                    dissolvedGeoJson: "goettingen-wahlbezirke-filtered.Briefwahlbezirke.geojson",
                     uniqueId: true
                 }],
             ])
@@ -411,22 +424,22 @@ let wahlTerminGoettingenEURad24: WahlTerminConfigType = {
 
 let ebenenDuesseldorf: Map<string, EbeneConfigType> = new Map([
     ["Stimmbezirk", {
-        geoJson: "Stimmbezirke2020_neu_WGS84_EPSG4326.geojson",
+        geoJson: "Stimmbezirke2020_neu_WGS84_EPSG4326.1m.topojson",
         keyProp: "Stimmbezchar",
         uniqueId: true,
     }],
     ["Wahlbezirk", {
-        geoJson: "Kommunalwahlbezirke_WGS84_4326_Stand2020_B.geojson",
+        geoJson: "Kommunalwahlbezirke_WGS84_4326_Stand2020_B.1m.topojson",
         keyProp: "KommunalwahlbezirkFix", // zero padding to a length of 3!!!
         uniqueId: true,
     }],
     ["Stadtteil", {
-        geoJson: "Stadtteile_WGS84_4326.geojson",
+        geoJson: "Stadtteile_WGS84_4326.1m.topojson",
         keyProp: "Stadtteil",
         uniqueId: true,
     }],
     ["Stadtbezirk", {
-        geoJson: "Stadtbezirke_WGS84_4326.geojson",
+        geoJson: "Stadtbezirke_WGS84_4326.1m.topojson",
         keyProp: "STADTBEZIRK",
         uniqueId: true,
     }],
@@ -446,7 +459,9 @@ let wahlTerminDuesseldorfKWahl: WahlTerminConfigType = {
             gebietePath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Wahlgebietseinteilungen_V0-3_20200930T111111.csv",
             stimmzettelPath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Stimmzettel_V0-3_20200930T111111.csv",
             kandidatPath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Kandidaten_V0-3_20200930T111111.csv",
-            ergebnisPath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.csv",
+            ergebnisPath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.owdb",
+            klassenPath: "05111000_20200913_Oberbuergermeisterwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.klassen.json",
+            ebenenErgebnisse: true,
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenDuesseldorf
         },
@@ -457,7 +472,9 @@ let wahlTerminDuesseldorfKWahl: WahlTerminConfigType = {
             gebietePath: "05111000_20200913_Ratswahl-NRW_Wahlgebietseinteilungen_V0-3_20200930T111111.csv",
             stimmzettelPath: "05111000_20200913_Ratswahl-NRW_Stimmzettel_V0-3_20200930T111111.csv",
             kandidatPath: "05111000_20200913_Ratswahl-NRW_Kandidaten_V0-3_20200930T111111.csv",
-            ergebnisPath: "05111000_20200913_Ratswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.csv",
+            ergebnisPath: "05111000_20200913_Ratswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.owdb",
+            klassenPath: "05111000_20200913_Ratswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.klassen.json",
+            ebenenErgebnisse: true,
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenDuesseldorf
         },
@@ -468,7 +485,9 @@ let wahlTerminDuesseldorfKWahl: WahlTerminConfigType = {
             gebietePath: "05111000_20200913_Bezirksvertretungswahl-NRW_Wahlgebietseinteilungen_V0-3_20200930T111111.csv",
             stimmzettelPath: "05111000_20200913_Bezirksvertretungswahl-NRW_Stimmzettel_V0-3_20200930T111111.csv",
             kandidatPath: "05111000_20200913_Bezirksvertretungswahl-NRW_Kandidaten_V0-3_20200930T111111.csv",
-            ergebnisPath: "05111000_20200913_Bezirksvertretungswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.csv",
+            ergebnisPath: "05111000_20200913_Bezirksvertretungswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.owdb",
+            klassenPath: "05111000_20200913_Bezirksvertretungswahl-NRW_Wahlergebnisse_V0-3_20200930T111111.klassen.json",
+            ebenenErgebnisse: true,
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenDuesseldorf
         },
@@ -479,7 +498,9 @@ let wahlTerminDuesseldorfKWahl: WahlTerminConfigType = {
             gebietePath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Wahlgebietseinteilungen_V0-3_20200930T111111.csv",
             stimmzettelPath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Stimmzettel_V0-3_20200930T111111.csv",
             kandidatPath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Kandidaten_V0-3_20200930T111111.csv",
-            ergebnisPath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.csv",
+            ergebnisPath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.owdb",
+            klassenPath: "05111000_20200927_Oberbuergermeisterstichwahl-NRW_Wahlergebnisse_V0-3_20200930T111111.klassen.json",
+            ebenenErgebnisse: true,
             ergebnisType: ErgebnisKommunalwahlNRW,
             ebenen: ebenenDuesseldorf
         },
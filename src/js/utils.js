@@ -4,7 +4,6 @@
  * file, You can obtain one at https://mozilla.org/MPL/2.0/. */
  
 //@flow
-import ky from 'ky';
 
 import L from 'leaflet';
 import ErgebnisElement from './interface/wahl-ergebniselement';
@@ -14,9 +13,13 @@ import type { TemplateResult } from 'lit';
 import 'weightless/title';
 import 'weightless/dialog';
 import { showDialog } from 'weightless/dialog';
+import { fetchFile, normalizePath } from './wahl-lib/utils';
 
 /**
  * Fetch a GeoJSON file. If the same file was already loaded, get it without a new HTTP request.
+ * TopoJSON files (e. g. written by tools/geo/topologie.py) are converted to GeoJSON, Ebenen of the geometry store
+ * (tools/geo/geometriespeicher.py) are assembled from their packs. Files contained in the bundle registered for baseUrl
+ * are read from it (see {@link fetchFile}).
  *
  * @async
  * @param {string} geoJsonPath Path to the GeoJSON file
@@ -27,12 +30,88 @@ export async function fetchGeoJson(geoJsonPath: string, baseUrl: string): Promis
     if (!window.geoJsonMap) window.geoJsonMap = new Map();
     let saved = window.geoJsonMap.get(baseUrl+geoJsonPath);
     if (saved) return saved;
-    let r = await ky(geoJsonPath, { prefixUrl: baseUrl });
+    let r = await fetchFile(geoJsonPath, baseUrl);
     let json = await r.json();
+    if (json.type === "Topology") json = topologyToGeoJson(json);
+    else if (json.type === "Geometrien") json = await geometrienToGeoJson(json, geoJsonPath, baseUrl);
     window.geoJsonMap.set(baseUrl+geoJsonPath, json);
     return json;
 }
 
+/**
+ * Assemble a GeoJSON FeatureCollection from an Ebene of the geometry store. Each pack is fetched only once,
+ * also if it is shared by several Ebenen.
+ *
+ * @async
+ * @param {object} ebene Ebene of the geometry store ({type: "Geometrien", pakete, features})
+ * @param {string} ebenePath Path to the Ebene, the packs are relative to it
+ * @param {string} baseUrl Base URL for the path to the Ebene
+ * @returns {Promise<object>} Promise that resolves to GeoJSON FeatureCollection
+ */
+export async function geometrienToGeoJson(ebene: { [key: string]: any }, ebenePath: string, baseUrl: string): Promise<{ [key: string]: any }> {
+    if (!window.geometriePakete) window.geometriePakete = new Map();
+    let ordner = ebenePath.includes("/") ? ebenePath.slice(0, ebenePath.lastIndexOf("/") + 1) : "";
+    let pakete = await Promise.all(ebene.pakete.map(paket => {
+        let paketPath = normalizePath(ordner + paket) ?? paket;
+        let paketUrl = new URL(paketPath, new URL(baseUrl, window.location.href)).href;
+        let saved = window.geometriePakete.get(paketUrl);
+        if (!saved) {
+            saved = fetchFile(paketPath, baseUrl).then(r => r.json());
+            window.geometriePakete.set(paketUrl, saved);
+        }
+        return saved;
+    }));
+    return {
+        type: "FeatureCollection",
+        features: ebene.features.map(f => ({
+            type: "Feature",
+            properties: f.properties ?? {},
+            geometry: f.g ? pakete[f.g[0]][f.g[1]] : null
+        }))
+    };
+}
+
+/**
+ * Convert the first object of a (quantized) TopoJSON topology to a GeoJSON FeatureCollection.
+ * Only Polygon and MultiPolygon geometries are supported.
+ *
+ * @param {object} topology TopoJSON Topology object
+ * @returns {object} GeoJSON FeatureCollection
+ */
+export function topologyToGeoJson(topology: { [key: string]: any }): { [key: string]: any } {
+    let [sx, sy] = topology.transform?.scale ?? [1, 1];
+    let [tx, ty] = topology.transform?.translate ?? [0, 0];
+    let quantized = !!topology.transform;
+    let arcs = topology.arcs.map(arc => {
+        let x = 0, y = 0;
+        return arc.map(([dx, dy]) => {
+            if (quantized) { x += dx; y += dy; } else { x = dx; y = dy; }
+            return [x * sx + tx, y * sy + ty];
+        });
+    });
+    let ring = (arcIds) => {
+        let coords = [];
+        arcIds.forEach(i => {
+            let arc = i < 0 ? arcs[~i].slice().reverse() : arcs[i];
+            coords.push(...(coords.length ? arc.slice(1) : arc));
+        });
+        return coords;
+    };
+    let polygon = (rings) => rings.map(ring);
+    let object = Object.values(topology.objects)[0];
+    return {
+        type: "FeatureCollection",
+        features: object.geometries.map(g => ({
+            type: "Feature",
+            id: g.id,
+            properties: g.properties ?? {},
+            geometry: g.type === "Polygon" ? { type: "Polygon", coordinates: polygon(g.arcs) }
+                : g.type === "MultiPolygon" ? { type: "MultiPolygon", coordinates: g.arcs.map(polygon) }
+                    : null
+        }))
+    };
+}
+
 /* -------------------------------------------------------------------------- */
 /*                            Tangram interactivity                           */
 /* -------------------------------------------------------------------------- */
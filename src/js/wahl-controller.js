@@ -27,12 +27,14 @@ import 'weightless/card';
 import 'weightless/list-item';
 import 'weightless/progress-spinner';
 import { fetchGeoJson, newDialog, closeDialog } from './utils';
+import { registerBundle } from './wahl-lib/utils';
 
 import type { WahlConfigType, Stimmzettel, Ebene } from './wahl-lib/wahl';
 import type { ErgebnisAnalysisCollection, FieldDescription, DataTypeAndArgsType } from './wahl-lib/ergebnis';
 
 export type WahlTerminConfigType = {|
     baseUrl: string,
+    bundlePath?: string, // written by tools/bundle.py, relative to baseUrl; files not contained are loaded one by one
     name: string,
     wahlDatumStr: string,
     defaultCenter: [number, number],
@@ -101,6 +103,7 @@ export default class WahlController {
 
     /**
      * Create new {@link Wahl} objects from a Wahltermin config (group of elections).
+     * If the Wahltermin has a bundlePath, its files are read from the bundle (see {@link registerBundle}).
      * If there is only one Wahl object, it is going to be set as the active Wahl.
      * The Leaflet map view is set to the configured default center & zoom.
      *
@@ -111,6 +114,7 @@ export default class WahlController {
         if (!wahlTerminConfig) throw new TypeError("undefined wahlTerminConfig provided");
         this.activeWahl = undefined;
         this._wahlTerminConfig = wahlTerminConfig;
+        if (wahlTerminConfig.bundlePath) registerBundle(this.baseUrl, wahlTerminConfig.bundlePath);
         this._wahlen = new Map();
         for (let wahlConfig of this.wahlTerminConfig.wahlen) {
             if (this._wahlen.has(wahlConfig.name)) throw new Error(`duplicate wahl-name ${wahlConfig.name}!`);
@@ -217,6 +221,32 @@ export default class WahlController {
         }
     }
 
+    /**
+     * Jenks class bounds precomputed by tools/klassen.py for the active Ebene, property and data type.
+     * Only used if they were computed from the same data (no Stimmzettel filter, same amount of values). Like
+     * tools/klassen.py, only finite values count, Gebiete without data (NaN) are left out.
+     *
+     * @param {geostats} gs geostats object with the data series already set
+     * @param {number} binNum Amount of classes
+     * @returns {?Array<number>} Bounds like geostats getClassJenks would set them, undefined if not available.
+     */
+    precomputedBounds(gs: Object, binNum: number): ?Array<number> {
+        if (this.stimmzettelGebietFilter || binNum < 2) return;
+        let entry = this.activeWahl?.klassen
+            ?.[this.activeEbene?.bezeichnung]
+            ?.[this.activeProp?.propName]
+            ?.[this.activeDataType?.type?.id ?? ""]
+            ?.[this.activeDataType?.args?.[0] ?? ""];
+        let indices = entry?.jenks?.[binNum];
+        let values = gs.serie.filter(v => Number.isFinite(v));
+        if (!indices || entry.n !== values.length) return;
+        // indices refer to the sorted finite values
+        let sorted = values.sort((a, b) => a - b);
+        let bounds = [sorted[0], ...indices.map(i => sorted[i]), sorted[sorted.length - 1]];
+        if (bounds[0] === bounds[1]) bounds[0] = 0; // same as getClassJenks
+        return bounds;
+    }
+
     /**
      * Get data values, classes, colors for every district of the active {@link ErgebnisAnalysisCollection}.
      * For representing the data in bins on a choropleth map.
@@ -264,7 +294,11 @@ export default class WahlController {
         // console.log(gs.serie, _dataValues);
         // reduce bin amount in some cases to avoid errors
         let binNum = Math.min(Math.max(1, Math.min(Math.floor(_dataValues/2), defaultBinNum)), new Set(gs.serie).size);
-        gs.getClassJenks(binNum);
+        let precomputedBounds = this.precomputedBounds(gs, binNum);
+        if (precomputedBounds) {
+            gs.setBounds(precomputedBounds);
+            gs.setRanges();
+        } else gs.getClassJenks(binNum);
         let singleColor = (data.classColors?.size <= 1 && data.classColors.values().next().value) || defaultColor;
         let defaultRange = chroma.scale([chroma.mix(baseColor, singleColor, baseMixProportion), singleColor]).domain([gs.min(), gs.max()]).correctLightness().colors(binNum);
         let colorRanges = new Map();
@@ -394,7 +428,7 @@ export default class WahlController {
 
     /**
      * Loading the GeoJSON data is the responsibility of this and is not part of the data loading in {@link Wahl}.
-     * GeoJSON data is loaded for the currently active {@link Ebene}.
+     * GeoJSON data is loaded for the currently active {@link Ebene}, together with its prebuilt sums (see {@link Wahl#loadEbenenErgebnisData}).
      * Displays a dialog while the data is being loaded (unless another dialog already exists, e. g. on initial loading).
      *
      * @async
@@ -405,7 +439,11 @@ export default class WahlController {
         if (!this.activeEbene.config.geoJson) return;
         if (!(window.dialogRefs.length && window.dialogRefs.some((dialogRef) => { return dialogRef.overlay.open } ))) await this.loadDataDialog();
         try {
-            let result = await fetchGeoJson(this.activeEbene.config.geoJson, this.activeWahl.baseUrl);
+            // prebuilt sums of the Ebene (if configured) are fetched alongside, they have to be there before the ErgebnisAnalysisCollection is created
+            let [result] = await Promise.all([
+                fetchGeoJson(this.activeEbene.config.geometrien ?? this.activeEbene.config.dissolvedGeoJson ?? this.activeEbene.config.geoJson, this.activeWahl.baseUrl),
+                this.activeWahl.loadEbenenErgebnisData(this.activeEbene),
+            ]);
             return result;
         }
         catch (err) {
@@ -530,7 +568,7 @@ export default class WahlController {
                     return;
                 }
 
-                if (ebene.config.dissolve) {
+                if (ebene.config.dissolve && !ebene.config.dissolvedGeoJson) {
                     // dissolve ohne virtual.. geht auch?
                     let dissolveField = ebene.config.keyProp;
                     featureEach(geoJson, feature => {
@@ -280,3 +280,90 @@ export class ErgebnisAnalysis {
         };
     }
 }
+
+/**
+ * Prebuilt sums of one {@link Ebene} as written by tools/ebenenergebnisse.py (<ergebnisPath without extension>.<Ebene>.json).
+ * Values are arrays over the Gebiete of the file, null if there is no value.
+ * "spalten" skip missing values like {@link ErgebnisAnalysis#constantProp}, "summen" (arguments of calculated fields) and "gueltig"
+ * are null as soon as one Ergebnis of the Gebiet has no value, like the sums in {@link ErgebnisAnalysis#calculatedProp} and #collectedProp.
+ */
+export type EbenenErgebnisseType = {
+    gebiete: Array<string>,
+    gs?: Array<string>,
+    bezirke: Array<number>,
+    ergebnisse: Array<number>,
+    spalten: { [sourceName: string]: Array<?number> },
+    summen: { [sourceName: string]: Array<?number> },
+    stimmen: { [propName: string]: {| gueltig: Array<?number>, parteien: Array<string>, werte: Array<Array<?number>>, reihenfolge: Array<Array<number>> |} },
+};
+
+/**
+ * {@link ErgebnisAnalysis} of a {@link Gebiet} that takes its values from the prebuilt sums of tools/ebenenergebnisse.py instead of adding up the {@link Ergebnis} objects.
+ * The Ergebnis objects are still required, everything that needs single results (e. g. {@link ErgebnisAnalysisCollection#orderedAnyNameMap}) keeps using them.
+ * Only valid without a Stimmzettel filter, the sums are over all Bezirke of the Gebiet.
+ *
+ * @class VorabErgebnisAnalysis
+ * @augments {ErgebnisAnalysis}
+ */
+export class VorabErgebnisAnalysis extends ErgebnisAnalysis {
+    /**
+     * Creates an instance of VorabErgebnisAnalysis.
+     *
+     * @param {Array<?Ergebnis>} ergebnisse Array of optional Ergebnis objects of the Gebiet, see {@link ErgebnisAnalysis}
+     * @param {Function<Ergebnis>} ergebnisType Which class the Ergebnis objects should be an instance of
+     * @param {EbenenErgebnisseType} vorab Prebuilt sums of the Ebene
+     * @param {number} index Index of the Gebiet in the prebuilt arrays
+     */
+    constructor(ergebnisse: Array<?Ergebnis>, ergebnisType: Class<Ergebnis>, vorab: EbenenErgebnisseType, index: number) {
+        super(ergebnisse, ergebnisType);
+        Object.defineProperty(this, "vorab", { value: vorab });
+        Object.defineProperty(this, "index", { value: index });
+    }
+
+    /** @returns {number} Amount of Ergebnisse the sums are based on. */
+    get count(): number { return this.vorab.ergebnisse[this.index] }
+
+    /**
+     * Value of a result column summed up over the Gebiet.
+     *
+     * @param {string} propName Property name defined in {@link Ergebnis#constantProperties}
+     * @returns {number} Sum, NaN if there is no value
+     */
+    spalte(propName: string): number {
+        return this.vorab.spalten[this.ergebnisType.constantProperties[propName]]?.[this.index] ?? NaN;
+    }
+
+    /** @see ErgebnisAnalysis#constantProp */
+    constantProp(fieldDesc: ConstantFieldDescription): ResultDescription {
+        let value = this.spalte(fieldDesc.propName);
+        let rD = new ResultDescription();
+        Object.assign(rD, { value: isNaN(value) ? undefined : value, count: this.count, possibleCount: this.ergebnisse.length, fieldDesc: fieldDesc });
+        return rD;
+    }
+
+    /** @see ErgebnisAnalysis#calculatedProp */
+    calculatedProp(fieldDesc: CalculatedFieldDescription): ResultDescription {
+        // like the runtime sums: 0 for every argument without any Ergebnis, NaN if one of the Ergebnisse has no value
+        let summe = arg => this.vorab.summen[this.ergebnisType.constantProperties[arg]]?.[this.index] ?? NaN;
+        let calc = fieldDesc.fn(...fieldDesc.args.map(arg => this.count ? summe(arg) : 0));
+        let rD = new ResultDescription();
+        Object.assign(rD, { value: calc, count: this.count, possibleCount: this.ergebnisse.length, fieldDesc: fieldDesc });
+        return rD;
+    }
+
+    /** @see ErgebnisAnalysis#collectedProp */
+    collectedProp(fieldDesc: CollectedFieldDescription): CollectedResultDescription {
+        let stimmen = this.vorab.stimmen[fieldDesc.propName];
+        let total = stimmen.gueltig[this.index];
+        let rD = new CollectedResultDescription();
+        Object.assign(rD, {
+            value: this.count ? (total ?? NaN) : undefined,
+            // already sorted by average placement like in ErgebnisAnalysis#collectedProp
+            results: new Map(stimmen.reihenfolge[this.index].map(p => [stimmen.parteien[p], stimmen.werte[p][this.index]])),
+            count: this.count,
+            possibleCount: this.ergebnisse.length,
+            fieldDesc: fieldDesc
+        });
+        return rD;
+    }
+}
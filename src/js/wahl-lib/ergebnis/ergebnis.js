@@ -288,7 +288,7 @@ export class Ergebnis {
                 let sourceNumber = parseInt(numberMatch[1]);
                 let stimmzettelPartei = this.stimmzettel.get(sourceNumber);
                 if (!stimmzettelPartei) {
-                    if (typeof sourceValue === "string" && sourceValue !== "") throw new TypeError(`value ${sourceValue} exists but partei for ${sourceNumber} (${sourceName}) not found`);
+                    if (sourceValue != null && sourceValue !== "") throw new TypeError(`value ${sourceValue} exists but partei for ${sourceNumber} (${sourceName}) not found`);
                     continue;
                 }
                 _obj.votes.set(
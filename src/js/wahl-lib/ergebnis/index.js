@@ -13,8 +13,9 @@ export type { FieldDescription, DataTypeType, DataTypeAndArgsType } from './erge
 
 export {
     ResultDescription, CollectedResultDescription,
-    ErgebnisAnalysis,
+    ErgebnisAnalysis, VorabErgebnisAnalysis,
 } from './analysis';
+export type { EbenenErgebnisseType } from './analysis';
 
 export {
     ErgebnisAnalysisCollection,
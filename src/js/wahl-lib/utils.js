@@ -7,6 +7,129 @@
 import * as csv from 'csvtojson';
 import ky from 'ky';
 
+/**
+ * Normalize a path relative to the data directory like posixpath.normpath in tools/bundle.py ("./a/../b.csv" -> "b.csv").
+ *
+ * @param {string} path Relative path
+ * @returns {?string} Normalized path, undefined for absolute paths and URLs
+ */
+export function normalizePath(path: string): ?string {
+    if (path.startsWith("/") || /^[a-z][a-z0-9+.-]*:/i.test(path)) return undefined;
+    let parts = [];
+    for (let part of path.split("/")) {
+        if (part === "" || part === ".") continue;
+        if (part === ".." && parts.length && parts[parts.length-1] !== "..") parts.pop();
+        else parts.push(part);
+    }
+    return parts.join("/") || ".";
+}
+
+/**
+ * Reader for a bundle written by tools/bundle.py. The index is read with a Range request for the first bytes,
+ * each section with its own Range request when it is needed and decompressed with DecompressionStream("gzip").
+ * If the server ignores the Range header, the whole file it sent is kept and the sections are cut from it.
+ *
+ * @class Bundle
+ */
+export class Bundle {
+    url: string;
+    name: string;
+    _abschnitte: Map<string, { offset: number, laenge: number }>;
+    _ganz: ?ArrayBuffer;
+
+    /** Bytes read for the index, mostly enough for the whole index */
+    static ersterBlock: number = 65536;
+
+    constructor(url: string, index: { [key: string]: any }, ganz: ?ArrayBuffer) {
+        this.url = url;
+        this.name = index.name;
+        this._abschnitte = new Map(index.abschnitte.map(a => [a.pfad, a]));
+        this._ganz = ganz;
+    }
+
+    /**
+     * Read the index of a bundle.
+     *
+     * @async
+     * @param {string} url URL of the bundle
+     * @returns {Promise<Bundle>} Promise that resolves to the Bundle
+     */
+    static async open(url: string): Promise<Bundle> {
+        let [kopf, ganz] = await Bundle._lesen(url, 0, Bundle.ersterBlock);
+        if (new TextDecoder().decode(new Uint8Array(kopf, 0, 4)) !== "WKBD") throw new Error(`${url}: not a bundle`);
+        let laenge = new DataView(kopf).getUint32(4, true);
+        if (8 + laenge > kopf.byteLength) kopf = (await Bundle._lesen(url, 0, 8 + laenge))[0];
+        let index = JSON.parse(new TextDecoder().decode(new Uint8Array(kopf, 8, laenge)));
+        if (index.version !== 1) throw new Error(`${url}: unsupported version ${index.version}`);
+        return new Bundle(url, index, ganz ? kopf : undefined);
+    }
+
+    static async _lesen(url: string, offset: number, laenge: number): Promise<[ArrayBuffer, boolean]> {
+        let r = await ky(url, { headers: { Range: `bytes=${offset}-${offset + laenge - 1}` } });
+        let buffer = await r.arrayBuffer();
+        // without Range support, the server sends the whole file (200)
+        return r.status === 206 ? [buffer, false] : [buffer, true];
+    }
+
+    /**
+     * Check if the bundle contains a file.
+     *
+     * @param {string} path Path relative to the data directory
+     * @returns {boolean} true, if the file is contained
+     */
+    has(path: string): boolean {
+        let pfad = normalizePath(path);
+        return !!pfad && this._abschnitte.has(pfad);
+    }
+
+    /**
+     * Get a file of the bundle.
+     *
+     * @async
+     * @param {string} path Path relative to the data directory
+     * @returns {Promise<Response>} Promise that resolves to a Response with the decompressed content
+     */
+    async fetch(path: string): Promise<Response> {
+        let a = this._abschnitte.get(normalizePath(path) ?? "");
+        if (!a) throw new Error(`${path} is not contained in ${this.url}`);
+        let data = this._ganz ? this._ganz.slice(a.offset, a.offset + a.laenge) : (await Bundle._lesen(this.url, a.offset, a.laenge))[0];
+        // $FlowIgnore[cannot-resolve-name] DecompressionStream is not known to Flow
+        return new Response(new Blob([data]).stream().pipeThrough(new DecompressionStream("gzip")));
+    }
+}
+
+const bundles: Map<string, Promise<?Bundle>> = new Map();
+
+/**
+ * Use a bundle (tools/bundle.py) for all files below a base URL, see {@link fetchFile}.
+ * If the bundle can't be read, the files are loaded one by one.
+ *
+ * @param {string} baseUrl Base URL of the data directory
+ * @param {string} bundlePath Path to the bundle, relative to baseUrl
+ */
+export function registerBundle(baseUrl: string, bundlePath: string) {
+    if (bundles.has(baseUrl)) return;
+    let url = new URL(bundlePath, new URL(baseUrl, window.location.href)).href;
+    bundles.set(baseUrl, Bundle.open(url).catch(err => {
+        console.warn(`bundle ${url} not used:`, err);
+        return undefined;
+    }));
+}
+
+/**
+ * Fetch a file, from the bundle registered for baseUrl if it contains the file, otherwise with its own request.
+ *
+ * @async
+ * @param {string} path Path to the file
+ * @param {string} baseUrl Base URL for the path to the file
+ * @returns {Promise<Response>} Promise that resolves to the Response
+ */
+export async function fetchFile(path: string, baseUrl: string): Promise<Response> {
+    let bundle = await bundles.get(baseUrl);
+    if (bundle && bundle.has(path)) return bundle.fetch(path);
+    return ky(path, { prefixUrl: baseUrl });
+}
+
 /**
  * Fetch a csv file, represented with an Object per row.
  *
@@ -16,6 +139,89 @@ import ky from 'ky';
  * @returns {Promise<Array<object>>} Promise that resolves to Array of JSON objects per data row of the csv file.
  */
 export async function fetchCsvToJson(csvPath: string, baseUrl: string): Promise<Array<{ [key: string]: any }>> {
-    let r = await ky(csvPath, { prefixUrl: baseUrl });
+    let r = await fetchFile(csvPath, baseUrl);
     return csv({ delimiter: ';' }).fromString(await r.text());
 }
+
+/**
+ * Fetch a JSON file.
+ *
+ * @async
+ * @param {string} jsonPath Path to the JSON file
+ * @param {string} baseUrl Base URL for the path to the JSON file
+ * @returns {Promise<any>} Promise that resolves to the parsed JSON content.
+ */
+export async function fetchJson(jsonPath: string, baseUrl: string): Promise<any> {
+    return (await fetchFile(jsonPath, baseUrl)).json();
+}
+
+const owdbTypes = { i1: Int8Array, i2: Int16Array, i4: Int32Array };
+
+/**
+ * Results compiled by tools/owdbin.py, kept as the typed columns of the fetched buffer.
+ * Numeric columns are Int8Array/Int16Array/Int32Array views (empty cells: smallest value of the type),
+ * text columns are codes into a dictionary. Iterating yields one object per row like {@link fetchCsvToJson},
+ * each row is built only when it is reached.
+ *
+ * @class OwdbTable
+ */
+export class OwdbTable {
+    length: number;
+    columns: Map<string, Int8Array | Int16Array | Int32Array>;
+    missing: Map<string, number>;
+    text: Map<string, { codes: Int8Array | Int16Array | Int32Array, values: Array<string> }>;
+
+    constructor(buffer: ArrayBuffer, path: string = "") {
+        let view = new DataView(buffer);
+        if (new TextDecoder().decode(new Uint8Array(buffer, 0, 4)) !== "OWDB") throw new Error(`${path}: not an OWDB file`);
+        let header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, view.getUint32(4, true))));
+        if (header.version !== 2) throw new Error(`${path}: unsupported version ${header.version}`);
+        this.length = header.zeilen;
+        this.columns = new Map();
+        this.missing = new Map();
+        this.text = new Map();
+        // little endian as written by tools/owdbin.py, typed arrays use the platform byte order (little endian in practice)
+        for (let { name, typ, offset } of header.spalten) {
+            let column = new owdbTypes[typ](buffer, offset, this.length);
+            this.columns.set(name, column);
+            this.missing.set(name, -(2 ** (column.BYTES_PER_ELEMENT * 8 - 1)));
+        }
+        for (let { name, typ, offset, werte } of header.text) {
+            this.text.set(name, { codes: new owdbTypes[typ](buffer, offset, this.length), values: werte });
+        }
+    }
+
+    /**
+     * One row like {@link fetchCsvToJson}, empty cells are "".
+     *
+     * @param {number} i Index of the row
+     * @returns {object} Object with a property per column
+     */
+    row(i: number): { [key: string]: any } {
+        let result = {};
+        for (let [name, { codes, values }] of this.text) result[name] = values[codes[i]];
+        for (let [name, column] of this.columns) {
+            let value = column[i];
+            result[name] = value === this.missing.get(name) ? "" : value;
+        }
+        return result;
+    }
+
+    // $FlowIgnore[unsupported-syntax]
+    *[Symbol.iterator](): Iterator<{ [key: string]: any }> {
+        for (let i = 0; i < this.length; i++) yield this.row(i);
+    }
+}
+
+/**
+ * Fetch a results file compiled by tools/owdbin.py.
+ *
+ * @async
+ * @param {string} owdbPath Path to the .owdb file
+ * @param {string} baseUrl Base URL for the path to the file
+ * @returns {Promise<OwdbTable>} Promise that resolves to the typed columns, iterable like the result of {@link fetchCsvToJson}.
+ */
+export async function fetchOwdb(owdbPath: string, baseUrl: string): Promise<OwdbTable> {
+    let r = await fetchFile(owdbPath, baseUrl);
+    return new OwdbTable(await r.arrayBuffer(), owdbPath);
+}
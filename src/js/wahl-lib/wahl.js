@@ -4,11 +4,12 @@
  * file, You can obtain one at https://mozilla.org/MPL/2.0/. */
 
 // @flow
-import { fetchCsvToJson } from './utils';
+import { fetchCsvToJson, fetchJson, fetchOwdb } from './utils';
+import type { OwdbTable } from './utils';
 import type { WahlModel } from './model';
 import { WahlParameter, WahlGebiet, WahlStimmzettelPartei, WahlKandidat, WahlErgebnis } from './model';
-import { ErgebnisAnalysis, ErgebnisAnalysisCollection } from './ergebnis';
-import type { Ergebnis } from './ergebnis';
+import { ErgebnisAnalysis, ErgebnisAnalysisCollection, VorabErgebnisAnalysis } from './ergebnis';
+import type { Ergebnis, EbenenErgebnisseType } from './ergebnis';
 
 export type EbeneConfigType = {|
     geoJson: ?string,
@@ -18,6 +19,8 @@ export type EbeneConfigType = {|
     virtual?: boolean,
     virtualField?: string, // e. g. custom csv field
     dissolve?: boolean,
+    dissolvedGeoJson?: string, // prebuilt by tools/geo/dissolve.py, replaces the runtime dissolve
+    geometrien?: string, // Ebene of the geometry store (tools/geo/geometriespeicher.py), loaded instead of the GeoJSON
 |};
 
 export type WahlConfigType = {|
@@ -27,7 +30,9 @@ export type WahlConfigType = {|
     gebietePath: string,
     stimmzettelPath: string,
     kandidatPath?: string,
-    ergebnisPath: string,
+    ergebnisPath: string, // .csv or compiled by tools/owdbin.py (.owdb)
+    klassenPath?: string, // prebuilt by tools/klassen.py, class breaks per Ebene and field
+    ebenenErgebnisse?: boolean, // prebuilt by tools/ebenenergebnisse.py, sums per Ebene (<ergebnisPath without extension>.<Ebene>.json)
     ergebnisType: Class<Ergebnis>,
     ebenen: Map<string, EbeneConfigType>
 |};
@@ -47,6 +52,10 @@ export class Ebene extends Map<?string, Map<string, GebietInterface> | GebietInt
     bezeichnung: string;
     config: EbeneConfigType;
     wahl: Wahl;
+    /** Prebuilt sums (see tools/ebenenergebnisse.py), undefined if not configured, not loadable or not matching the results */
+    vorab: ?EbenenErgebnisseType;
+    _vorabIndex: ?Map<GebietInterface, number>;
+    _vorabLoad: ?Promise<any>;
     get uniqueId(): boolean { return this.config.uniqueId }
     get hasGeoPath(): boolean { return !!this.config.geoJson }
     get isWahlEbene(): boolean { return this.ebene === 1}
@@ -184,6 +193,45 @@ export class Ebene extends Map<?string, Map<string, GebietInterface> | GebietInt
         return new ErgebnisAnalysisCollection(this.wahl, this.filtered(stimmzettel).filter(g=>g.geoExpected).map(g=>[g, g.ergebnisAnalysis(stimmzettel)]));
     }
 
+    /**
+     * Set prebuilt sums for this. They are only kept if they match the loaded results (same Gebiete, same amount of Bezirke and Ergebnisse per Gebiet),
+     * otherwise (e. g. results updated after the build) the sums are calculated at runtime as usual.
+     *
+     * @param {?EbenenErgebnisseType} vorab Prebuilt sums of this Ebene
+     */
+    setVorab(vorab: ?EbenenErgebnisseType) {
+        this.vorab = undefined;
+        this._vorabIndex = undefined;
+        if (!vorab || this.isWahlEbene) return;
+        if (!vorab.summen) {
+            console.warn(`prebuilt results for ${this} were built by an older tools/ebenenergebnisse.py, using runtime sums`);
+            return;
+        }
+        let index = new Map();
+        vorab.gebiete.forEach((nr, i) => {
+            let gebiet = (this.uniqueId || vorab.gs?.[i]) ? this.getGebiet(nr, vorab.gs?.[i]) : undefined;
+            if (gebiet) index.set(gebiet, i);
+        });
+        for (let gebiet of this.flat) {
+            let i = index.get(gebiet);
+            let ergebnisse = [...gebiet.values()].filter(wG => this.wahl.ergebnisse.get(wG)).length;
+            if (i === undefined || vorab.bezirke[i] !== gebiet.size || vorab.ergebnisse[i] !== ergebnisse) {
+                console.warn(`prebuilt results for ${this} don't match the loaded results (${gebiet}), using runtime sums`);
+                return;
+            }
+        }
+        this.vorab = vorab;
+        this._vorabIndex = index;
+    }
+
+    /**
+     * @param {GebietInterface} gebiet Gebiet of this
+     * @returns {?number} Index of the Gebiet in the prebuilt sums, undefined if there are none.
+     */
+    vorabIndex(gebiet: GebietInterface): ?number {
+        return this._vorabIndex?.get(gebiet);
+    }
+
     /** @returns {string} String representation of this. */
     toString(): string { return `Ebene(${this.ebene}, name: ${this.bezeichnung}, size${this.uniqueId ? "" : " (flat)"}: ${this.uniqueId ? this.size : this.flat.length})` }
 }
@@ -240,10 +288,15 @@ export class Gebiet extends Map<string, WahlGebiet> implements GebietInterface {
         return this._name ?? `${this.nr} (${[...this.values()].map(wG => wG.name).join(', ')})`;
     }
 
-    /** Get ErgebnisAnalysis for all {@link WahlGebiete} of this together via the associated {@link Wahl} object. */
+    /**
+     * Get ErgebnisAnalysis for all {@link WahlGebiete} of this together via the associated {@link Wahl} object.
+     * Without a Stimmzettel filter, prebuilt sums of the Ebene are used if available.
+     */
     ergebnisAnalysis(stimmzettel: ?Stimmzettel): ErgebnisAnalysis {
         let ergebnisse = [];
         for (let wG of this.values()) if (!stimmzettel || wG.stimmzettel === stimmzettel) ergebnisse.push(this.wahl.ergebnisse.get(wG));
+        let index = stimmzettel ? undefined : this.ebene.vorabIndex(this);
+        if (index !== undefined) return new VorabErgebnisAnalysis(ergebnisse, this.wahl.ergebnisType, this.ebene.vorab, index);
         return new ErgebnisAnalysis(ergebnisse, this.wahl.ergebnisType);
     }
 
@@ -570,6 +623,9 @@ export default class Wahl {
 
     ergebnisse: Map<WahlGebiet, Ergebnis>;
 
+    /** Precomputed class breaks (see tools/klassen.py), undefined if not configured or not loadable */
+    klassen: ?{ [ebene: string]: Object };
+
     /**
      * Get all relevant candidature district ids, optionally filtered.
      *
@@ -604,7 +660,7 @@ export default class Wahl {
      * Creates an instance of Wahl.
      * 
      * @param {WahlConfigType} config Configuration object with relevant information for this election.
-     * @param {?string} baseUrl Base URL for data loading
+     * @param {?string} baseUrl Base URL for data loading, files are read from the bundle registered for it (see {@link registerBundle})
      * @param {Function} [dataSuccessCallback] Function to call on data success
      * @param {Function} [dataErrorCallback] Function to call on data error
      */
@@ -628,6 +684,8 @@ export default class Wahl {
     get stimmzettelPath(): string { return this.config.stimmzettelPath }
     get kandidatPath(): ?string { return this.config.kandidatPath }
     get ergebnisPath(): string { return this.config.ergebnisPath }
+    get klassenPath(): ?string { return this.config.klassenPath }
+    get ebenenErgebnisse(): boolean { return !!this.config.ebenenErgebnisse }
     get ergebnisType(): Class<Ergebnis> { return this.config.ergebnisType }
     get ebenenConfigs(): Map<string, EbeneConfigType> { return this.config.ebenen }
 
@@ -668,6 +726,7 @@ export default class Wahl {
         this.stimmzettel.clear();
         this.kandidaten.clear();
         this.ergebnisse.clear();
+        this.klassen = undefined;
         this._loaded = false;
     }
 
@@ -690,6 +749,7 @@ export default class Wahl {
             await this.loadStimmzettelData();
             await this.loadKandidatData();
             await this.loadErgebnisData();
+            await this.loadKlassenData();
         } catch (err) {
             this._handleDataError(err);
             throw err;
@@ -867,18 +927,55 @@ export default class Wahl {
      * @see WahlErgebnis
      */
     async loadErgebnisData(): Promise<any> {
-        return fetchCsvToJson(this.ergebnisPath, this.baseUrl)
+        let fetchFn = this.ergebnisPath.endsWith(".owdb") ? fetchOwdb : fetchCsvToJson;
+        return fetchFn(this.ergebnisPath, this.baseUrl)
             .then(jsonObj => this._handleErgebnisData(jsonObj));
     }
 
+    /**
+     * Load precomputed class breaks. Optional, on errors the breaks are calculated in the browser instead.
+     *
+     * @async
+     * @returns {Promise<any>} .
+     */
+    async loadKlassenData(): Promise<any> {
+        this.klassen = undefined;
+        if (!this.klassenPath) return;
+        return fetchJson(this.klassenPath, this.baseUrl)
+            .then(jsonObj => { this.klassen = jsonObj })
+            .catch(err => console.warn(`could not load class breaks ${this.klassenPath}`, err));
+    }
+
+    /**
+     * Load the prebuilt sums of an Ebene (levels above 1). Optional, on errors the sums are calculated in the browser instead.
+     * Not part of {@link Wahl#loadData}: the file of an Ebene is only fetched once the Ebene is shown (see WahlController#loadGeoJson),
+     * and only once per loaded data. The single results are loaded in any case, they are still needed e. g. for the party order,
+     * candidates and the Stimmzettel filter.
+     *
+     * @async
+     * @param {Ebene} ebene Ebene of this
+     * @returns {Promise<any>} .
+     * @see Ebene#setVorab
+     */
+    async loadEbenenErgebnisData(ebene: Ebene): Promise<any> {
+        if (!this.ebenenErgebnisse || ebene.isWahlEbene) return;
+        if (!ebene._vorabLoad) {
+            let path = `${this.ergebnisPath.replace(/\.[^.]*$/, "")}.${ebene.bezeichnung}.json`;
+            ebene._vorabLoad = fetchJson(path, this.baseUrl)
+                .then(jsonObj => ebene.setVorab(jsonObj))
+                .catch(err => console.warn(`could not load prebuilt results ${path}`, err));
+        }
+        return ebene._vorabLoad;
+    }
+
     /**
      * Handle JSON result data. Calls {@link Wahl#addErgebnis} on each object.
      * Previously loaded data is cleared.
      *
-     * @param {object} jsonObj JSON result data.
+     * @param {Array<object>|OwdbTable} jsonObj JSON result data, or compiled results that build each row when iterated.
      * @see WahlErgebnis
      */
-    _handleErgebnisData(jsonObj: Object) {
+    _handleErgebnisData(jsonObj: Array<Object> | OwdbTable) {
         this.ergebnisse.clear();
         // otherwise an incomplete amount of Ergebnisse would not be noticeable inside ErgebnisAnalysis
         this.wahlEbene.flat.forEach(wG=>{this.ergebnisse.set(wG, undefined)});
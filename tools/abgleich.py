@@ -0,0 +1,181 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Prüft für alle Wahlen aus src/js/config.js, ob die Geodaten jeder Ebene zu den Gebieten aus den Offene-Wahldaten
+passen, so wie die Webanwendung sie verbindet (keyProp, bei !uniqueId zusätzlich gsProp, Vergleich als String).
+Geprüft wird die Datei, die die Webanwendung lädt: geometrien, sonst dissolvedGeoJson, sonst geoJson. Bei Ebenen des
+Geometriespeichers auch, ob jedes Feature auf eine vorhandene Geometrie in den Paketen verweist.
+
+Gemeldet werden Features ohne oder mit unbekanntem Schlüssel und Gebiete mit Urnenwahlbezirken (geoExpected) ohne
+Feature, im Browser sonst nur als leere Flächen und Warnungsdialog zu sehen. Bei Abweichungen wird geprüft, ob eine
+einfache Normalisierung beider Seiten (führende Nullen, nur Ziffern wie _name_to_id in api-to-owd.py, ...) die
+Schlüssel zusammenbringt.
+
+Exit-Code 1, wenn etwas nicht passt oder sich eine Wahl nicht laden lässt, so kann das Skript nach jeder
+Datenaktualisierung laufen.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ergebnisse import Ebene, iter_wahldaten
+from wahlconfig import js_str, termin_dir
+
+# höchstens so viele Schlüssel je Meldung ausgeben
+beispiele = 8
+
+Key = Tuple[Optional[str], str]
+
+
+def _ziffern(s: str) -> str:
+    teile = s.split(" ")
+    return "".join(_ for _ in teile[0] if _.isdigit()) or "".join(_ for _ in teile[-1] if _.isdigit()) or s
+
+
+normalisierungen: Dict[str, Callable[[str], str]] = {
+    "führende Nullen entfernen": lambda s: s.lstrip("0") or "0",
+    "Leerzeichen und Groß-/Kleinschreibung ignorieren": lambda s: re.sub(r"\s+", " ", s.strip()).casefold(),
+    "Nachkommastellen .0 entfernen": lambda s: re.sub(r"\.0+$", "", s),
+    "nur Ziffern aus erstem/letztem Wort (wie _name_to_id)": _ziffern,
+}
+
+_geojson_cache: Dict[str, List[Dict[str, Any]]] = {}
+
+
+def geladene_datei(termin: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+    '''die Datei, die die Webanwendung für eine Ebene lädt (wie loadGeoJson in src/js/wahl-controller.js)'''
+    for key in ("geometrien", "dissolvedGeoJson", "geoJson"):
+        if config.get(key):
+            return os.path.normpath(os.path.join(termin_dir(termin), config[key]))
+    return None
+
+
+def _geometrien_pruefen(path: str, ebene: Dict[str, Any]) -> None:
+    '''Verweise einer Ebene des Geometriespeichers (tools/geo/geometriespeicher.py) auf ihre Pakete'''
+    laengen = []
+    for paket in ebene["pakete"]:
+        with open(os.path.join(os.path.dirname(path), paket), "r", encoding="utf-8") as f:
+            laengen.append(len(json.load(f)))
+    for i, feature in enumerate(ebene["features"]):
+        g = feature.get("g")
+        if g is None:
+            continue
+        if not (0 <= g[0] < len(laengen) and 0 <= g[1] < laengen[g[0]]):
+            raise ValueError(f"{path}: Feature {i} verweist auf fehlende Geometrie {g}")
+
+
+def properties(path: str) -> List[Dict[str, Any]]:
+    '''
+    Properties aller Features einer Datei, wie fetchGeoJson sie liest: GeoJSON, TopoJSON oder Ebene des
+    Geometriespeichers (je Datei nur einmal gelesen)
+    '''
+    if path not in _geojson_cache:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("type") == "Topology":
+            features = next(iter(data["objects"].values()), {}).get("geometries", [])
+        else:
+            if data.get("type") == "Geometrien":
+                _geometrien_pruefen(path, data)
+            features = data.get("features", [])
+        _geojson_cache[path] = [feature.get("properties") or {} for feature in features]
+    return _geojson_cache[path]
+
+
+def feature_keys(config: Dict[str, Any], props: List[Dict[str, Any]]) -> Tuple[List[Key], int]:
+    '''(Schlüssel der Features, Anzahl Features ohne Schlüssel)'''
+    keys = []
+    leer = 0
+    for p in props:
+        key_id = p.get(config["keyProp"])
+        if key_id in (None, ""):
+            leer += 1
+            continue
+        gs = None if config["uniqueId"] else js_str(p.get(config.get("gsProp"), ""))
+        keys.append((gs, js_str(key_id)))
+    return keys, leer
+
+
+def vorschlaege(unbekannt: Set[Key], gebiete: Set[Key]) -> List[str]:
+    '''Normalisierungen, nach denen unbekannte Feature-Schlüssel Gebieten zugeordnet werden können'''
+    result = []
+    for name, norm in normalisierungen.items():
+        normiert: Dict[Key, List[Key]] = {}
+        for gs, nr in gebiete:
+            normiert.setdefault((gs, norm(nr)), []).append((gs, nr))
+        treffer = sum(1 for gs, nr in unbekannt if len(normiert.get((gs, norm(nr)), [])) == 1)
+        # eindeutig muss es bleiben: keine zwei Gebiete dürfen zusammenfallen
+        if treffer and all(len(v) == 1 for v in normiert.values()):
+            result.append(f"{name}: {treffer} von {len(unbekannt)} Features zugeordnet")
+    return result
+
+
+def pruefen(ebene: Ebene, keys: List[Key], leer: int, wahl_ebene: Optional[Ebene] = None) -> List[str]:
+    '''Meldungen zu einer Ebene, leer wenn alles passt'''
+    meldungen = []
+    ziel = wahl_ebene or ebene
+    gebiete = set(ziel.gebiete) if ziel.config["uniqueId"] == ebene.config["uniqueId"] \
+        else {(None if ebene.config["uniqueId"] else gs, nr) for gs, nr in ziel.gebiete}
+    vorhanden = set(keys)
+    unbekannt = vorhanden - gebiete
+    if leer:
+        meldungen.append(f"{leer} Features ohne {ebene.config['keyProp']}")
+    if unbekannt:
+        meldungen.append(f"{len(unbekannt)} Features nicht in der Ebene: {_liste(unbekannt)}")
+    fehlend: Set[Key] = set()
+    if wahl_ebene is None:
+        fehlend = {key for key, geo in zip(ebene.gebiete, ebene.geo_erwartet) if geo} - vorhanden
+        if fehlend:
+            meldungen.append(f"{len(fehlend)} Gebiete mit Urnenwahlbezirken ohne Feature: {_liste(fehlend)}")
+    if unbekannt:
+        meldungen += [f"Vorschlag: {_}" for _ in vorschlaege(unbekannt, gebiete)]
+    return meldungen
+
+
+def _liste(keys: Set[Key]) -> str:
+    namen = sorted(nr if gs is None else f"{gs}/{nr}" for gs, nr in keys)
+    return ", ".join(namen[:beispiele]) + (", ..." if len(namen) > beispiele else "")
+
+
+def main() -> int:
+    start = perf_counter()
+    fehler = 0
+    geprueft = 0
+    ladefehler: List[str] = []
+    for wahl in iter_wahldaten(ladefehler):
+        ebenen = wahl.ebenen()
+        for ebene in ebenen:
+            path = geladene_datei(wahl.termin, ebene.config)
+            if not path:
+                continue
+            # dissolve ohne dissolvedGeoJson: die Features sind Bezirke der Ebene 1, die Webanwendung fasst sie zusammen
+            wahl_ebene = None
+            if ebene.config.get("dissolve") and not ebene.config.get("dissolvedGeoJson"):
+                wahl_ebene = next(_ for _ in ebenen if _.level == 1)
+            try:
+                keys, leer = feature_keys(ebene.config, properties(path))
+            except (OSError, ValueError) as e:
+                print(f"{wahl.termin['name']} / {wahl.name} / {ebene.name}: {e}")
+                fehler += 1
+                continue
+            geprueft += 1
+            meldungen = pruefen(ebene, keys, leer, wahl_ebene)
+            if meldungen:
+                fehler += 1
+                print(f"{wahl.termin['name']} / {wahl.name} / {ebene.name}:")
+                for meldung in meldungen:
+                    print(f"    {meldung}")
+    print(f"{geprueft} Ebenen geprüft, {fehler} mit Abweichungen, {len(ladefehler)} Wahlen nicht geladen, "
+          f"{perf_counter() - start:.2f} s")
+    return 1 if fehler or ladefehler else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,9 @@
 from __future__ import annotations
 
 from csv import writer, reader, DictReader
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from hashlib import md5
+from time import perf_counter
 from typing import List, Tuple, Any, Dict, Optional, Iterable
 
 from requests import get as r_get
@@ -14,6 +15,8 @@ from requests import get as r_get
 import requests_cache
 requests_cache.install_cache('api-to-owd-cache')
 
+from wahlconfig import js_str
+
 def r_simple(url):
     # print(url)
     r = r_get(url)
@@ -24,6 +27,67 @@ def r_json(url):
     r = r_simple(url)
     return r.json()
 
+def _nach_ebenen(werte: List[Any], zusatz: Dict[int, Any], leer: Any) -> List[Any]:
+    '''Werte für gebiet-ebene-5 bis -2: werte rechtsbündig (letzter Wert: Ebene 2), fehlende Ebenen aus zusatz'''
+    ebenen = {2 + i: w for i, w in enumerate(reversed(werte))}
+    for ebene, w in zusatz.items():
+        ebenen.setdefault(ebene, w)
+    return [ebenen.get(ebene, leer) for ebene in range(5, 1, -1)]
+
+@dataclass
+class GeoZuordnung:
+    '''
+    Rückgriff, wenn die Gebietsverlinkung eine Ebene nicht enthält: Bezirke werden über die Geometrien aus
+    geografik_ebene_{n}.json dem Gebiet zugeordnet, in dem sie liegen, sonst dem mit der größten gemeinsamen Fläche.
+    '''
+    ebene: int  # gebiet-ebene-N (2-5) in Wahlparameter und Wahlgebietseinteilungen
+    titel: str  # gebiet-ebene-N-bezeichnung
+    bezirke: int  # geografik-Ebene der Bezirke
+    bezirk_prop: str  # Property mit der bezirk-nr
+    gebiete: int  # geografik-Ebene der übergeordneten Gebiete
+    nr_prop: str
+    name_prop: Optional[str] = None  # None: Nummer als Name
+
+    def zuordnen(self, geografik: Dict[str, Dict[str, Any]]) -> Dict[str, Tuple[str, str]]:
+        '''bezirk-nr -> (Nummer, Name) des übergeordneten Gebiets'''
+        # nur hierfür benötigt: pip install shapely
+        import numpy as np
+        import shapely
+        from shapely.geometry import shape
+
+        bezirke = [f for f in geografik[str(self.bezirke)]['features'] if f.get('geometry')]
+        gebiete = [f for f in geografik[str(self.gebiete)]['features'] if f.get('geometry')]
+        b_geom = np.array([shape(f['geometry']) for f in bezirke])
+        g_geom = np.array([shape(f['geometry']) for f in gebiete])
+        tree = shapely.STRtree(g_geom)
+
+        # zuerst Enthalten-Sein, das braucht keine Verschneidung
+        zuordnung = np.full(len(bezirke), -1)
+        b_idx, g_idx = tree.query(b_geom, predicate="within")
+        zuordnung[b_idx] = g_idx
+        # übrige Bezirke (Grenzen nicht deckungsgleich): nur ein Gebiet berührt, sonst größte Überschneidung
+        rest = np.flatnonzero(zuordnung < 0)
+        b_idx, g_idx = tree.query(b_geom[rest], predicate="intersects")
+        einzeln = np.bincount(b_idx, minlength=len(rest))[b_idx] == 1
+        zuordnung[rest[b_idx[einzeln]]] = g_idx[einzeln]
+        b_idx, g_idx = b_idx[~einzeln], g_idx[~einzeln]
+        if len(b_idx):
+            b_mehr = b_geom[rest][b_idx]
+            # die großen Gebiete vor dem Verschneiden auf das Rechteck des Bezirks zuschneiden
+            zugeschnitten = shapely.intersection(g_geom[g_idx], shapely.box(*shapely.bounds(b_mehr).T))
+            flaechen = shapely.area(shapely.intersection(b_mehr, zugeschnitten))
+            reihenfolge = np.lexsort((-flaechen, b_idx))
+            _, erste = np.unique(b_idx[reihenfolge], return_index=True)
+            zuordnung[rest[b_idx[reihenfolge[erste]]]] = g_idx[reihenfolge[erste]]
+
+        result = {}
+        for b, g in enumerate(zuordnung):
+            if g < 0: continue
+            props = gebiete[g]['properties']
+            nr = js_str(props[self.nr_prop])
+            result[js_str(bezirke[b]['properties'][self.bezirk_prop])] = (nr, js_str(props[self.name_prop]) if self.name_prop else nr)
+        return result
+
 @dataclass
 class Wahl:
     wahlparameter: Wahlparameter
@@ -44,6 +108,8 @@ class Wahlparameter:
     wahlBehoerdeGS: str
     wahlBehoerdeName: str
     kandGebBez: str
+    # Ebenen aus geo_zuordnungen: gebiet-ebene-N -> Bezeichnung
+    zusatzEbenen: Dict[int, str] = field(default_factory=dict)
 
     @property
     def wahlName(self):
@@ -71,7 +137,7 @@ class Wahlparameter:
             ))
             csvw.writerow((
                 "0.3", self.wahlBehoerdeGS, self.wahlBehoerdeName, self.data.get('datum') or self.termin.get('datum'), self.wahlName, self.data['titel'],
-                self.kandGebBez, *(['']*(5-len(self.ebenen))), *self.ebenen.values()
+                self.kandGebBez, *_nach_ebenen(list(self.ebenen.values())[:-1], self.zusatzEbenen, ''), list(self.ebenen.values())[-1]
             ))
 
 @dataclass
@@ -87,6 +153,8 @@ class Wahlgebietseinteilungen:
     kandGebBez: str
     stimmGebNr: str = ""  # TODO
     stimmGebBez: str = ""  # TODO
+    # aus geo_zuordnungen: bezirk-nr -> {gebiet-ebene-N: (Nummer, Name)}, nur für Ebenen ohne Gebietsverlinkung
+    geoGebiete: Dict[str, Dict[int, Tuple[str, str]]] = field(default_factory=dict)
 
     def writeOWDcsv(self) -> None:
         with open(f"./{self.wahlBehoerdeGS}_{self.datum}_{self.wahlName.replace("/", "-")}_Wahlgebietseinteilungen_V0-3_{(self.uebersicht_data.get('file_timestamp') or self.uebersicht_data.get('zeitstempel')).replace(':', '')}.csv", "w", newline="", encoding="utf-8") as csvf:
@@ -133,7 +201,7 @@ class Wahlgebietseinteilungen:
 
                 csvw.writerow((
                     "0.3", self.wahlBehoerdeGS, self.datum, self.wahlName, self.wahlLeiterGS, self.wahlLeiterName,
-                    *(['', '']*(4-len(gebietsverlinkungen))), *[_ for gv in gebietsverlinkungen for _ in gv],
+                    *[_ for gv in _nach_ebenen(gebietsverlinkungen, self.geoGebiete.get(bezirk_id, {}), ['', '']) for _ in gv],
                     bezirk_id, bezirk_name, briefwahlbezirk_id, "B" if "Briefwahl" in bezirk_name else "W", "",
                     self.kandGebNr, self.kandGebBez,
                     self.stimmGebNr, self.stimmGebBez
@@ -254,6 +322,9 @@ wahlBehoerdeName = ""
 kandGebBez = ""
 kandGebNr = ""
 kandGebBezName = ""
+# Ebenen, die in der Gebietsverlinkung fehlen, über die Geometrien zuordnen (siehe GeoZuordnung).
+# Welche geografik-Ebene was enthält und wie die Properties heißen, steht in den heruntergeladenen ebene_*.geojson.
+geo_zuordnungen: List[GeoZuordnung] = []
 # Die Werte werden nur in die csv geschrieben und nicht für den Abruf oder so genutzt. TODO: mehr automatisch ermitteln
 
 # Hagen Bundestagswahl 2025
@@ -276,6 +347,8 @@ kandGebBezName = "137 Hagen - Ennepe-Ruhr-Kreis I"
 #base = f"https://wahlergebnisse.komm.one/lb/produktion/wahltermin-20250223/08212000/"
 ## In diesem Fall gibt es weder Gebietsverlinkung, noch fragwürdige Übersichtsebene.
 ## Das heißt der manuelle Eingriff der hier erforderlich wird ist eine Ebene 3 zu jeder Gebietseinteilung hinzuzufügen (Nummer und Name vom Wahlkreis sind ja eh alle gleich)
+## oder, wenn es eine geografik-Ebene mit den Wahlkreisen gibt, das über geo_zuordnungen zu erledigen, z. B.:
+## geo_zuordnungen = [GeoZuordnung(ebene=3, titel="Wahlkreis", bezirke=<Ebene der Bezirke>, bezirk_prop=<bezirk-nr>, gebiete=<Ebene der Wahlkreise>, nr_prop=<Nummer>, name_prop=<Name>)]
 #kandGebBez = "Wahlkreis"
 #kandGebNr = "271"
 #kandGebBezName = "271 Karlsruhe-Stadt"
@@ -312,6 +385,7 @@ for wahl_obj in wahl_objs:
     wahl_url = f"{wahl_base}wahl.json"
     wahl_json = r_json(wahl_url)
     wahlparameter = Wahlparameter(wahl_json, termin, wahlBehoerdeGS, wahlBehoerdeName, kandGebBez)
+    geografik = {}
     if (gge := wahl_json.get('geografik_ebenen')):
         print(f"INFO: Ebenen mit GeoGrafik: {', '.join(map(lambda _: f'ebene_{_}', gge))}")
         for ggei in gge:
@@ -320,6 +394,7 @@ for wahl_obj in wahl_objs:
                 gg_r = r_simple(f"{wahl_base}geografik_ebene_{ggei}.json")
                 with open(f"./{wahlparameter.wahlBehoerdeGS}_{wahlparameter.data.get('datum') or wahlparameter.termin.get('datum')}_{wahlparameter.wahlName.replace("/", "-")}_ebene_{ggei}.geojson",  "w") as f:
                     f.write(gg_r.text)
+                geografik[str(ggei)] = gg_r.json()
             except:
                 print("Download fehlgeschlagen, fahre fort")
 
@@ -348,6 +423,16 @@ for wahl_obj in wahl_objs:
         wahlName=wahlparameter.wahlName, wahlBehoerdeGS=wahlBehoerdeGS, wahlLeiterGS=wahlBehoerdeGS, wahlLeiterName=wahlBehoerdeName,
         kandGebNr=kandGebNr, kandGebBez=kandGebBezName,
     )
+    for gz in geo_zuordnungen:
+        if str(gz.bezirke) not in geografik or str(gz.gebiete) not in geografik:
+            print(f"WARNUNG: geografik_ebene_{gz.bezirke} oder _{gz.gebiete} fehlt, keine Zuordnung für {gz.titel}")
+            continue
+        start = perf_counter()
+        zuordnung = gz.zuordnen(geografik)
+        for bezirk_nr, gebiet in zuordnung.items():
+            wahlgebietseinteilungen.geoGebiete.setdefault(bezirk_nr, {})[gz.ebene] = gebiet
+        wahlparameter.zusatzEbenen[gz.ebene] = gz.titel
+        print(f"INFO: {len(zuordnung)} Bezirke über Geometrien {gz.titel} zugeordnet ({perf_counter() - start:.3f} s)")
 
     # Stimmzettel-Datei
     # Unterscheidung: Falls mehrere Stimmentypen, nehme die mit Namen Zweitstimme oder die die als zweites kommt, ansonsten nimm die eine
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Packt die Dateien eines Wahltermins aus src/js/config.js in eine Datei (<Datenverzeichnis>/<ausgabe>), damit ein
+Client nicht jede csv- und GeoJSON-Datei einzeln anfragen muss.
+
+Vorne steht ein Index, danach die einzeln mit gzip komprimierten Abschnitte. Ein Client liest zuerst die ersten
+Bytes (Index), dann per HTTP-Range-Request nur die Abschnitte, die er braucht, und entpackt sie einzeln (im Browser
+mit DecompressionStream("gzip")).
+
+Aufbau:
+    4 Byte   Kennung b"WKBD"
+    4 Byte   Länge L des Index (uint32, little endian)
+    L Byte   Index, JSON (UTF-8): {"version": 1, "name": Wahltermin,
+             "abschnitte": [{"pfad": Dateiname, "offset": Byte-Offset ab Dateianfang, "laenge": komprimiert,
+                             "groesse": entpackt, "encoding": "gzip"}, ...],
+             "namen": {"<wahl-name>/parameter": Index in abschnitte, ...}}
+    ...      Abschnitte
+
+Logische Namen je Wahl: parameter, gebiete, stimmzettel, kandidaten, ergebnis, klassen, geoJson/<Ebene>,
+dissolvedGeoJson/<Ebene> und geometrien/<Ebene>; die Pakete der Geometrie-Ebenen (tools/geo/geometriespeicher.py)
+stehen als paket/<Dateiname> im Bundle. Dateien, die mehrere Wahlen gemeinsam nutzen, stehen nur einmal im Bundle.
+"pfad" ist der Pfad relativ zum Datenverzeichnis in der Form von posixpath.normpath, so findet der Client
+(src/js/wahl-lib/utils.js, Bundle) einen Abschnitt über denselben Pfad, den er sonst einzeln laden würde.
+
+Im Browser wird ein Bundle verwendet, wenn der Wahltermin in config.js "bundlePath" (relativ zu baseUrl) setzt;
+geschrieben wird dann dorthin statt nach <ausgabe>. Fehlt die Datei, lädt der Client wie bisher jede Datei einzeln.
+'''
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import posixpath
+import struct
+import sys
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import Request, urlopen
+
+from wahlconfig import termin_dir, wahltermine
+
+KENNUNG = b"WKBD"
+VERSION = 1
+ausgabe = "daten.bundle"
+# nur Wahltermine, deren baseUrl einen dieser Texte enthält (None: alle)
+termine: Optional[List[str]] = None
+
+# config.js-Schlüssel der Wahl -> logischer Name
+_dateien = {
+    "parameterPath": "parameter",
+    "gebietePath": "gebiete",
+    "stimmzettelPath": "stimmzettel",
+    "kandidatPath": "kandidaten",
+    "ergebnisPath": "ergebnis",
+    "klassenPath": "klassen",
+}
+
+
+def _pakete(basedir: str, pfad: str) -> List[str]:
+    '''Pakete einer Geometrie-Ebene, relativ zum Datenverzeichnis'''
+    try:
+        with open(os.path.join(basedir, pfad), encoding="utf-8") as f:
+            ebene = json.load(f)
+    except (OSError, ValueError):
+        return []
+    ordner = posixpath.dirname(pfad)
+    return [posixpath.normpath(posixpath.join(ordner, p)) for p in ebene.get("pakete", [])]
+
+
+def inhalt(termin: Dict[str, Any]) -> Dict[str, str]:
+    '''logischer Name -> Pfad relativ zum Datenverzeichnis, nur vorhandene Dateien'''
+    basedir = termin_dir(termin)
+    result: Dict[str, str] = {}
+    for wahl in termin["wahlen"]:
+        for key, name in _dateien.items():
+            if wahl.get(key):
+                result[f"{wahl['name']}/{name}"] = wahl[key]
+        for ebene_name, ebene in wahl["ebenen"].items():
+            for key in ("geoJson", "dissolvedGeoJson", "geometrien"):
+                if ebene.get(key):
+                    result[f"{wahl['name']}/{key}/{ebene_name}"] = ebene[key]
+            if ebene.get("geometrien"):
+                for paket in _pakete(basedir, ebene["geometrien"]):
+                    result[f"paket/{posixpath.basename(paket)}"] = paket
+    result = {k: posixpath.normpath(v) for k, v in result.items()}
+    return {k: v for k, v in result.items() if os.path.isfile(os.path.join(basedir, v))}
+
+
+def packen(termin: Dict[str, Any], outpath: str) -> Tuple[int, int]:
+    '''schreibt das Bundle, gibt (Anzahl Abschnitte, Summe der Dateigrößen) zurück'''
+    basedir = termin_dir(termin)
+    namen = inhalt(termin)
+    pfade = list(dict.fromkeys(namen.values()))
+    daten = []
+    for pfad in pfade:
+        with open(os.path.join(basedir, pfad), "rb") as f:
+            roh = f.read()
+        # mtime=0: gleiche Eingabe, gleiches Bundle
+        daten.append((len(roh), gzip.compress(roh, mtime=0)))
+
+    def _index(offsets: List[int]) -> bytes:
+        return json.dumps({
+            "version": VERSION, "name": termin["name"],
+            "abschnitte": [{"pfad": p, "offset": o, "laenge": len(d), "groesse": g, "encoding": "gzip"}
+                           for p, o, (g, d) in zip(pfade, offsets, daten)],
+            "namen": {name: pfade.index(pfad) for name, pfad in namen.items()},
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # Offsets hängen von der Länge des Index ab, in dem sie selbst stehen
+    offsets = [0] * len(pfade)
+    while True:
+        index = _index(offsets)
+        neu = []
+        pos = 8 + len(index)
+        for _, d in daten:
+            neu.append(pos)
+            pos += len(d)
+        if neu == offsets:
+            break
+        offsets = neu
+
+    tmp_path = outpath + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(KENNUNG)
+        f.write(struct.pack("<I", len(index)))
+        f.write(index)
+        for _, d in daten:
+            f.write(d)
+    os.replace(tmp_path, outpath)
+    return len(pfade), sum(g for g, _ in daten)
+
+
+class Bundle:
+    '''Liest ein Bundle aus einer Datei oder per HTTP (Range-Requests), Abschnitte werden erst bei Bedarf geladen.'''
+
+    # so viel wird beim ersten Zugriff gelesen, reicht meist für den ganzen Index
+    erster_block = 65536
+
+    def __init__(self, quelle: str):
+        self.quelle = quelle
+        kopf = self._lesen(0, self.erster_block)
+        if kopf[:4] != KENNUNG:
+            raise ValueError(f"{quelle}: kein Bundle")
+        (laenge,) = struct.unpack_from("<I", kopf, 4)
+        if 8 + laenge > len(kopf):
+            kopf += self._lesen(len(kopf), 8 + laenge - len(kopf))
+        self.index: Dict[str, Any] = json.loads(kopf[8:8 + laenge])
+        if self.index["version"] != VERSION:
+            raise ValueError(f"{quelle}: Version {self.index['version']} wird nicht unterstützt")
+
+    def _lesen(self, offset: int, laenge: int) -> bytes:
+        if self.quelle.startswith(("http://", "https://")):
+            req = Request(self.quelle, headers={"Range": f"bytes={offset}-{offset + laenge - 1}"})
+            with urlopen(req) as r:
+                data = r.read()
+                # Server ohne Range-Unterstützung schicken die ganze Datei
+                return data if r.status == 206 else data[offset:offset + laenge]
+        with open(self.quelle, "rb") as f:
+            f.seek(offset)
+            return f.read(laenge)
+
+    @property
+    def namen(self) -> List[str]:
+        return list(self.index["namen"])
+
+    def abschnitt(self, name: str) -> bytes:
+        '''entpackter Inhalt zu einem logischen Namen oder einem Dateinamen'''
+        abschnitte = self.index["abschnitte"]
+        if name in self.index["namen"]:
+            a = abschnitte[self.index["namen"][name]]
+        else:
+            pfad = posixpath.normpath(name)
+            a = next((_ for _ in abschnitte if _["pfad"] == pfad), None)
+            if a is None:
+                raise KeyError(name)
+        return gzip.decompress(self._lesen(a["offset"], a["laenge"]))
+
+
+def main() -> None:
+    for termin in wahltermine():
+        if termine and not any(_ in termin["baseUrl"] for _ in termine):
+            continue
+        start = perf_counter()
+        outpath = os.path.join(termin_dir(termin), termin.get("bundlePath") or ausgabe)
+        try:
+            anzahl, groesse = packen(termin, outpath)
+        except OSError as e:
+            print(f"{termin['name']}: übersprungen, {e}", file=sys.stderr)
+            continue
+        bundle = Bundle(outpath)
+        for name in bundle.namen[:1]:
+            bundle.abschnitt(name)  # Stichprobe
+        print(f"{termin['name']}: {anzahl} Dateien, {groesse // 1024} -> {os.path.getsize(outpath) // 1024} KiB, "
+              f"{perf_counter() - start:.2f} s -> {os.path.relpath(outpath)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Vorab je Ebene zusammengezählte Ergebnisse: je Wahl und Ebene ab 2 eine JSON-Datei neben den Wahlergebnissen
+(<Wahlergebnisse>.<Ebene>.json). Ebene 1 sind die Wahlergebnisse selbst.
+
+Die Summen je Gebiet (Ebenen 2-5 über gebiet-ebene-N-nr, virtuelle Ebenen wie Briefwahlbezirke über virtualField)
+muss die Webanwendung damit nicht selbst aus den Ergebnissen der Bezirke bilden. Die Werte liegen spaltenweise vor
+(je Spalte ein Array über die Gebiete, null: kein Wert), sodass sie direkt in Typed Arrays übernommen werden können.
+
+Die Webanwendung liest die Datei einer Ebene für Wahlen mit `ebenenErgebnisse: true` in config.js, sobald die Ebene
+angezeigt wird (zusammen mit ihren Geometrien), und nimmt die Summen für die Ebenen 2 und höher ohne
+Stimmzettel-Filter (VorabErgebnisAnalysis); mit Filter und auf Ebene 1 wird weiter aus den Wahlergebnissen
+zusammengezählt. Die Wahlergebnisse selbst lädt die Webanwendung trotzdem, sie braucht die einzelnen Ergebnisse auch
+für die Reihenfolge der Parteien, die Kandidaten und den Filter; gespart wird das Zusammenzählen, nicht der Download.
+Passen die Dateien nicht mehr zu den Wahlergebnissen (Anzahl der Ergebnisse je Gebiet), werden sie verworfen.
+
+Fehlende Werte werden wie in der Webanwendung behandelt: "spalten" übergehen sie (ErgebnisAnalysis.constantProp),
+"summen" (Argumente der berechneten Felder) und "gueltig" sind null, sobald einem Ergebnis des Gebiets der Wert fehlt
+(calculatedProp und collectedProp zählen ohne Prüfung zusammen).
+
+Aufbau:
+    wahl, ebene, level
+    gebiete: Nummern, gs: wahl-behoerde-gs je Gebiet (nur ohne uniqueId), namen, geoExpected (0/1)
+    bezirke: Anzahl Bezirke je Gebiet, ergebnisse: davon mit Ergebnis
+    spalten: {OWD-Spalte (A1, A, B, ...): Summen}, summen: {OWD-Spalte der berechneten Felder: Summen}
+    stimmen: {propName: {spalte (D, F, ...), gueltig, ungueltig, parteien: [anyName], werte: [[Summe je Gebiet] je Partei],
+              reihenfolge: [[Index in parteien] je Gebiet]}}
+    reihenfolge wie ErgebnisAnalysis.collectedProp: nach mittlerer Platzierung in den Bezirken, dann nach Stimmen
+'''
+
+from __future__ import annotations
+
+import json
+import os
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ergebnisse import BerechnetesFeld, Ebene, GesammeltesFeld, WahlDaten, iter_wahldaten
+
+
+def _ints(werte: np.ndarray) -> List[Optional[int]]:
+    return [None if np.isnan(v) else int(v) for v in werte]
+
+
+def reihenfolge(ebene: Ebene, summen: np.ndarray, plaetze: np.ndarray) -> List[List[int]]:
+    '''Parteien mit Stimmen je Gebiet, nach mittlerer Platzierung und dann nach Stimmen absteigend'''
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mittel = ebene.summe(plaetze) / ebene.summe(~np.isnan(plaetze) * 1.0)
+    return [sorted((p for p in range(summen.shape[1]) if not np.isnan(mittel[g, p])),
+                   key=lambda p: (mittel[g, p], -summen[g, p])) for g in range(len(ebene.gebiete))]
+
+
+def ebene_ergebnisse(wahl: WahlDaten, ebene: Ebene) -> Dict[str, Any]:
+    result: Dict[str, Any] = {
+        "wahl": wahl.name,
+        "ebene": ebene.name,
+        "level": ebene.level,
+        "gebiete": [nr for _, nr in ebene.gebiete],
+    }
+    if not ebene.config["uniqueId"]:
+        result["gs"] = [gs for gs, _ in ebene.gebiete]
+    result["namen"] = ebene.namen
+    result["geoExpected"] = [int(_) for _ in ebene.geo_erwartet]
+    zugeordnet = ebene.zuordnung >= 0
+    result["bezirke"] = np.bincount(ebene.zuordnung[zugeordnet], minlength=len(ebene.gebiete)).tolist()
+    result["ergebnisse"] = np.bincount(ebene.zuordnung[zugeordnet], weights=wahl.vorhanden[zugeordnet],
+                                       minlength=len(ebene.gebiete)).astype(int).tolist()
+
+    spalten = list(dict.fromkeys(wahl.typ.konstanten.values()))
+    result["spalten"] = {spalte: _ints(ebene.summe(wahl.spalte(spalte))) for spalte in spalten}
+    berechnet = dict.fromkeys(wahl.typ.spalte(arg) for feld in wahl.typ.felder if isinstance(feld, BerechnetesFeld)
+                              for arg in feld.args)
+    result["summen"] = {spalte: _ints(ebene.summe_ergebnisse(wahl.spalte(spalte), wahl.vorhanden))
+                        for spalte in berechnet}
+    result["stimmen"] = {}
+    for feld in wahl.typ.felder:
+        if not isinstance(feld, GesammeltesFeld):
+            continue
+        parteien, stimmen = wahl.stimmen(feld)
+        summen = ebene.summe(stimmen)
+        result["stimmen"][feld.propName] = {
+            "spalte": feld.base,
+            "gueltig": _ints(ebene.summe_ergebnisse(wahl.gueltig(feld), wahl.vorhanden)),
+            "ungueltig": _ints(ebene.summe(wahl.spalte(feld.invalid))) if feld.invalid else None,
+            "parteien": parteien,
+            "werte": [_ints(summen[:, p]) for p in range(len(parteien))],
+            "reihenfolge": reihenfolge(ebene, summen, wahl.platzierung(feld)),
+        }
+    return result
+
+
+def ausgabepfad(wahl: WahlDaten, ebene: Ebene) -> str:
+    return f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.{ebene.name}.json"
+
+
+def main() -> None:
+    for wahl in iter_wahldaten():
+        start = perf_counter()
+        groessen = []
+        for ebene in wahl.ebenen():
+            if ebene.level == 1:
+                continue
+            outpath = ausgabepfad(wahl, ebene)
+            with open(outpath, "w", encoding="utf-8") as f:
+                json.dump(ebene_ergebnisse(wahl, ebene), f, ensure_ascii=False, separators=(",", ":"))
+            groessen.append(f"{ebene.name} {os.path.getsize(outpath) // 1024}")
+        print(f"{wahl.termin['name']} / {wahl.name}: {', '.join(groessen)} KiB, {perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Ergebnisse einer Wahl aus src/js/config.js als NumPy-Arrays, für die Build- und Analyse-Skripte unter tools/.
+
+Bildet nach, was die Webanwendung (src/js/wahl-lib) beim Laden macht: Wahlparameter, Wahlgebietseinteilungen,
+Stimmzettel und Wahlergebnisse einlesen, die Ebenen (2-5 aus den Wahlparametern, virtuelle aus virtualField) aufbauen
+und die Ergebnisse der Bezirke je Gebiet zusammenzählen. Die Feldbeschreibungen entsprechen den Ergebnis-Klassen in
+src/js/wahl-lib/ergebnis/ergebnis.js (ergebnisType in config.js).
+'''
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from wahlconfig import ergebnis_csv, iter_wahlen, read_owd_csv, termin_dir
+
+
+@dataclass
+class KonstantesFeld:
+    '''ConstantFieldDescription: Summe einer Spalte'''
+    propName: str
+    name: str
+
+
+@dataclass
+class BerechnetesFeld:
+    '''CalculatedFieldDescription: Quotient zweier Summen (alle Felder in ergebnis.js sind so aufgebaut)'''
+    propName: str
+    name: str
+    args: Tuple[str, str]
+
+
+@dataclass
+class GesammeltesFeld:
+    '''CollectedFieldDescription: Stimmen je Partei aus <base>1, <base>2, ... (Position auf dem Stimmzettel)'''
+    propName: str
+    name: str
+    base: str
+    valid: Optional[str] = None  # None: base
+    invalid: Optional[str] = None
+
+
+Feld = Union[KonstantesFeld, BerechnetesFeld, GesammeltesFeld]
+
+
+@dataclass
+class ErgebnisTyp:
+    konstanten: Dict[str, str]  # propName -> Spalte
+    felder: List[Feld]
+
+    def spalte(self, prop: str) -> str:
+        return self.konstanten[prop]
+
+
+def _kommunal(briefwahl: str) -> ErgebnisTyp:
+    return ErgebnisTyp(
+        konstanten={
+            "wahlberechtigteOhneWahlschein": "A1",
+            "wahlberechtigteMitWahlschein": "A2",
+            "wahlberechtigteNichtImWaehlerverzeichnis": "A3",
+            "wahlberechtigteGesamt": "A",
+            "waehlendeGesamt": "B",
+            "waehlendeMitWahlschein": briefwahl,
+        },
+        felder=[
+            GesammeltesFeld("stimmen", "Stimmen", "D", invalid="C"),
+            BerechnetesFeld("wahlbeteiligung", "Wahlbeteiligung", ("waehlendeGesamt", "wahlberechtigteGesamt")),
+            BerechnetesFeld("wahlscheinAnteil", "Wahlscheinanteil", ("wahlberechtigteMitWahlschein", "wahlberechtigteGesamt")),
+            KonstantesFeld("wahlberechtigteGesamt", "Wahlberechtigte"),
+        ])
+
+
+ERGEBNIS_TYPEN: Dict[str, ErgebnisTyp] = {
+    "ErgebnisKommunalwahlNRW": _kommunal("B2"),
+    "ErgebnisLandtagswahlBW": _kommunal("B1"),
+    "ErgebnisBuergerentscheid": _kommunal("B1"),
+    "ErgebnisKommunalwahlBW": ErgebnisTyp(
+        konstanten={
+            "wahlberechtigteOhneWahlschein": "A1",
+            "wahlberechtigteMitWahlschein": "A2",
+            "wahlberechtigteNichtImWaehlerverzeichnis": "A3",
+            "wahlberechtigteGesamt": "A",
+            "waehlendeGesamt": "B",
+            "waehlendeMitWahlschein": "B1",
+            "waehlendeBriefwahl": "B2",
+            "stimmzettelUngueltig": "C",
+            "stimmenGesamt": "E",
+        },
+        felder=[
+            GesammeltesFeld("stimmen", "Stimmen", "D", valid="E"),
+            BerechnetesFeld("wahlbeteiligung", "Wahlbeteiligung", ("waehlendeGesamt", "wahlberechtigteGesamt")),
+            BerechnetesFeld("wahlscheinAnteil", "Wahlscheinanteil", ("wahlberechtigteMitWahlschein", "wahlberechtigteGesamt")),
+            BerechnetesFeld("briefwahlAnteil", "Briefwahlanteil", ("waehlendeBriefwahl", "waehlendeGesamt")),
+            KonstantesFeld("wahlberechtigteGesamt", "Wahlberechtigte"),
+            BerechnetesFeld("ungueltigAnteil", "Ungültige Stimmzettel", ("stimmzettelUngueltig", "waehlendeGesamt")),
+        ]),
+    "ErgebnisBundestagswahl": ErgebnisTyp(
+        konstanten=_kommunal("B1").konstanten,
+        felder=[
+            GesammeltesFeld("erststimmen", "Erststimmen", "D", invalid="C"),
+            GesammeltesFeld("zweitstimmen", "Zweitstimmen", "F", invalid="E"),
+            BerechnetesFeld("wahlbeteiligung", "Wahlbeteiligung", ("waehlendeGesamt", "wahlberechtigteGesamt")),
+            BerechnetesFeld("wahlscheinAnteil", "Wahlscheinanteil", ("wahlberechtigteMitWahlschein", "wahlberechtigteGesamt")),
+            KonstantesFeld("wahlberechtigteGesamt", "Wahlberechtigte"),
+        ]),
+}
+
+Key = Tuple[Optional[str], str]  # (wahl-behoerde-gs oder None bei uniqueId, Nummer)
+
+
+def _zahl(value: Optional[str]) -> float:
+    '''wie parseInt in der Webanwendung: leer oder ungültig -> NaN'''
+    m = re.match(r"\s*(-?\d+)", value or "")
+    return float(m.group(1)) if m else np.nan
+
+
+@dataclass
+class Ebene:
+    name: str
+    level: int  # 1: Wahlbezirke, 2-5: gebiet-ebene-N, ab 90: virtuell (wie in wahl.js)
+    config: Dict[str, Any]
+    gebiete: List[Key]
+    namen: List[Optional[str]]
+    zuordnung: np.ndarray  # je Bezirk der Index des Gebiets, -1: in dieser Ebene keinem Gebiet zugeordnet
+    geo_erwartet: np.ndarray  # je Gebiet: mindestens ein Urnenwahlbezirk (geoExpected)
+
+    def summe(self, werte: np.ndarray) -> np.ndarray:
+        '''Bezirkswerte (Bezirke x ...) je Gebiet summieren, NaN wird übergangen. Gebiete ganz ohne Wert: NaN'''
+        shape = (len(self.gebiete),) + werte.shape[1:]
+        summen = np.zeros(shape)
+        anzahl = np.zeros(shape, dtype=np.int64)
+        idx = self.zuordnung >= 0
+        vorhanden = ~np.isnan(werte[idx])
+        np.add.at(summen, self.zuordnung[idx], np.where(vorhanden, werte[idx], 0))
+        np.add.at(anzahl, self.zuordnung[idx], vorhanden)
+        summen[anzahl == 0] = np.nan
+        return summen
+
+    def summe_ergebnisse(self, werte: np.ndarray, vorhanden: np.ndarray) -> np.ndarray:
+        '''Bezirkswerte je Gebiet über die Bezirke mit Ergebnis (vorhanden) summieren wie ErgebnisAnalysis.calculatedProp
+        und collectedProp in der Webanwendung: ein NaN darunter macht die Summe NaN. Gebiete ohne Ergebnis: NaN'''
+        shape = (len(self.gebiete),) + werte.shape[1:]
+        summen = np.zeros(shape)
+        idx = (self.zuordnung >= 0) & vorhanden
+        np.add.at(summen, self.zuordnung[idx], werte[idx])
+        summen[np.bincount(self.zuordnung[idx], minlength=len(self.gebiete)) == 0] = np.nan
+        return summen
+
+
+class WahlDaten:
+    '''Eine Wahl aus config.js: Bezirke (Zeilen der Wahlgebietseinteilungen) mit ihren Ergebnissen als Arrays.'''
+
+    def __init__(self, termin: Dict[str, Any], wahl: Dict[str, Any]):
+        self.termin = termin
+        self.config = wahl
+        self.name: str = wahl["name"]
+        self.basedir = termin_dir(termin)
+        if wahl["ergebnisType"] not in ERGEBNIS_TYPEN:
+            raise ValueError(f"{self.name}: ergebnisType {wahl['ergebnisType']} unbekannt")
+        self.typ = ERGEBNIS_TYPEN[wahl["ergebnisType"]]
+
+        parameter = read_owd_csv(self.pfad("parameterPath"), self.name)
+        if len(parameter) != 1:
+            raise ValueError(f"{self.name}: {len(parameter)} statt einer Zeile Wahlparameter")
+        self.parameter = parameter[0]
+        self.gebiete = read_owd_csv(self.pfad("gebietePath"), self.name)
+        if not self.gebiete:
+            raise ValueError(f"{self.name}: keine Wahlgebietseinteilungen")
+        self.bezirke: List[Tuple[str, str]] = [(row["wahl-behoerde-gs"], row["bezirk-nr"]) for row in self.gebiete]
+        self.index: Dict[Tuple[str, str], int] = {key: i for i, key in enumerate(self.bezirke)}
+        self.urnenwahl = np.array([row.get("bezirk-art") == "W" for row in self.gebiete])
+
+        # stimmzettel-gebiet-nr -> Position -> anyName (partei-kurzname, sonst partei-langname)
+        self.stimmzettel: Dict[Optional[str], Dict[int, str]] = {}
+        for row in read_owd_csv(self.pfad("stimmzettelPath"), self.name):
+            name = row.get("partei-kurzname") or row.get("partei-langname")
+            self.stimmzettel.setdefault(row.get("stimmzettel-gebiet-nr") or None, {})[int(row["stimmzettel-position"])] = name
+
+        self._ergebnisse = read_owd_csv(self.pfad("ergebnisPath"), self.name)
+        self.vorhanden = np.zeros(len(self.bezirke), dtype=bool)
+        self._zeilen: List[Optional[Dict[str, str]]] = [None] * len(self.bezirke)
+        for row in self._ergebnisse:
+            i = self.index.get((row["wahl-behoerde-gs"], row["bezirk-nr"]))
+            if i is None:
+                raise ValueError(f"{self.name}: unbekannte bezirk-nr {row['bezirk-nr']} in den Wahlergebnissen")
+            if self.vorhanden[i]:
+                raise ValueError(f"{self.name}: doppeltes Ergebnis für {row['bezirk-nr']}")
+            self.vorhanden[i] = True
+            self._zeilen[i] = row
+        self._spalten: Dict[str, np.ndarray] = {}
+        self._stimmen: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+    def pfad(self, key: str) -> str:
+        '''Pfad einer Datei der Wahl, für ergebnisPath immer die csv (auch wenn config.js die .owdb lädt)'''
+        path = os.path.join(self.basedir, self.config[key])
+        return ergebnis_csv(path) if key == "ergebnisPath" else path
+
+    def spalte(self, name: str) -> np.ndarray:
+        '''Werte einer Spalte der Wahlergebnisse je Bezirk (NaN: leer oder kein Ergebnis)'''
+        if name not in self._spalten:
+            self._spalten[name] = np.array([_zahl(row.get(name)) if row else np.nan for row in self._zeilen])
+        return self._spalten[name]
+
+    def konstante(self, prop: str) -> np.ndarray:
+        return self.spalte(self.typ.spalte(prop))
+
+    def stimmen(self, feld: GesammeltesFeld) -> Tuple[List[str], np.ndarray]:
+        '''(Parteien, Stimmen Bezirke x Parteien), NaN wo die Partei im Bezirk nicht zur Wahl stand'''
+        if feld.propName in self._stimmen:
+            return self._stimmen[feld.propName]
+        muster = re.compile(f"^{feld.base}(\\d+)$")
+        parteien: Dict[str, int] = {}
+        eintraege: List[Tuple[int, int, float]] = []
+        for i, row in enumerate(self._zeilen):
+            if not row:
+                continue
+            stimmzettel = self.stimmzettel.get(self.gebiete[i].get("stimmzettel-gebiet-nr") or None, {})
+            for spalte, wert in row.items():
+                m = muster.match(spalte or "")
+                if not m:
+                    continue
+                partei = stimmzettel.get(int(m.group(1)))
+                if partei is None:
+                    if wert:
+                        raise ValueError(f"{self.name}: Wert {wert} in {spalte}, aber keine Partei auf dem Stimmzettel")
+                    continue
+                eintraege.append((i, parteien.setdefault(partei, len(parteien)), _zahl(wert)))
+        matrix = np.full((len(self.bezirke), len(parteien)), np.nan)
+        if eintraege:
+            zeilen, spalten, werte = zip(*eintraege)
+            matrix[list(zeilen), list(spalten)] = werte
+        self._stimmen[feld.propName] = (list(parteien), matrix)
+        return self._stimmen[feld.propName]
+
+    def platzierung(self, feld: GesammeltesFeld) -> np.ndarray:
+        '''
+        je Bezirk und Partei (wie stimmen()) die Stelle unter den Stimmenspalten mit Wert, in der Reihenfolge der Spalten
+        wie in Ergebnis.update der Webanwendung (1, 2, ...), NaN: kein Wert
+        '''
+        parteien, stimmen = self.stimmen(feld)
+        index = {p: i for i, p in enumerate(parteien)}
+        muster = re.compile(f"^{feld.base}(\\d+)$")
+        result = np.full(stimmen.shape, np.nan)
+        for i, row in enumerate(self._zeilen):
+            if not row:
+                continue
+            stimmzettel = self.stimmzettel.get(self.gebiete[i].get("stimmzettel-gebiet-nr") or None, {})
+            stelle = 1
+            for spalte in row:
+                m = muster.match(spalte or "")
+                partei = stimmzettel.get(int(m.group(1))) if m else None
+                if partei is None or np.isnan(stimmen[i, index[partei]]):
+                    continue
+                result[i, index[partei]] = stelle
+                stelle += 1
+        return result
+
+    def gueltig(self, feld: GesammeltesFeld) -> np.ndarray:
+        return self.spalte(feld.valid or feld.base)
+
+    def ebenen(self) -> List[Ebene]:
+        '''Ebenen wie in Wahl._handleParameterData/addWahlGebiet, in derselben Reihenfolge'''
+        configs: Dict[str, Dict[str, Any]] = self.config["ebenen"]
+        result = []
+
+        def _ebene(name: str, level: int, nummern: List[Optional[str]], namen: List[Optional[str]]) -> Ebene:
+            config = configs.get(name)
+            if config is None:
+                raise ValueError(f"{self.name}: Ebene {name} fehlt in config.js")
+            index: Dict[Key, int] = {}
+            gebietnamen: List[Optional[str]] = []
+            zuordnung = np.full(len(self.bezirke), -1, dtype=np.int64)
+            for i, ((gs, _), nr, gebietname) in enumerate(zip(self.bezirke, nummern, namen)):
+                if not nr:
+                    continue
+                key = (None if config["uniqueId"] else gs, nr)
+                if key not in index:
+                    index[key] = len(index)
+                    gebietnamen.append(gebietname)
+                zuordnung[i] = index[key]
+            geo = np.zeros(len(index), dtype=bool)
+            np.logical_or.at(geo, zuordnung[zuordnung >= 0], self.urnenwahl[zuordnung >= 0])
+            return Ebene(name, level, config, list(index), gebietnamen, zuordnung, geo)
+
+        result.append(_ebene(self.parameter["bezirk-bezeichnung"], 1,
+                             [row["bezirk-nr"] for row in self.gebiete], [row.get("bezirk-name") for row in self.gebiete]))
+        bekannt = {self.parameter["bezirk-bezeichnung"]}
+        for level in range(2, 6):
+            name = self.parameter.get(f"gebiet-ebene-{level}-bezeichnung")
+            if not name:
+                continue
+            bekannt.add(name)
+            # Bezirke nur mit Name, ohne Nummer: in der Webanwendung ein Fehler, hier übergangen
+            result.append(_ebene(name, level, [row.get(f"gebiet-ebene-{level}-nr") for row in self.gebiete],
+                                 [row.get(f"gebiet-ebene-{level}-name") for row in self.gebiete]))
+        level = 90
+        for name, config in configs.items():
+            if not config.get("virtual") or name in bekannt:
+                continue
+            result.append(_ebene(name, level, [row.get(config["virtualField"]) for row in self.gebiete],
+                                 [None] * len(self.gebiete)))
+            level += 1
+        return result
+
+
+def iter_wahldaten(fehler: Optional[List[str]] = None) -> Iterator[WahlDaten]:
+    '''Alle Wahlen aus config.js, die sich laden lassen (sonst Meldung und weiter, die Meldungen auch in fehler)'''
+    for termin, wahl in iter_wahlen():
+        try:
+            yield WahlDaten(termin, wahl)
+        except (OSError, ValueError) as e:
+            meldung = f"{termin['name']} / {wahl['name']}: übersprungen, {e}"
+            print(meldung)
+            if fehler is not None:
+                fehler.append(meldung)
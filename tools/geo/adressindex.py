@@ -0,0 +1,203 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Persistenter Index Adresse -> Stimmbezirk/Wahlbezirk (SQLite) mit kleinem HTTP-Abfrageendpunkt.
+
+Der Index wird von conv.py geschrieben (siehe write_index). Direkt ausgeführt startet dieses Skript
+einen lokalen Server, Beispiel:
+    http://localhost:8010/stimmbezirk?strasse=Abergweg&nr=3a
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from strassennamen import Strassennamen, canonical_key as strasse_key
+
+# Paritätsregeln der Hausnummern-Bereiche
+ALLE, UNGERADE, GERADE = 0, 1, 2
+
+
+def split_nr(hausnummer: str) -> Tuple[Optional[int], str]:
+    '''"3a" -> (3, "a"), ohne Ziffern -> (None, ...)'''
+    hausnummer = hausnummer.strip()
+    digits = "".join(_ for _ in hausnummer if _.isdigit())
+    if not digits:
+        return None, hausnummer.casefold()
+    zusatz = hausnummer[hausnummer.rfind(digits[-1]) + 1:]
+    return int(digits), zusatz.strip().casefold()
+
+
+def parse_range(range_: str) -> Optional[Tuple[int, int, int, Optional[str]]]:
+    '''
+    Bereich aus der Straßenzuordnung, z. B. "54-60 ger." -> (54, 60, GERADE, None), "120" -> (120, 120, ALLE, ""),
+    "120a" -> (120, 120, ALLE, "a"). Einzelne Nummern gelten wie in conv.py nur mit genau diesem Zusatz (120 nicht für
+    120a), Bereiche für alle Zusätze (None).
+    '''
+    range_ = range_.strip()
+    if not range_:
+        return None
+    paritaet = ALLE
+    if range_.endswith(" ger."):
+        paritaet, range_ = GERADE, range_[:-5]
+    elif range_.endswith(" ung."):
+        paritaet, range_ = UNGERADE, range_[:-5]
+    if "-" not in range_:
+        nr, zusatz = split_nr(range_)
+        if nr is None or str(nr) + zusatz != range_.replace(" ", "").casefold():
+            return None
+        return nr, nr, paritaet, zusatz
+    try:
+        lower, higher = map(int, range_.split("-"))
+    except ValueError:
+        return None
+    return lower, higher, paritaet, None
+
+
+def write_index(path: str, hauskoordinaten: Iterable[Any], zuordnungen: Iterable[Any],
+                wahlbezirke: Optional[Dict[str, Tuple[str, str]]] = None,
+                strassennamen: Optional[Strassennamen] = None) -> None:
+    '''
+    Schreibt den Index neu. hauskoordinaten/zuordnungen sind die Objekte aus conv.py (street, nr, plz, bez_id bzw. street, nrs, bez_id),
+    wahlbezirke ordnet optional Stimmbezirk -> (Wahlbezirk-Nr, Wahlbezirk-Name) zu.
+    Mit strassennamen (Index über die Straßenzuordnung) werden abweichende Namen der Hauskoordinaten auf deren Bereiche verwiesen.
+    '''
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    con.executescript('''
+        CREATE TABLE strassen (strasse_key TEXT PRIMARY KEY, strasse TEXT NOT NULL, bereich_key TEXT NOT NULL) WITHOUT ROWID;
+        CREATE TABLE adressen (strasse_key TEXT NOT NULL, nr INTEGER, zusatz TEXT NOT NULL,
+                               hausnummer TEXT NOT NULL, plz TEXT, stimmbezirk TEXT NOT NULL);
+        CREATE TABLE bereiche (strasse_key TEXT NOT NULL, von INTEGER NOT NULL, bis INTEGER NOT NULL,
+                               paritaet INTEGER NOT NULL, zusatz TEXT, stimmbezirk TEXT NOT NULL);
+        CREATE TABLE bezirke (stimmbezirk TEXT PRIMARY KEY, wahlbezirk TEXT, wahlbezirk_name TEXT) WITHOUT ROWID;
+    ''')
+
+    strassen: Dict[str, Tuple[str, str]] = {}
+    adressen: List[Tuple[Any, ...]] = []
+    for hk in hauskoordinaten:
+        key = strasse_key(hk.street)
+        if key not in strassen:
+            ziel = strassennamen.resolve(hk.street) if strassennamen else None
+            strassen[key] = (hk.street, strasse_key(ziel) if ziel else key)
+        if hk.bez_id.startswith("???"):
+            continue  # nicht zugeordnet, dann lieber über die Bereiche suchen
+        nr, zusatz = split_nr(hk.nr)
+        for bez_id in hk.bez_id.split(","):
+            adressen.append((key, nr, zusatz, hk.nr, hk.plz, bez_id))
+
+    bereiche: List[Tuple[Any, ...]] = []
+    for z in zuordnungen:
+        key = strasse_key(z.street)
+        strassen.setdefault(key, (z.street, key))
+        if z.nrs == "":
+            # ganze Straße im Stimmbezirk
+            bereiche.append((key, 0, 2**31 - 1, ALLE, None, z.bez_id))
+            continue
+        for range_ in z.nrs.split(","):
+            if (parsed := parse_range(range_)) is None:
+                print(f"Bereich nicht lesbar: {z.street} {range_}")
+                continue
+            bereiche.append((key, *parsed, z.bez_id))
+
+    con.executemany("INSERT INTO strassen VALUES (?, ?, ?)", ((k, *v) for k, v in strassen.items()))
+    con.executemany("INSERT INTO adressen VALUES (?, ?, ?, ?, ?, ?)", adressen)
+    con.executemany("INSERT INTO bereiche VALUES (?, ?, ?, ?, ?, ?)", bereiche)
+    if wahlbezirke:
+        con.executemany("INSERT INTO bezirke VALUES (?, ?, ?)", ((k, *v) for k, v in wahlbezirke.items()))
+    # Indizes erst nach dem Einfügen anlegen, das ist deutlich schneller
+    con.executescript('''
+        CREATE INDEX adressen_idx ON adressen (strasse_key, nr, zusatz);
+        CREATE INDEX bereiche_idx ON bereiche (strasse_key, von, bis);
+        ANALYZE;
+    ''')
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+    os.replace(tmp_path, path)
+
+
+class AdressIndex:
+    def __init__(self, path: str):
+        # nur lesend, damit mehrere Server-Threads die Verbindung gemeinsam nutzen können
+        self.con = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+
+    def _bezirke(self, stimmbezirke: Iterable[str]) -> List[Dict[str, Optional[str]]]:
+        result = []
+        for sb in sorted(set(stimmbezirke)):
+            row = self.con.execute("SELECT wahlbezirk, wahlbezirk_name FROM bezirke WHERE stimmbezirk = ?", (sb,)).fetchone()
+            result.append({"stimmbezirk": sb, "wahlbezirk": row and row[0], "wahlbezirk_name": row and row[1]})
+        return result
+
+    def lookup(self, strasse: str, hausnummer: str) -> Dict[str, Any]:
+        key = strasse_key(strasse)
+        nr, zusatz = split_nr(hausnummer)
+        result: Dict[str, Any] = {"strasse": strasse, "hausnummer": hausnummer, "quelle": None, "bezirke": []}
+        row = self.con.execute("SELECT strasse, bereich_key FROM strassen WHERE strasse_key = ?", (key,)).fetchone()
+        if row is None:
+            return result
+        result["strasse"], bereich_key = row
+
+        # 1. exakte Adresse aus den Hauskoordinaten
+        found = [_[0] for _ in self.con.execute(
+            "SELECT stimmbezirk FROM adressen WHERE strasse_key = ? AND nr IS ? AND zusatz = ?", (key, nr, zusatz))]
+        if found:
+            result["quelle"] = "hauskoordinaten"
+            result["bezirke"] = self._bezirke(found)
+            return result
+        if nr is None:
+            return result
+
+        # 2. Bereichs- und Paritätsregeln der Straßenzuordnung
+        paritaet = GERADE if nr % 2 == 0 else UNGERADE
+        found = [_[0] for _ in self.con.execute(
+            "SELECT stimmbezirk FROM bereiche WHERE strasse_key = ? AND von <= ? AND bis >= ? AND paritaet IN (?, ?) "
+            "AND (zusatz IS NULL OR zusatz = ?)",
+            (bereich_key, nr, nr, ALLE, paritaet, zusatz))]
+        if found:
+            result["quelle"] = "bereich"
+            result["bezirke"] = self._bezirke(found)
+        return result
+
+
+class AdressHandler(BaseHTTPRequestHandler):
+    index: AdressIndex
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/stimmbezirk":
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        if "strasse" not in query or "nr" not in query:
+            self.send_error(400, "Parameter strasse und nr erforderlich")
+            return
+        start = perf_counter()
+        result = self.index.lookup(query["strasse"][0], query["nr"][0])
+        result["dauer_ms"] = round((perf_counter() - start) * 1000, 3)
+        body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self.send_response(200 if result["bezirke"] else 404)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == "__main__":
+    indexpath = "./opendata-zuordnung.sqlite"
+    host, port = "localhost", 8010
+
+    AdressHandler.index = AdressIndex(indexpath)
+    with ThreadingHTTPServer((host, port), AdressHandler) as server:
+        print(f"Adresssuche auf http://{host}:{port}/stimmbezirk?strasse=...&nr=...")
+        server.serve_forever()
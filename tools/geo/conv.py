@@ -2,21 +2,12 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
-from csv import reader, writer
+from csv import DictReader, reader, writer
 from dataclasses import dataclass
 from typing import Dict, List, Any, Set, Optional, Tuple
 
-# Key: OpenData-Zuordnungen, Value: OpenData-Hauskoordinaten
-replacements = {
-    "Friedr.-Gustav-Theis-Weg": "Friedrich-Gustav-Theis-Weg",
-    "Geschw.-Scholl-Str.": "Geschwister-Scholl-Str.",
-    "Karl-E.-Osthaus-Str.": "Karl-Ernst-Osthaus-Str.",
-    "Lievinstr.": "Liévinstr."
-}
-noconv = [
-    "Joh.-Gottlieb-Fichte-Str.",
-    "Johann-F.-Oberlin-Str.",
-]
+from adressindex import write_index
+from strassennamen import Strassennamen
 
 @dataclass
 class Zuordnung:
@@ -28,15 +19,20 @@ class Zuordnung:
     place: str
     bez_id: str
 
-    def __post_init__(self):
-        if self.street in replacements:
-            self.street = replacements[self.street]
-        if self.street.endswith("tr.") and self.street not in noconv:
-            self.street = self.street.replace("tr.", "traße")
-
+# Straßenzuordnung der Stimmbezirke (Straße, Hausnummern-Bereiche, Stimmbezirk)
 fpath = "./opendata-strassen.csv"
+# Hauskoordinaten (Hausnummern mit Koordinaten, amtliche Hauskoordinaten)
 hausnrpath = "./Hauskoordinaten.csv"
+# Ausgabe: Hauskoordinaten mit Stimmbezirk
 outpath = "./opendata-zuordnung.csv"
+# aufgelöste Abweichungen der Straßennamen, kann von Hand korrigiert werden
+strassencachepath = "./strassennamen-zuordnung.csv"
+# Ausgabe: Adressindex für adressindex.py
+indexpath = "./opendata-zuordnung.sqlite"
+# Wahlgebietseinteilungen-csv einer Wahl mit denselben Stimmbezirken (bezirk-nr), daraus kommt die Zuordnung
+# Stimmbezirk -> Wahlbezirk (gebiet-ebene-2) im Index; None: Index ohne Wahlbezirke. Für Hagen z. B.
+# "../../src/data/hagen-kommunal2020/05914000_20200913_Ratswahl_Wahlgebietseinteilungen_V0-2_20201024T191200.csv"
+gebietepath: Optional[str] = None
 zuordnungen: Dict[str, List[Zuordnung]] = defaultdict(list)
 
 # Beispiel:
@@ -68,9 +64,11 @@ def check_rangelists(data: Dict[str, List[str]], check_no: str) -> Optional[str]
     return ",".join(valid) if valid else None
 
 def check(street: str, check_no: str) -> str:
-    if street not in zuordnungen:
+    # Straßennamen der Hauskoordinaten auf die der Zuordnungen abbilden
+    z_street = strassennamen.resolve(street)
+    if z_street is None:
         return "???Straße"
-    str_z = zuordnungen[street]
+    str_z = zuordnungen[z_street]
     if len(str_z) == 1 and str_z[0].nrs == "":
         return str_z[0].bez_id
     bez_ids_ranges: Dict[str, List[str]] = {z.bez_id: z.nrs.split(',') for z in str_z}
@@ -86,6 +84,8 @@ with open(fpath, "r", encoding="utf-8") as csvf:
         z = Zuordnung(*l)
         zuordnungen[z.street].append(z)
 
+strassennamen = Strassennamen(zuordnungen.keys(), strassencachepath)
+
 @dataclass
 class Hauskoordinate:
     plz: str
@@ -114,8 +114,19 @@ with open(hausnrpath, "r", encoding="utf-8") as csvf:
 
 for hk in hauskoordinaten:
     hk.bez_id = check(hk.street, hk.nr)
+strassennamen.save()
 
 with open(outpath, "w", newline="", encoding="utf-8") as csvf:
     csvw = writer(csvf, delimiter=";")
     csvw.writerow(("PLZ", "Ort", "Straße", "Hausnummer", "X", "Y", "Stimmbezirk"))
     csvw.writerows((hk.row() for hk in hauskoordinaten))
+
+wahlbezirke: Dict[str, Tuple[str, str]] = dict()
+if not gebietepath:
+    print("gebietepath nicht gesetzt: Index ohne Zuordnung Stimmbezirk -> Wahlbezirk")
+else:
+    with open(gebietepath, "r", encoding="utf-8") as csvf:
+        for row in DictReader(csvf, delimiter=";"):
+            wahlbezirke[row["bezirk-nr"]] = (row["gebiet-ebene-2-nr"], row["gebiet-ebene-2-name"])
+
+write_index(indexpath, hauskoordinaten, (z for zs in zuordnungen.values() for z in zs), wahlbezirke, strassennamen)
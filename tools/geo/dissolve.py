@@ -0,0 +1,110 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Vorab aufgelöste Geodaten für Ebenen mit `dissolve: true` in src/js/config.js.
+
+Die Webanwendung ordnet sonst bei jedem Wechsel der Ebene jedes Feature über die Wahlgebietseinteilungen seinem
+(virtuellen) Gebiet zu und löst mit turf dissolve auf. Hier passiert das einmalig: je Ebene wird eine GeoJSON-Datei
+neben die ursprüngliche geschrieben (<name>.<Ebene>.geojson), die in config.js als `dissolvedGeoJson` eingetragen wird.
+Die Features tragen wie nach dem turf-dissolve die Gebietsnummer in virtualField und keyProp.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import shapely
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import iter_wahlen, read_owd_csv, termin_dir  # noqa: E402
+
+# Koordinaten runden (6 Nachkommastellen ~ 0,1 m)
+precision = 6
+# Löcher kleiner als das (in Grad², ~70 m² in Deutschland) sind Lücken zwischen nicht ganz deckungsgleichen Grenzen
+min_lochflaeche = 1e-8
+
+
+def _polygonal(geom: Any) -> Any:
+    '''nur Flächen behalten (make_valid/union können Linienreste liefern) und Splitter-Löcher schließen'''
+    polygone = []
+    for part in shapely.get_parts(geom):
+        if isinstance(part, shapely.MultiPolygon):
+            polygone.extend(part.geoms)
+        elif isinstance(part, shapely.Polygon):
+            polygone.append(part)
+    polygone = [shapely.Polygon(p.exterior, [r for r in p.interiors if shapely.Polygon(r).area >= min_lochflaeche])
+                for p in polygone]
+    return polygone[0] if len(polygone) == 1 else shapely.MultiPolygon(polygone)
+
+
+def gebiet_zuordnung(gebiete: List[Dict[str, str]], field: str, uniqueId: bool) -> Dict[Tuple[Optional[str], str], str]:
+    '''(wahl-behoerde-gs oder None, bezirk-nr) -> Nummer des Gebiets der aufzulösenden Ebene'''
+    result = {}
+    for row in gebiete:
+        if not row.get(field):
+            print(f"  Bezirk {row['bezirk-nr']}: kein Wert für {field}")
+            continue
+        result[(None if uniqueId else row["wahl-behoerde-gs"], row["bezirk-nr"])] = row[field]
+    return result
+
+
+def dissolve(geojson: Dict[str, Any], zuordnung: Dict[Tuple[Optional[str], str], str],
+             ebene: Dict[str, Any]) -> Dict[str, Any]:
+    key_prop, gs_prop, field = ebene["keyProp"], ebene.get("gsProp"), ebene["virtualField"]
+    gruppen: Dict[Tuple[Optional[str], str], List[Any]] = defaultdict(list)
+    for feature in geojson["features"]:
+        props = feature["properties"]
+        gs = None if ebene["uniqueId"] else props.get(gs_prop)
+        nr = zuordnung.get((gs, str(props.get(key_prop))))
+        if nr is None:
+            # im Browser wäre das ein Fehler ("Could not find 1 virtual Gebiet")
+            raise ValueError(f"Feature {key_prop}={props.get(key_prop)} keinem Gebiet in {field} zugeordnet")
+        gruppen[(gs, nr)].append(shapely.geometry.shape(feature["geometry"]))
+
+    keys = list(gruppen)
+    # auf das Raster der Ausgabe snappen, dann schließen sich die meisten Fugen zwischen den Bezirken schon beim Vereinigen
+    flaechen = [_polygonal(shapely.union_all(shapely.make_valid(gruppen[k]), grid_size=10 ** -precision)) for k in keys]
+    features = []
+    for (gs, nr), flaeche in zip(keys, flaechen):
+        props = {field: nr, key_prop: nr}
+        if gs is not None:
+            props[gs_prop] = gs
+        features.append({"type": "Feature", "properties": props, "geometry": json.loads(shapely.to_geojson(flaeche))})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def main() -> None:
+    # je Ausgabedatei die Zuordnung merken, damit Wahlen mit gemeinsamer Ebenen-Konfiguration nicht doppelt rechnen
+    erledigt: Dict[str, Dict[Tuple[Optional[str], str], str]] = {}
+    for termin, wahl in iter_wahlen():
+        for name, ebene in wahl["ebenen"].items():
+            if not ebene.get("dissolve") or not ebene.get("geoJson"):
+                continue
+            basedir = termin_dir(termin)
+            srcpath = os.path.normpath(os.path.join(basedir, ebene["geoJson"]))
+            outpath = f"{os.path.splitext(srcpath)[0]}.{name}.geojson"
+            gebiete = read_owd_csv(os.path.join(basedir, wahl["gebietePath"]), wahl["name"])
+            zuordnung = gebiet_zuordnung(gebiete, ebene["virtualField"], ebene["uniqueId"])
+            if outpath in erledigt:
+                if erledigt[outpath] != zuordnung:
+                    print(f"Achtung: {wahl['name']} ordnet {name} anders zu als eine andere Wahl von {termin['name']}, "
+                          f"{os.path.basename(outpath)} passt nicht für beide")
+                continue
+            erledigt[outpath] = zuordnung
+
+            with open(srcpath, "r", encoding="utf-8") as f:
+                geojson = json.load(f)
+            result = dissolve(geojson, zuordnung, ebene)
+            with open(outpath, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+            print(f"{termin['name']} / {name}: {len(geojson['features'])} -> {len(result['features'])} Features, "
+                  f"{os.path.getsize(srcpath) // 1024} -> {os.path.getsize(outpath) // 1024} KiB, {os.path.relpath(outpath)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+GeoJSON-Ebenen mit eingebauten Ergebnissen (<Wahlergebnisse>.<Ebene>.geojson), für Einbettungen und GIS, die nicht
+wie die Webanwendung keyProp mit den Wahlergebnissen verbinden sollen.
+
+Je Feature kommen zu den vorhandenen Properties hinzu:
+    gebiet_name, bezirke, ergebnisse (Anzahl Bezirke / davon mit Ergebnis)
+    je Feld ohne Datentyp aus der Ergebnis-Klasse (ergebnisType): Summe bzw. Anteil in Prozent (z. B. wahlbeteiligung)
+    je Stimmenfeld: <propName> (gültige Stimmen), <propName>_<Partei> (Stimmen), <propName>_<Partei>_anteil (Prozent)
+Gebiete ohne Ergebnis bekommen null. Features, deren Schlüssel in der Ebene fehlt, werden unverändert übernommen
+(tools/abgleich.py zeigt, welche das sind).
+
+Die Features werden einzeln gelesen und geschrieben, im Speicher liegen nur die Ergebnisse je Gebiet.
+
+Benötigt: pip install fiona
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+import fiona
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ergebnisse import BerechnetesFeld, Ebene, GesammeltesFeld, KonstantesFeld, WahlDaten, iter_wahldaten  # noqa: E402
+from wahlconfig import ebene_geojson, js_str  # noqa: E402
+
+# Nachkommastellen der Anteile
+stellen = 2
+
+
+def _zahl(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+def _prozent(zaehler: np.ndarray, nenner: np.ndarray) -> List[Optional[float]]:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        werte = zaehler / nenner * 100
+    return [None if not np.isfinite(v) else round(float(v), stellen) for v in werte]
+
+
+def ergebnis_properties(wahl: WahlDaten, ebene: Ebene) -> List[Dict[str, Any]]:
+    '''Properties mit den Ergebnissen je Gebiet der Ebene (Reihenfolge wie ebene.gebiete)'''
+    zugeordnet = ebene.zuordnung >= 0
+    anzahl = len(ebene.gebiete)
+    spalten: Dict[str, List[Any]] = {
+        "gebiet_name": ebene.namen,
+        "bezirke": np.bincount(ebene.zuordnung[zugeordnet], minlength=anzahl).tolist(),
+        "ergebnisse": np.bincount(ebene.zuordnung[zugeordnet], weights=wahl.vorhanden[zugeordnet],
+                                  minlength=anzahl).astype(int).tolist(),
+    }
+    for feld in wahl.typ.felder:
+        if isinstance(feld, KonstantesFeld):
+            spalten[feld.propName] = [_zahl(v) for v in ebene.summe(wahl.konstante(feld.propName))]
+        elif isinstance(feld, BerechnetesFeld):
+            zaehler, nenner = (ebene.summe(wahl.konstante(arg)) for arg in feld.args)
+            spalten[feld.propName] = _prozent(zaehler, nenner)
+        elif isinstance(feld, GesammeltesFeld):
+            gueltig = ebene.summe(wahl.gueltig(feld))
+            spalten[feld.propName] = [_zahl(v) for v in gueltig]
+            parteien, stimmen = wahl.stimmen(feld)
+            stimmen = ebene.summe(stimmen)
+            for p, partei in enumerate(parteien):
+                spalten[f"{feld.propName}_{partei}"] = [_zahl(v) for v in stimmen[:, p]]
+                spalten[f"{feld.propName}_{partei}_anteil"] = _prozent(stimmen[:, p], gueltig)
+    return [{name: werte[i] for name, werte in spalten.items()} for i in range(anzahl)]
+
+
+def _features(path: str, ebene: Ebene, ergebnisse: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    index = {key: i for i, key in enumerate(ebene.gebiete)}
+    config = ebene.config
+    with fiona.open(path) as src:
+        for feature in src:
+            properties = dict(feature.properties)
+            key_id = properties.get(config["keyProp"])
+            if key_id not in (None, ""):
+                gs = None if config["uniqueId"] else js_str(properties.get(config.get("gsProp"), ""))
+                i = index.get((gs, js_str(key_id)))
+                if i is not None:
+                    properties.update(ergebnisse[i])
+            yield {"type": "Feature", "geometry": feature.geometry.__geo_interface__ if feature.geometry else None,
+                   "properties": properties}
+
+
+def write_layer(path: str, outpath: str, ebene: Ebene, ergebnisse: List[Dict[str, Any]]) -> int:
+    anzahl = 0
+    tmp_path = outpath + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        for feature in _features(path, ebene, ergebnisse):
+            if anzahl:
+                f.write(",\n")
+            f.write(json.dumps(feature, ensure_ascii=False, separators=(",", ":")))
+            anzahl += 1
+        f.write("\n]}\n")
+    os.replace(tmp_path, outpath)
+    return anzahl
+
+
+def ausgabepfad(wahl: WahlDaten, ebene: Ebene) -> str:
+    return f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.{ebene.name}.geojson"
+
+
+def main() -> None:
+    for wahl in iter_wahldaten():
+        for ebene in wahl.ebenen():
+            path = ebene_geojson(wahl.termin, ebene.config, "dissolvedGeoJson") or ebene_geojson(wahl.termin, ebene.config)
+            if not path:
+                continue
+            if ebene.config.get("dissolve") and not ebene.config.get("dissolvedGeoJson"):
+                # die Webanwendung fasst die Bezirke erst beim Laden zusammen (tools/geo/dissolve.py erzeugt die Datei)
+                print(f"{wahl.termin['name']} / {wahl.name} / {ebene.name}: übersprungen, dissolvedGeoJson fehlt")
+                continue
+            start = perf_counter()
+            outpath = ausgabepfad(wahl, ebene)
+            anzahl = write_layer(path, outpath, ebene, ergebnis_properties(wahl, ebene))
+            print(f"{wahl.termin['name']} / {wahl.name} / {ebene.name}: {anzahl} Features, "
+                  f"{os.path.getsize(outpath) // 1024} KiB, {perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+FlatGeobuf-Kopien (<name>.fgb) der GeoJSON-Dateien aus src/js/config.js, mit gepacktem Hilbert-R-Baum als Index.
+
+Damit können die Webanwendung oder ein GIS per HTTP-Range-Request nur die Features im aktuellen Ausschnitt laden.
+Die Features werden einzeln von der Quelle in die Ausgabe geschrieben, die Ebene liegt nie vollständig im Speicher
+(den Index baut GDAL beim Schließen über eine temporäre Datei).
+
+Benötigt: pip install fiona
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+import fiona
+from fiona.model import Feature, Geometry
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import config_dateien  # noqa: E402
+
+# None: alle in config.js verwendeten Dateien
+dateien: Optional[List[str]] = None
+
+
+def _multi(features: Iterator[Feature]) -> Iterator[Dict[str, Any]]:
+    '''FlatGeobuf verlangt einen Geometrietyp je Datei, Polygon und MultiPolygon gemischt -> MultiPolygon'''
+    for feature in features:
+        geom = feature.geometry
+        if geom is not None and geom.type == "Polygon":
+            geom = Geometry(type="MultiPolygon", coordinates=[geom.coordinates])
+        yield Feature(geometry=geom, properties=feature.properties)
+
+
+def write_fgb(path: str) -> str:
+    outpath = os.path.splitext(path)[0] + ".fgb"
+    tmp_path = os.path.splitext(path)[0] + ".tmp.fgb"  # GDAL erkennt das Format an der Endung
+    with fiona.open(path) as src:
+        schema = dict(src.schema)
+        if schema["geometry"] in ("Polygon", "MultiPolygon", "Unknown"):
+            schema["geometry"] = "MultiPolygon"
+        with fiona.open(tmp_path, "w", driver="FlatGeobuf", schema=schema, crs=src.crs or "OGC:CRS84",
+                        SPATIAL_INDEX="YES", TEMPORARY_DIR=os.path.dirname(outpath)) as dst:
+            for feature in _multi(iter(src)):
+                dst.write(feature)
+    os.replace(tmp_path, outpath)
+    return outpath
+
+
+def main() -> None:
+    for path in dateien or config_dateien():
+        start = perf_counter()
+        outpath = write_fgb(path)
+        print(f"{os.path.relpath(path)}: {os.path.getsize(path) // 1024} -> {os.path.getsize(outpath) // 1024} KiB, "
+              f"{perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
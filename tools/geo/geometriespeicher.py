@@ -0,0 +1,242 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Geometriespeicher über alle Datenverzeichnisse (src/data/geometrien): jede Geometrie wird nur einmal abgelegt, die
+Ebenen der Wahltermine verweisen nur noch auf die Geometrien.
+
+Dieselben Grenzen stehen in vielen Datensätzen (Stadtbezirke Hagen in jeder Wahl, ebene_6 in BTW 2021 und 2025,
+...). Die Geometrien liegen in Paketen: ein Paket enthält alle Geometrien, die von genau denselben Ebenen verwendet
+werden, also je Ebene eines mit ihren eigenen Geometrien und je Gruppe von Ebenen eines mit den gemeinsamen. Eine Ebene
+lädt so nur Pakete, deren Geometrien sie ganz braucht, und wenige Dateien statt einer je Geometrie. Die Pakete sind
+nach dem Hash ihres Inhalts benannt: ein unverändertes Paket hat in jedem Datensatz dieselbe URL und muss vom Browser
+nur einmal geladen werden.
+
+Normalisierung: Koordinaten auf `stellen` Nachkommastellen gerundet (6: ca. 0,1 m), Ringe und Teile in die
+Reihenfolge von shapely.normalize gebracht, die Ringe dann nach RFC 7946 ausgerichtet (außen gegen den Uhrzeigersinn,
+Löcher im Uhrzeigersinn). Gleich sind Geometrien mit gleichem WKB.
+
+Aufbau:
+    geometrien/p/<hash>.json                Paket: Array von GeoJSON-Geometrien, Hash: SHA-256 des Inhalts,
+                                            die ersten `hashlaenge` Hex-Zeichen
+    geometrien/ebenen/<Datei>.json          Ebene zu src/data/<Datei> (ohne Endung): {"type": "Geometrien",
+                                            "quelle": Datei, "pakete": [Pfade relativ zur Ebene],
+                                            "features": [{"g": [Paket, Position] oder null, "properties": {...}}]}
+    geometrien/index.json                   {"ebenen": {Datei: Ebene relativ zum Speicher}, "pakete", "geometrien",
+                                            "features": Anzahl}
+
+In config.js verweist `geometrien` einer Ebene auf die Ebene im Speicher (relativ zur baseUrl des Wahltermins,
+z. B. "../geometrien/ebenen/hagen-btw2025/stadtbezirke.json"), die Webanwendung lädt dann diese statt geoJson bzw.
+dissolvedGeoJson (fetchGeoJson in src/js/utils.js). Ohne `dateien` kommen genau diese Ebenen in den Speicher.
+
+zusammensetzen() baut aus einer Ebene wieder eine FeatureCollection. Pakete und Ebenen, auf die der Index nicht
+verweist, entfernt aufraeumen().
+
+Benötigt: pip install shapely
+'''
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+from time import perf_counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import datapath, ebene_geojson, iter_wahlen, termin_dir  # noqa: E402
+
+speicherpath = os.path.join(datapath, "data", "geometrien")
+stellen = 6
+hashlaenge = 20
+# GeoJSON-Dateien, None: die Ebenen mit `geometrien` in config.js
+dateien: Optional[List[str]] = None
+
+
+def ebene_pfad(path: str) -> str:
+    '''Pfad der Ebene im Speicher zu einer GeoJSON-Datei'''
+    rel = os.path.relpath(os.path.splitext(path)[0], os.path.join(datapath, "data"))
+    return os.path.normpath(os.path.join(speicherpath, "ebenen", f"{rel}.json"))
+
+
+def config_ebenen() -> List[str]:
+    '''GeoJSON-Dateien der Ebenen mit `geometrien` in config.js (dissolvedGeoJson vor geoJson wie in der Webanwendung)'''
+    result: List[str] = []
+    for termin, wahl in iter_wahlen():
+        for name, ebene in wahl["ebenen"].items():
+            if not ebene.get("geometrien"):
+                continue
+            path = ebene_geojson(termin, ebene, "dissolvedGeoJson") or ebene_geojson(termin, ebene)
+            if not path:
+                continue
+            erwartet = ebene_pfad(path)
+            if os.path.normpath(os.path.join(termin_dir(termin), ebene["geometrien"])) != erwartet:
+                print(f"{termin['name']} / {wahl['name']} / {name}: geometrien sollte "
+                      f"{os.path.relpath(erwartet, termin_dir(termin))} sein", file=sys.stderr)
+            if path not in result:
+                result.append(path)
+    return result
+
+
+def _json(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def _schreiben(path: str, inhalt: bytes) -> bool:
+    '''schreibt nur, wenn sich der Inhalt ändert'''
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == inhalt:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(inhalt)
+    os.replace(tmp_path, path)
+    return True
+
+
+def normalisieren(geometrie: Dict[str, Any]) -> shapely.Geometry:
+    geom = shapely.transform(shape(geometrie), lambda c: np.round(c, stellen))
+    # normalize dreht äußere Ringe im Uhrzeigersinn, GeoJSON (RFC 7946) verlangt sie gegen den Uhrzeigersinn
+    return shapely.orient_polygons(shapely.normalize(geom), exterior_cw=False)
+
+
+def paket_pfad(h: str) -> str:
+    return os.path.normpath(os.path.join(speicherpath, "p", f"{h}.json"))
+
+
+class Speicher:
+    '''sammelt die Geometrien aller Ebenen, schreiben() teilt sie in Pakete und legt Pakete und Ebenen ab'''
+
+    def __init__(self) -> None:
+        self.geometrien: Dict[bytes, Dict[str, Any]] = {}  # WKB -> GeoJSON-Geometrie
+        self.nutzer: Dict[bytes, List[int]] = {}  # WKB -> Ebenen
+        self.ebenen: List[Tuple[str, List[Tuple[Optional[bytes], Dict[str, Any]]]]] = []
+
+    def ebene(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+        nummer = len(self.ebenen)
+        features: List[Tuple[Optional[bytes], Dict[str, Any]]] = []
+        for feature in collection.get("features", []):
+            wkb = None
+            if feature.get("geometry"):
+                geom = normalisieren(feature["geometry"])
+                wkb = shapely.to_wkb(geom)
+                if wkb not in self.geometrien:
+                    self.geometrien[wkb] = mapping(geom)
+                    self.nutzer[wkb] = []
+                if not self.nutzer[wkb] or self.nutzer[wkb][-1] != nummer:
+                    self.nutzer[wkb].append(nummer)
+            features.append((wkb, feature.get("properties") or {}))
+        self.ebenen.append((path, features))
+
+    @property
+    def features(self) -> int:
+        return sum(len(features) for _, features in self.ebenen)
+
+    def schreiben(self) -> Tuple[Dict[str, str], int, int]:
+        '''(Datei relativ zu src/data -> Ebene relativ zum Speicher, Anzahl Pakete, davon neu geschrieben)'''
+        gruppen: Dict[FrozenSet[int], List[bytes]] = {}
+        for wkb, nutzer in self.nutzer.items():
+            gruppen.setdefault(frozenset(nutzer), []).append(wkb)
+        # je Geometrie (Paket-Hash, Position)
+        position: Dict[bytes, Tuple[str, int]] = {}
+        geschrieben = 0
+        for wkbs in gruppen.values():
+            wkbs.sort()
+            inhalt = _json([self.geometrien[wkb] for wkb in wkbs])
+            h = hashlib.sha256(inhalt).hexdigest()[:hashlaenge]
+            geschrieben += _schreiben(paket_pfad(h), inhalt)
+            position.update((wkb, (h, i)) for i, wkb in enumerate(wkbs))
+
+        index: Dict[str, str] = {}
+        for path, features in self.ebenen:
+            outpath = ebene_pfad(path)
+            pakete: List[str] = []
+            eintraege = []
+            for wkb, properties in features:
+                g = None
+                if wkb is not None:
+                    h, i = position[wkb]
+                    if h not in pakete:
+                        pakete.append(h)
+                    g = [pakete.index(h), i]
+                eintraege.append({"g": g, "properties": properties})
+            quelle = os.path.relpath(path, os.path.join(datapath, "data")).replace(os.sep, "/")
+            _schreiben(outpath, _json({
+                "type": "Geometrien",
+                "quelle": quelle,
+                "pakete": [os.path.relpath(paket_pfad(h), os.path.dirname(outpath)).replace(os.sep, "/")
+                           for h in pakete],
+                "features": eintraege,
+            }))
+            index[quelle] = os.path.relpath(outpath, speicherpath).replace(os.sep, "/")
+        return index, len(gruppen), geschrieben
+
+
+def zusammensetzen(ebene: str) -> Dict[str, Any]:
+    '''FeatureCollection aus einer Ebene des Speichers (Pfad relativ zum Speicher)'''
+    path = os.path.join(speicherpath, ebene)
+    with open(path, "r", encoding="utf-8") as f:
+        eintrag = json.load(f)
+    pakete = []
+    for paket in eintrag["pakete"]:
+        with open(os.path.join(os.path.dirname(path), paket), "r", encoding="utf-8") as f:
+            pakete.append(json.load(f))
+    features = [{"type": "Feature", "geometry": pakete[f["g"][0]][f["g"][1]] if f["g"] else None,
+                 "properties": f["properties"]} for f in eintrag["features"]]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def aufraeumen(index: Dict[str, Any]) -> int:
+    '''entfernt Ebenen und Pakete, auf die der Index nicht verweist'''
+    ebenen = {os.path.normpath(os.path.join(speicherpath, _)) for _ in index["ebenen"].values()}
+    benutzt = set()
+    for ebene in ebenen:
+        with open(ebene, "r", encoding="utf-8") as f:
+            benutzt.update(os.path.normpath(os.path.join(os.path.dirname(ebene), _)) for _ in json.load(f)["pakete"])
+    entfernt = 0
+    for ordner, behalten in (("ebenen", ebenen), ("p", benutzt)):
+        for wurzel, _, namen in os.walk(os.path.join(speicherpath, ordner), topdown=False):
+            for name in namen:
+                path = os.path.normpath(os.path.join(wurzel, name))
+                if path not in behalten:
+                    os.remove(path)
+                    entfernt += 1
+            if wurzel != os.path.join(speicherpath, ordner) and not os.listdir(wurzel):
+                os.rmdir(wurzel)
+    return entfernt
+
+
+def main() -> None:
+    start = perf_counter()
+    speicher = Speicher()
+    groesse = 0
+    for path in dateien or config_ebenen():
+        if not os.path.exists(path):
+            print(f"{path}: fehlt", file=sys.stderr)
+            continue
+        groesse += os.path.getsize(path)
+        speicher.ebene(path)
+    ebenen, pakete, geschrieben = speicher.schreiben()
+    index = {"ebenen": ebenen, "pakete": pakete, "geometrien": len(speicher.geometrien), "features": speicher.features}
+    os.makedirs(speicherpath, exist_ok=True)
+    with open(os.path.join(speicherpath, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    entfernt = aufraeumen(index)
+
+    gespeichert = sum(os.path.getsize(os.path.join(w, n)) for w, _, ns in os.walk(speicherpath) for n in ns)
+    print(f"{len(ebenen)} Ebenen, {speicher.features} Features, {len(speicher.geometrien)} Geometrien in {pakete} "
+          f"Paketen ({geschrieben} neu, {entfernt} Dateien entfernt), {groesse // 1024} -> {gespeichert // 1024} KiB, "
+          f"{perf_counter() - start:.2f} s -> {os.path.relpath(speicherpath)}")
+
+
+if __name__ == "__main__":
+    main()
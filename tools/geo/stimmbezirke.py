@@ -0,0 +1,135 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Stimmbezirk-Polygone aus den zugeordneten Hauskoordinaten (Ausgabe von conv.py), ohne QGIS.
+
+Entspricht wahlbezirke.model3: Voronoi-Zellen je Hausnummer, aufgelöst je Stimmbezirk und zugeschnitten auf den
+übergeordneten Bezirk (bzw. ohne übergeordnete Bezirke auf die Gemeindegrenze). Wie im Modell werden Hausnummern
+verworfen, deren angegebener übergeordneter Bezirk nicht zu ihrer Lage passt (bei wahlbezirke-vereinfacht.model3 nicht).
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections import defaultdict
+from csv import DictReader
+from typing import Dict, List, Optional
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import koordinate  # noqa: E402
+
+punktepath = "./opendata-zuordnung-mit-wahlbezirk.csv"
+outpath = "./stimmbezirke.geojson"
+# Felder der Punkte-csv
+bezirk_feld = "Stimmbezirk"
+parent_feld: Optional[str] = "WahlbezirkId"  # None: nur auf die Gemeindegrenze zuschneiden
+# Polygone der übergeordneten Bezirke (WGS84), ohne parent_key wird ihre Vereinigung als Gemeindegrenze verwendet
+grenzenpath = "../../src/data/hagen-kommunal2020/wahlbezirke.geojson"
+grenzen_key: Optional[str] = "Wahlbezirk"
+# Hausnummern mit abweichendem übergeordnetem Bezirk verwerfen (wie wahlbezirke.model3)
+lage_pruefen = True
+# Koordinaten der Hauskoordinaten: UTM 32N mit vorangestellter Zonennummer (z. B. 32396848,472)
+punkte_crs = "EPSG:25832"
+zonen_prefix = "32"
+
+to_wgs84 = Transformer.from_crs(punkte_crs, "EPSG:4326", always_xy=True)
+to_metric = Transformer.from_crs("EPSG:4326", punkte_crs, always_xy=True)
+
+
+def _transform(geoms: np.ndarray, transformer: Transformer) -> np.ndarray:
+    return shapely.transform(geoms, lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])))
+
+
+# Hausnummern einlesen, nicht (eindeutig) zugeordnete auslassen
+xy: List[List[float]] = []
+bezirk_ids: List[str] = []
+parent_ids: List[str] = []
+gesehen: Dict[tuple, str] = {}
+with open(punktepath, "r", encoding="utf-8") as csvf:
+    for row in DictReader(csvf, delimiter=";"):
+        bez_id = row[bezirk_feld]
+        if not bez_id or bez_id.startswith("???") or "," in bez_id:
+            continue
+        pt = (koordinate(row["X"], zonen_prefix), koordinate(row["Y"]))
+        if pt in gesehen:
+            # gleiche Koordinate, Voronoi braucht eindeutige Punkte
+            if gesehen[pt] != bez_id:
+                print(f"Achtung: {row['Straße']} {row['Hausnummer']} liegt auf einem Punkt von Bezirk {gesehen[pt]}, nicht {bez_id}")
+            continue
+        gesehen[pt] = bez_id
+        xy.append(list(pt))
+        bezirk_ids.append(bez_id)
+        parent_ids.append(row[parent_feld] if parent_feld else "")
+
+punkte = shapely.points(np.array(xy))
+bezirk_arr = np.array(bezirk_ids)
+parent_arr = np.array(parent_ids)
+print(f"{len(punkte)} Hausnummern")
+
+# Grenzen in das metrische System der Punkte bringen
+with open(grenzenpath, "r", encoding="utf-8") as f:
+    grenzen_json = json.load(f)
+grenzen = _transform(np.array([shapely.geometry.shape(feat["geometry"]) for feat in grenzen_json["features"]]), to_metric)
+grenzen = shapely.make_valid(grenzen)
+if parent_feld and grenzen_key:
+    grenzen_ids = np.array([str(feat["properties"][grenzen_key]) for feat in grenzen_json["features"]])
+    grenze_je_parent = {pid: shapely.union_all(grenzen[grenzen_ids == pid]) for pid in np.unique(grenzen_ids)}
+else:
+    grenze_je_parent = {}
+gemeinde = shapely.union_all(grenzen)
+
+if lage_pruefen and grenze_je_parent:
+    # Punkt -> Grenzpolygon über den STRtree, Punkte außerhalb ihres angegebenen Bezirks verwerfen
+    tree = shapely.STRtree(grenzen)
+    p_idx, g_idx = tree.query(punkte, predicate="within")
+    passt = np.zeros(len(punkte), dtype=bool)
+    passt[p_idx[grenzen_ids[g_idx] == parent_arr[p_idx]]] = True
+    print(f"{np.count_nonzero(~passt)} Hausnummern liegen nicht in ihrem übergeordneten Bezirk und werden verworfen")
+    punkte, bezirk_arr, parent_arr = punkte[passt], bezirk_arr[passt], parent_arr[passt]
+
+# Voronoi-Zellen, die Reihenfolge der Ausgabe ist nicht die der Punkte -> Zuordnung über STRtree
+zellen = np.array(shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(punkte), extend_to=shapely.envelope(gemeinde).buffer(1000))))
+p_idx, z_idx = shapely.STRtree(zellen).query(punkte, predicate="within")
+zelle_je_punkt = np.full(len(punkte), -1)
+zelle_je_punkt[p_idx] = z_idx
+if (zelle_je_punkt < 0).any():
+    print(f"Achtung: {np.count_nonzero(zelle_je_punkt < 0)} Hausnummern ohne Voronoi-Zelle")
+
+# je Stimmbezirk auflösen und zuschneiden
+gruppen: Dict[str, List[int]] = defaultdict(list)
+for i, bez_id in enumerate(bezirk_arr):
+    if zelle_je_punkt[i] >= 0:
+        gruppen[bez_id].append(zelle_je_punkt[i])
+ids = sorted(gruppen)
+# die Zellen überlappen sich nicht, coverage_union ist dafür deutlich schneller als union_all
+flaechen = np.array([shapely.coverage_union_all(zellen[gruppen[bez_id]]) for bez_id in ids])
+parent_je_bezirk = {bez_id: parent for bez_id, parent in zip(bezirk_arr, parent_arr)}
+clip = np.array([grenze_je_parent.get(parent_je_bezirk[bez_id], gemeinde) for bez_id in ids])
+flaechen = shapely.intersection(flaechen, clip)
+flaechen = _transform(flaechen, to_wgs84)
+flaechen = shapely.transform(flaechen, lambda c: np.round(c, 6))
+
+features = []
+for bez_id, flaeche in zip(ids, flaechen):
+    if flaeche.is_empty:
+        print(f"Achtung: Stimmbezirk {bez_id} ist nach dem Zuschneiden leer")
+        continue
+    properties = {bezirk_feld: bez_id}
+    if parent_feld:
+        properties[grenzen_key or parent_feld] = parent_je_bezirk[bez_id]
+    features.append({"type": "Feature", "properties": properties, "geometry": json.loads(shapely.to_geojson(flaeche))})
+
+with open(outpath, "w", encoding="utf-8") as f:
+    json.dump({
+        "type": "FeatureCollection",
+        "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
+        "features": features
+    }, f, ensure_ascii=False, separators=(",", ":"))
+print(f"{len(features)} Stimmbezirke geschrieben: {outpath}")
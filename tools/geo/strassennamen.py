@@ -0,0 +1,141 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Normalisierung von Straßennamen zwischen zwei Registern (z. B. Straßenzuordnung der Wahlbezirke und Hauskoordinaten).
+
+Jeder Name bekommt einen kanonischen Schlüssel (Abkürzungen ausgeschrieben, ohne Akzente, ohne Leerzeichen/Bindestriche).
+Was danach noch nicht passt, wird über einen Trigramm-Index mit Ähnlichkeitswert aufgelöst.
+Die so gefundenen Zuordnungen landen in einer csv-Datei, spätere Läufe brauchen dann keine unscharfe Suche mehr.
+Die csv kann auch von Hand korrigiert werden, sie hat Vorrang vor der unscharfen Suche, aber nicht vor einem genau
+passenden Namen. Ein leeres Ziel bedeutet "keine Zuordnung" (auch von Hand eingetragen), Einträge mit einem Ziel, das
+es im Register nicht mehr gibt, werden neu gesucht.
+'''
+
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from csv import reader, writer
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Abkürzungen, nur als eigenes Wort mit Punkt
+abkuerzungen = {
+    "str": "strasse",
+    "pl": "platz",
+    "friedr": "friedrich",
+    "geschw": "geschwister",
+    "joh": "johann",
+    "prof": "professor",
+    "dr": "doktor",
+    "st": "sankt",
+}
+
+_trenner = re.compile(r"[\s\-/]+")
+# Gattungswörter am Ende zählen nicht zur Ähnlichkeit, müssen aber übereinstimmen
+_gattung = re.compile(r"(strasse|weg|platz|allee|ring|gasse|pfad|ufer)$")
+
+
+def canonical_key(name: str) -> str:
+    '''z. B. "Geschw.-Scholl-Str." und "Geschwister-Scholl-Straße" -> "geschwisterschollstrasse"'''
+    s = unicodedata.normalize("NFKD", name.strip().casefold())  # casefold macht aus ß auch ss
+    s = "".join(_ for _ in s if not unicodedata.combining(_))
+    words = []
+    for word in _trenner.split(s):
+        if word.endswith("."):
+            word = word[:-1]
+            if word in abkuerzungen:
+                word = abkuerzungen[word]
+            elif word.endswith("str"):
+                word = word[:-3] + "strasse"
+        words.append(word)
+    return "".join(_ for _ in "".join(words) if _.isalnum())
+
+
+def split_gattung(key: str) -> Tuple[str, str]:
+    '''"ahrstrasse" -> ("ahr", "strasse")'''
+    m = _gattung.search(key)
+    return (key[:m.start()], m.group(1)) if m and m.start() else (key, "")
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Strassennamen:
+    '''Index über die Namen eines Registers (Ziel), in dem Namen des anderen Registers aufgelöst werden.'''
+
+    def __init__(self, namen: Iterable[str], cachepath: Optional[str] = None, min_score: float = 0.7):
+        self.min_score = min_score
+        self.cachepath = cachepath
+        self.keys: Dict[str, str] = {}
+        for name in namen:
+            key = canonical_key(name)
+            if key in self.keys and self.keys[key] != name:
+                print(f"Achtung: {name} und {self.keys[key]} haben den gleichen Schlüssel {key}")
+            self.keys.setdefault(key, name)
+        self.index: Dict[str, Set[str]] = defaultdict(set)
+        self.stems: Dict[str, Tuple[str, str]] = {key: split_gattung(key) for key in self.keys}
+        for key, (stem, _) in self.stems.items():
+            for tg in trigrams(stem):
+                self.index[tg].add(key)
+
+        # Schlüssel -> (Zielname oder "", Score)
+        self.cache: Dict[str, Tuple[str, float]] = {}
+        self._cache_changed = False
+        if cachepath and os.path.exists(cachepath):
+            with open(cachepath, "r", encoding="utf-8") as csvf:
+                csvr = reader(csvf, delimiter=";")
+                next(csvr, None)
+                ziele = set(self.keys.values())
+                for quelle, ziel, score in csvr:
+                    # Fehlschläge (leeres Ziel) bleiben gemerkt, nur Ziele, die es im Register nicht mehr gibt, neu suchen
+                    if not ziel or ziel in ziele:
+                        self.cache[canonical_key(quelle)] = (ziel, float(score))
+                    else:
+                        self._cache_changed = True
+
+    def similar(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        '''Ähnlichste Namen nach Dice-Koeffizient der Trigramme (ohne Gattungswort).'''
+        stem, gattung = split_gattung(canonical_key(name))
+        tgs = trigrams(stem)
+        counts: Counter = Counter()
+        for tg in tgs:
+            counts.update(self.index.get(tg, ()))
+        scored = [
+            (self.keys[k], 2 * common / (len(tgs) + len(trigrams(self.stems[k][0]))))
+            for k, common in counts.most_common()
+            if self.stems[k][1] == gattung
+        ]
+        scored.sort(key=lambda _: _[1], reverse=True)
+        return scored[:limit]
+
+    def resolve(self, name: str) -> Optional[str]:
+        '''Zielname für name oder None, falls nichts ausreichend ähnliches existiert.'''
+        key = canonical_key(name)
+        if key in self.keys:
+            return self.keys[key]
+        if key in self.cache:
+            return self.cache[key][0] or None
+        best = self.similar(name, limit=1)
+        ziel, score = best[0] if best else ("", 0.0)
+        if score < self.min_score:
+            ziel = ""
+        # auch Fehlschläge merken, damit sie nicht jedes Mal neu gesucht werden
+        self.cache[key] = (ziel, round(score, 3))
+        self._cache_changed = True
+        if ziel:
+            print(f"Straße zugeordnet: {name} -> {ziel} ({score:.2f})")
+        return ziel or None
+
+    def save(self) -> None:
+        if not (self.cachepath and self._cache_changed):
+            return
+        with open(self.cachepath, "w", newline="", encoding="utf-8") as csvf:
+            csvw = writer(csvf, delimiter=";")
+            csvw.writerow(("Quelle", "Ziel", "Score"))
+            csvw.writerows(((k, ziel, score) for k, (ziel, score) in sorted(self.cache.items())))
+        self._cache_changed = False
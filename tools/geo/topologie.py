@@ -0,0 +1,201 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Kompiliert die GeoJSON-Dateien aus src/js/config.js zu quantisiertem TopoJSON in mehreren Vereinfachungsstufen.
+
+Gemeinsame Grenzen werden nur einmal als Bogen (arc) gespeichert und auch nur einmal vereinfacht, dadurch entstehen
+zwischen benachbarten Gebieten keine Lücken oder Überlappungen. Je Stufe (Toleranz in Metern) wird
+<name>.<Toleranz>m.topojson neben die GeoJSON-Datei geschrieben (Stufe 0: nur quantisiert, <name>.topojson).
+Die Webanwendung (fetchGeoJson) wandelt TopoJSON beim Laden wieder in GeoJSON um, in config.js kann also direkt
+eine der Dateien als geoJson angegeben werden.
+'''
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import shapely
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import config_dateien  # noqa: E402
+
+# Vereinfachungsstufen, Toleranz in Metern
+stufen = (0, 1, 5)
+# Rasterpunkte je Achse über die Bounding Box (1e5 bei einer Stadt: einige Dezimeter)
+quantisierung = 100000
+# None: alle in config.js verwendeten Dateien
+dateien: Optional[List[str]] = None
+
+Punkt = Tuple[int, int]
+
+
+class Topologie:
+    def __init__(self, geojson: Dict[str, Any], q: int = quantisierung):
+        self.features = geojson["features"]
+        self.polygone: List[List[List[List[Punkt]]]] = []  # je Feature: Polygone -> Ringe -> Punkte
+        coords = []
+        for feature in self.features:
+            geom = feature["geometry"]
+            if geom is None:
+                polys = []
+            elif geom["type"] == "Polygon":
+                polys = [geom["coordinates"]]
+            elif geom["type"] == "MultiPolygon":
+                polys = geom["coordinates"]
+            else:
+                raise ValueError(f"Geometrietyp {geom['type']} wird nicht unterstützt")
+            self.polygone.append(polys)
+            coords.extend(pt[:2] for poly in polys for ring in poly for pt in ring)
+        arr = np.array(coords, dtype=float).reshape(-1, 2)
+        self.x0, self.y0 = arr.min(axis=0) if len(arr) else (0.0, 0.0)
+        x1, y1 = arr.max(axis=0) if len(arr) else (1.0, 1.0)
+        self.bbox = [float(self.x0), float(self.y0), float(x1), float(y1)]
+        self.kx = (x1 - self.x0) / (q - 1) or 1.0
+        self.ky = (y1 - self.y0) / (q - 1) or 1.0
+
+        # quantisieren, doppelte Punkte entfernen
+        self.ringe: List[List[Punkt]] = []
+        self.struktur: List[List[List[int]]] = []  # je Feature: Polygone -> Ring-Indizes
+        for polys in self.polygone:
+            struktur = []
+            for poly in polys:
+                ring_ids = []
+                for ring in poly:
+                    pts: List[Punkt] = []
+                    for x, y, *_ in ring:
+                        pt = (round((x - self.x0) / self.kx), round((y - self.y0) / self.ky))
+                        if not pts or pts[-1] != pt:
+                            pts.append(pt)
+                    if pts[0] != pts[-1]:
+                        pts.append(pts[0])
+                    if len(pts) < 4:
+                        continue  # durch die Quantisierung zusammengefallen
+                    ring_ids.append(len(self.ringe))
+                    self.ringe.append(pts)
+                if ring_ids:
+                    struktur.append(ring_ids)
+            self.struktur.append(struktur)
+        self._schneiden()
+
+    def _schneiden(self) -> None:
+        '''Ringe an Knoten (Punkte mit mehr als zwei verschiedenen Nachbarn) in Bögen zerlegen, gleiche Bögen zusammenfassen.'''
+        nachbarn: Dict[Punkt, Set[Punkt]] = defaultdict(set)
+        for pts in self.ringe:
+            for a, b in zip(pts, pts[1:]):
+                nachbarn[a].add(b)
+                nachbarn[b].add(a)
+        knoten = {pt for pt, n in nachbarn.items() if len(n) > 2}
+
+        self.arcs: List[List[Punkt]] = []
+        index: Dict[Tuple[Punkt, ...], int] = {}
+        self.ring_arcs: List[List[int]] = []
+        for pts in self.ringe:
+            offen = pts[:-1]
+            positionen = [i for i, pt in enumerate(offen) if pt in knoten]
+            if not positionen:
+                # Ring ohne Knoten (Insel oder Loch, das genau einem anderen Gebiet entspricht): einheitlich beginnen
+                start = offen.index(min(offen))
+                teile = [offen[start:] + offen[:start] + [offen[start]]]
+            else:
+                start = positionen[0]
+                gedreht = offen[start:] + offen[:start] + [offen[start]]
+                schnitte = [i - start for i in positionen] + [len(offen)]
+                teile = [gedreht[a:b + 1] for a, b in zip(schnitte, schnitte[1:])]
+            ids = []
+            for teil in teile:
+                key = tuple(teil)
+                if key in index:
+                    ids.append(index[key])
+                elif key[::-1] in index:
+                    ids.append(~index[key[::-1]])
+                else:
+                    index[key] = len(self.arcs)
+                    ids.append(len(self.arcs))
+                    self.arcs.append(teil)
+            self.ring_arcs.append(ids)
+
+    def vereinfacht(self, toleranz: float) -> List[List[Punkt]]:
+        '''Bögen mit Douglas-Peucker vereinfachen (Endpunkte bleiben), toleranz in Rastereinheiten.'''
+        if toleranz <= 0:
+            return self.arcs
+        lines = np.array([shapely.LineString(arc) for arc in self.arcs])
+        simplified = shapely.simplify(lines, toleranz, preserve_topology=False)
+        result: List[List[Punkt]] = []
+        for arc, line in zip(self.arcs, simplified):
+            pts = [(int(x), int(y)) for x, y in shapely.get_coordinates(line)]
+            if arc[0] == arc[-1] and len(pts) < 4:
+                pts = arc  # geschlossener Bogen darf nicht zusammenfallen
+            result.append(pts)
+        # Ringe, die insgesamt zu wenige Punkte behalten, bekommen ihre ursprünglichen Bögen zurück
+        for ids in self.ring_arcs:
+            if sum(len(result[~i if i < 0 else i]) - 1 for i in ids) < 3:
+                for i in ids:
+                    result[~i if i < 0 else i] = self.arcs[~i if i < 0 else i]
+        return result
+
+    def toleranz_raster(self, meter: float) -> float:
+        '''Meter grob in Rastereinheiten umrechnen (über die mittlere Breite der Bounding Box).'''
+        breite = math.radians((self.bbox[1] + self.bbox[3]) / 2)
+        grad = meter / 111320
+        return min(grad * math.cos(breite) / self.kx, grad / self.ky) if meter else 0
+
+    def topojson(self, name: str, meter: float = 0) -> Dict[str, Any]:
+        arcs = self.vereinfacht(self.toleranz_raster(meter))
+        geometries = []
+        for feature, struktur in zip(self.features, self.struktur):
+            polys = [[self.ring_arcs[r] for r in ring_ids] for ring_ids in struktur]
+            geom: Dict[str, Any]
+            if not polys:
+                geom = {"type": None}
+            elif len(polys) == 1:
+                geom = {"type": "Polygon", "arcs": polys[0]}
+            else:
+                geom = {"type": "MultiPolygon", "arcs": polys}
+            if "id" in feature:
+                geom["id"] = feature["id"]
+            geom["properties"] = feature["properties"]
+            geometries.append(geom)
+        return {
+            "type": "Topology",
+            "bbox": self.bbox,
+            "transform": {"scale": [self.kx, self.ky], "translate": [self.x0, self.y0]},
+            "objects": {name: {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": [_delta(arc) for arc in arcs],
+        }
+
+
+def _delta(arc: Sequence[Punkt]) -> List[List[int]]:
+    result = [[arc[0][0], arc[0][1]]]
+    for (x0, y0), (x1, y1) in zip(arc, arc[1:]):
+        result.append([x1 - x0, y1 - y0])
+    return result
+
+
+def ausgabepfad(path: str, meter: float) -> str:
+    stem = os.path.splitext(path)[0]
+    return f"{stem}.topojson" if not meter else f"{stem}.{meter:g}m.topojson"
+
+
+def main() -> None:
+    for path in dateien or config_dateien():
+        with open(path, "r", encoding="utf-8") as f:
+            topo = Topologie(json.load(f))
+        name = os.path.splitext(os.path.basename(path))[0]
+        groessen = []
+        for meter in stufen:
+            outpath = ausgabepfad(path, meter)
+            with open(outpath, "w", encoding="utf-8") as f:
+                json.dump(topo.topojson(name, meter), f, ensure_ascii=False, separators=(",", ":"))
+            groessen.append(f"{meter:g} m: {os.path.getsize(outpath) // 1024}")
+        print(f"{os.path.relpath(path)}: {len(topo.arcs)} Bögen, {os.path.getsize(path) // 1024} KiB -> {', '.join(groessen)} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Ergebnisse einer Wahl auf die Bezirke einer anderen Wahl umrechnen (flächengewichtete Umlage), damit Wahlen mit neu
+zugeschnittenen Bezirken (z. B. hagen-btw2021 und hagen-btw2025) auf Bezirksebene verglichen werden können.
+
+Je Paar von Geometrie-Ebenen (Ebene 1 der Wahlen aus config.js) wird einmal die dünn besetzte Überschneidungsmatrix
+berechnet (STRtree, nur Paare, die sich schneiden): Gewicht von Quell- zu Zielbezirk = Anteil des Quellbezirks, der im
+Zielbezirk liegt. Mit Hauskoordinaten (Ausgabe von conv.py) zählt statt der Fläche der Anteil der Hausnummern, für
+Quellbezirke ohne Hausnummern bleibt es bei der Fläche. Alle Spalten und Stimmen einer Wahl werden dann mit einer
+Multiplikation (Zielbezirke x Quellbezirke) @ (Quellbezirke x Werte) umgelegt.
+
+Umgelegt werden nur Bezirke mit Geometrie, Briefwahlbezirke haben keine Lage und fehlen im Ergebnis.
+
+Ausgabe neben der Ziel-Geometrie: <Geometrie>.<Ordner der Quelle>.<Quellwahl>.json, aufgebaut wie bei
+tools/ebenenergebnisse.py (spaltenweise je Zielbezirk, Werte nicht gerundet auf ganze Stimmen) und zusätzlich
+abdeckung: Anteil der Fläche des Zielbezirks, für den die Quelle ein Ergebnis hat.
+
+Benötigt: pip install shapely scipy (für Hauskoordinaten zusätzlich pyproj)
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from csv import DictReader
+from datetime import datetime
+from itertools import permutations
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from scipy import sparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ergebnisse import Ebene, GesammeltesFeld, WahlDaten, iter_wahldaten  # noqa: E402
+from wahlconfig import ebene_geojson, js_str, koordinate, termin_dir, umrechnung_pfad  # noqa: E402
+
+# (Ordner der Quelle, Ordner des Ziels) unter src/data, None: alle Wahltermine, deren Geometrien sich überschneiden,
+# jeweils ältere auf neuere
+paare: Optional[List[Tuple[str, str]]] = None
+# Hauskoordinaten mit X/Y (Ausgabe von conv.py), None: nur nach Fläche
+hauskoordinatenpath: Optional[str] = "./opendata-zuordnung.csv"
+# wie in stimmbezirke.py: UTM 32N mit vorangestellter Zonennummer
+punkte_crs = "EPSG:25832"
+zonen_prefix = "32"
+# Nachkommastellen der umgelegten Werte
+stellen = 2
+
+Key = Tuple[Optional[str], str]
+
+
+class Layer:
+    '''Geometrien einer Ebene, je Schlüssel (keyProp, ohne uniqueId mit gsProp) zusammengefasst'''
+
+    def __init__(self, path: str, config: Dict[str, Any]):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            features = [_ for _ in json.load(f)["features"] if _.get("geometry")]
+        index: Dict[Key, int] = {}
+        spalte = []
+        geoms = []
+        for feature in features:
+            p = feature.get("properties") or {}
+            key_id = p.get(config["keyProp"])
+            if key_id in (None, ""):
+                continue
+            gs = None if config["uniqueId"] else js_str(p.get(config.get("gsProp"), ""))
+            spalte.append(index.setdefault((gs, js_str(key_id)), len(index)))
+            geoms.append(shapely.geometry.shape(feature["geometry"]))
+        self.keys: List[Key] = list(index)
+        # je Feature der Index des Schlüssels (mehrteilige Bezirke können aus mehreren Features bestehen)
+        self.feature_key = np.array(spalte, dtype=np.int64)
+        self.geoms = shapely.make_valid(np.array(geoms))
+        self.tree = shapely.STRtree(self.geoms)
+        # Flächen in Grad²: für die Anteile innerhalb eines Bezirks genügt das
+        self.flaeche = np.bincount(self.feature_key, weights=shapely.area(self.geoms), minlength=len(self.keys))
+        self.bounds = shapely.box(*shapely.total_bounds(self.geoms))
+        self._punkte: Optional[np.ndarray] = None
+
+    def punkte(self, punkte: np.ndarray) -> np.ndarray:
+        '''je Punkt der Index des Schlüssels, in dem er liegt (-1: außerhalb)'''
+        if self._punkte is None:
+            p_idx, f_idx = self.tree.query(punkte, predicate="within")
+            self._punkte = np.full(len(punkte), -1, dtype=np.int64)
+            self._punkte[p_idx] = self.feature_key[f_idx]
+        return self._punkte
+
+
+def hauskoordinaten(path: Optional[str]) -> Optional[np.ndarray]:
+    if not path or not os.path.exists(path):
+        return None
+    from pyproj import Transformer
+    xy = []
+    with open(path, "r", encoding="utf-8") as csvf:
+        for row in DictReader(csvf, delimiter=";"):
+            xy.append((koordinate(row["X"], zonen_prefix), koordinate(row["Y"])))
+    x, y = Transformer.from_crs(punkte_crs, "EPSG:4326", always_xy=True).transform(*np.array(xy).T)
+    return shapely.points(x, y)
+
+
+def ueberschneidung(quelle: Layer, ziel: Layer) -> sparse.csr_matrix:
+    '''Flächen der Überschneidungen, Zielschlüssel x Quellschlüssel'''
+    q_idx, z_idx = ziel.tree.query(quelle.geoms, predicate="intersects")
+    flaechen = shapely.area(shapely.intersection(quelle.geoms[q_idx], ziel.geoms[z_idx]))
+    # doppelte Einträge (mehrteilige Bezirke) werden beim Umwandeln addiert
+    return sparse.coo_matrix((flaechen, (ziel.feature_key[z_idx], quelle.feature_key[q_idx])),
+                             shape=(len(ziel.keys), len(quelle.keys))).tocsr()
+
+
+def gewichte(quelle: Layer, ziel: Layer, flaechen: sparse.csr_matrix,
+             punkte: Optional[np.ndarray]) -> Tuple[sparse.csr_matrix, int]:
+    '''(Gewichte Zielschlüssel x Quellschlüssel, Anzahl Quellbezirke nach Hauskoordinaten)'''
+    skala = np.zeros(len(quelle.keys))
+    np.divide(1, quelle.flaeche, out=skala, where=quelle.flaeche > 0)
+    if punkte is None:
+        return flaechen @ sparse.diags(skala), 0
+    q, z = quelle.punkte(punkte), ziel.punkte(punkte)
+    anzahl = np.bincount(q[q >= 0], minlength=len(quelle.keys))
+    nach_punkten = anzahl > 0
+    skala[nach_punkten] = 0
+    beide = (q >= 0) & (z >= 0)
+    zaehlung = sparse.coo_matrix((np.ones(np.count_nonzero(beide)), (z[beide], q[beide])),
+                                 shape=(len(ziel.keys), len(quelle.keys))).tocsr()
+    punkt_skala = np.where(nach_punkten, 1 / np.maximum(anzahl, 1), 0)
+    return flaechen @ sparse.diags(skala) + zaehlung @ sparse.diags(punkt_skala), int(np.count_nonzero(nach_punkten))
+
+
+def _werte(wahl: WahlDaten, ebene: Ebene) -> Tuple[List[Tuple[str, Any]], np.ndarray]:
+    '''(Beschreibung der Spalten, Gebiete x Spalten) aller umzulegenden Werte'''
+    spalten: List[Tuple[str, Any]] = []
+    werte = []
+    for spalte in dict.fromkeys(wahl.typ.konstanten.values()):
+        spalten.append(("spalte", spalte))
+        werte.append(ebene.summe(wahl.spalte(spalte))[:, None])
+    for feld in wahl.typ.felder:
+        if not isinstance(feld, GesammeltesFeld):
+            continue
+        parteien, stimmen = wahl.stimmen(feld)
+        spalten.append(("gueltig", feld))
+        werte.append(ebene.summe(wahl.gueltig(feld))[:, None])
+        spalten += [("partei", (feld, partei)) for partei in parteien]
+        werte.append(ebene.summe(stimmen))
+    return spalten, np.hstack(werte)
+
+
+def umlegen(wahl: WahlDaten, quelle: Layer, ziel: Layer, w: sparse.csr_matrix,
+            flaechen: sparse.csr_matrix) -> Dict[str, Any]:
+    ebene = wahl.ebenen()[0]
+    index = {key: i for i, key in enumerate(ebene.gebiete)}
+    # Quellschlüssel -> Gebiet der Wahl, Geometrien ohne Gebiet bleiben leer
+    gebiet = np.array([index.get(key, -1) for key in quelle.keys], dtype=np.int64)
+    spalten, werte = _werte(wahl, ebene)
+    x = np.zeros((len(quelle.keys), werte.shape[1]))
+    x[gebiet >= 0] = werte[gebiet[gebiet >= 0]]
+    vorhanden = ~np.isnan(x)
+    ergebnis = w @ np.where(vorhanden, x, 0)
+    mit_ergebnis = np.zeros(len(quelle.keys))
+    mit_ergebnis[gebiet >= 0] = ebene.summe(wahl.vorhanden[:, None].astype(float))[gebiet[gebiet >= 0], 0] > 0
+    abdeckung = np.zeros(len(ziel.keys))
+    np.divide(flaechen @ mit_ergebnis, ziel.flaeche, out=abdeckung, where=ziel.flaeche > 0)
+
+    def _liste(spalte: int) -> List[Optional[float]]:
+        # nichts umgelegt (keine Überschneidung mit einem Quellbezirk, der den Wert hat): null
+        erreicht = (w @ vorhanden[:, spalte].astype(float)) > 0
+        return [round(float(v), stellen) if e else None for v, e in zip(ergebnis[:, spalte], erreicht)]
+
+    result: Dict[str, Any] = {
+        "quelle": {"wahltermin": wahl.termin["name"], "wahl": wahl.name, "ebene": ebene.name,
+                   "geoJson": os.path.basename(quelle.path)},
+        "ziel": {"geoJson": os.path.basename(ziel.path)},
+        "gebiete": [nr for _, nr in ziel.keys],
+    }
+    if any(gs is not None for gs, _ in ziel.keys):
+        result["gs"] = [gs for gs, _ in ziel.keys]
+    result["abdeckung"] = [round(float(_), 4) for _ in abdeckung]
+    result["spalten"] = {}
+    result["stimmen"] = {}
+    for i, (art, was) in enumerate(spalten):
+        if art == "spalte":
+            result["spalten"][was] = _liste(i)
+        elif art == "gueltig":
+            result["stimmen"][was.propName] = {"spalte": was.base, "gueltig": _liste(i), "parteien": [], "werte": []}
+        else:
+            feld, partei = was
+            result["stimmen"][feld.propName]["parteien"].append(partei)
+            result["stimmen"][feld.propName]["werte"].append(_liste(i))
+    return result
+
+
+def _ordner(termin: Dict[str, Any]) -> str:
+    return os.path.basename(termin_dir(termin))
+
+
+def _datum(termin: Dict[str, Any]) -> datetime:
+    return datetime.strptime(termin["wahlDatumStr"], "%d.%m.%Y")
+
+
+def ausgabepfad(wahl: WahlDaten, ziel: Layer) -> str:
+    return umrechnung_pfad(ziel.path, wahl.termin, wahl.name)
+
+
+def main() -> None:
+    start = perf_counter()
+    # Wahlen je Wahltermin und Geometrie der Ebene 1
+    wahlen: Dict[Tuple[str, str], List[WahlDaten]] = {}
+    configs: Dict[str, Dict[str, Any]] = {}
+    for wahl in iter_wahldaten():
+        config = wahl.config["ebenen"].get(wahl.parameter["bezirk-bezeichnung"], {})
+        path = ebene_geojson(wahl.termin, config) if config else None
+        if not path or not os.path.exists(path):
+            continue
+        wahlen.setdefault((wahl.termin["name"], path), []).append(wahl)
+        configs[path] = config
+    layers = {path: Layer(path, config) for path, config in configs.items()}
+    punkte = hauskoordinaten(hauskoordinatenpath)
+    print(f"{len(layers)} Geometrien, {0 if punkte is None else len(punkte)} Hauskoordinaten, "
+          f"{perf_counter() - start:.2f} s")
+
+    flaechen_cache: Dict[Tuple[str, str], sparse.csr_matrix] = {}
+    for (q_name, q_path), (z_name, z_path) in permutations(wahlen, 2):
+        q_termin, z_termin = wahlen[(q_name, q_path)][0].termin, wahlen[(z_name, z_path)][0].termin
+        if q_path == z_path:
+            continue
+        if paare is not None:
+            if (_ordner(q_termin), _ordner(z_termin)) not in paare:
+                continue
+        elif _datum(q_termin) >= _datum(z_termin) or not layers[q_path].bounds.intersects(layers[z_path].bounds):
+            continue
+        quelle, ziel = layers[q_path], layers[z_path]
+        t = perf_counter()
+        if (z_path, q_path) in flaechen_cache:
+            flaechen = flaechen_cache[(z_path, q_path)].T.tocsr()
+        else:
+            flaechen = flaechen_cache[(q_path, z_path)] = ueberschneidung(quelle, ziel)
+        w, nach_punkten = gewichte(quelle, ziel, flaechen, punkte)
+        for wahl in wahlen[(q_name, q_path)]:
+            outpath = ausgabepfad(wahl, ziel)
+            result = umlegen(wahl, quelle, ziel, w, flaechen)
+            result["ziel"]["wahltermin"] = z_termin["name"]
+            result["gewichtung"] = {"hauskoordinaten": nach_punkten, "flaeche": len(quelle.keys) - nach_punkten}
+            with open(outpath, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"{q_termin['name']} -> {z_termin['name']}: {len(quelle.keys)} x {len(ziel.keys)} Bezirke, "
+              f"{flaechen.nnz} Überschneidungen, {nach_punkten} nach Hauskoordinaten, "
+              f"{len(wahlen[(q_name, q_path)])} Wahlen, {perf_counter() - t:.2f} s")
+    print(f"insgesamt {perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Vektorkacheln (Mapbox Vector Tiles) der Bezirks-Geodaten als MBTiles-Archiv, für Layer, die zu groß sind, um sie
+als Ganzes an den Browser zu schicken.
+
+Je Wahltermin aus src/js/config.js entsteht <Datenverzeichnis>/<ausgabe> mit einem Layer je Ebene (Name der Ebene).
+Die Features tragen nur keyProp (und gsProp), also genau das, worüber die Ergebnisse zugeordnet werden.
+Die Kacheln werden spaltenweise auf mehrere Prozesse verteilt.
+
+Benötigt: pip install mapbox-vector-tile
+'''
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import os
+import sqlite3
+import sys
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import mapbox_vector_tile
+import numpy as np
+import shapely
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from wahlconfig import ebene_geojson, wahltermine, termin_dir  # noqa: E402
+
+zoomstufen = range(8, 15)
+ausgabe = "gebiete.mbtiles"
+# nur Wahltermine, deren baseUrl einen dieser Texte enthält (None: alle)
+termine: Optional[List[str]] = None
+# None: alle Prozessoren
+prozesse: Optional[int] = None
+extent = 4096
+# Puffer um die Kachel in Kachel-Einheiten, damit Ränder nicht an Kachelgrenzen sichtbar werden
+puffer = 64
+
+ORIGIN = math.pi * 6378137  # halbe Breite der Web-Mercator-Welt in Metern
+
+Layer = Tuple[str, np.ndarray, List[Dict[str, Any]]]
+
+
+def mercator(geoms: np.ndarray) -> np.ndarray:
+    def _transform(c: np.ndarray) -> np.ndarray:
+        lat = np.clip(c[:, 1], -85.0511, 85.0511)
+        return np.column_stack((np.radians(c[:, 0]) * 6378137,
+                                np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * 6378137))
+    return shapely.transform(geoms, _transform)
+
+
+def read_layer(name: str, path: str, props: List[str]) -> Layer:
+    with open(path, "r", encoding="utf-8") as f:
+        features = [_ for _ in json.load(f)["features"] if _["geometry"]]
+    geoms = mercator(shapely.make_valid(np.array([shapely.geometry.shape(_["geometry"]) for _ in features])))
+    properties = [{p: _["properties"][p] for p in props if _["properties"].get(p) is not None} for _ in features]
+    return name, geoms, properties
+
+
+def _flaeche(geom: Any) -> Optional[Any]:
+    '''nur die Flächen (Verschneiden und make_valid können Linien- und Punktreste liefern)'''
+    if isinstance(geom, (shapely.Polygon, shapely.MultiPolygon)):
+        return None if geom.is_empty else geom
+    polygone = [p for part in shapely.get_parts(geom) for p in shapely.get_parts(part) if isinstance(p, shapely.Polygon)]
+    return shapely.MultiPolygon(polygone) if polygone else None
+
+
+def tile_range(bounds: np.ndarray, z: int) -> Tuple[int, int, int, int]:
+    '''(x0, y0, x1, y1) der Kacheln (y von oben), die bounds in Web-Mercator-Metern abdecken'''
+    n = 2 ** z
+    size = 2 * ORIGIN / n
+    x0 = max(0, int((bounds[0] + ORIGIN) // size))
+    x1 = min(n - 1, int((bounds[2] + ORIGIN) // size))
+    y0 = max(0, int((ORIGIN - bounds[3]) // size))
+    y1 = min(n - 1, int((ORIGIN - bounds[1]) // size))
+    return x0, y0, x1, y1
+
+
+# je Worker-Prozess
+_layers: List[Layer] = []
+_trees: List[Any] = []
+_simplified: Dict[Tuple[int, int], np.ndarray] = {}
+
+
+def _init(layers: List[Layer]) -> None:
+    global _layers, _trees
+    _layers = layers
+    _trees = [shapely.STRtree(geoms) for _, geoms, _ in layers]
+
+
+def _spalte(task: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, bytes]]:
+    '''alle Kacheln einer Spalte x der Zoomstufe z zwischen y0 und y1'''
+    z, x, y0, y1 = task
+    size = 2 * ORIGIN / 2 ** z
+    rand = size * puffer / extent
+    minx = -ORIGIN + x * size
+    ys = np.arange(y0, y1 + 1)
+    maxys = ORIGIN - ys * size
+    boxes = shapely.box(minx - rand, maxys - size - rand, minx + size + rand, maxys + rand)
+
+    tiles: Dict[int, List[Tuple[str, Dict[str, Any]]]] = {}
+    for layer_nr, ((name, geoms, properties), tree) in enumerate(zip(_layers, _trees)):
+        box_idx, geom_idx = tree.query(boxes, predicate="intersects")
+        if not len(box_idx):
+            continue
+        if (layer_nr, z) not in _simplified:
+            # unterhalb eines halben Kachel-Pixels sieht man nichts mehr
+            _simplified[(layer_nr, z)] = shapely.simplify(geoms, size / extent / 2, preserve_topology=True)
+        simplified = _simplified[(layer_nr, z)]
+        clipped = shapely.intersection(simplified[geom_idx], boxes[box_idx])
+        for b, g, geom in zip(box_idx, geom_idx, clipped):
+            geom = _flaeche(geom)
+            if geom is None or geom.area == 0:
+                continue
+            tiles.setdefault(b, [])
+            tiles[b].append((name, {"geometry": geom, "properties": properties[g], "id": int(g)}))
+
+    result = []
+    for b, features in tiles.items():
+        layers: Dict[str, List[Dict[str, Any]]] = {}
+        for name, feature in features:
+            layers.setdefault(name, []).append(feature)
+        maxy = maxys[b]
+        data = mapbox_vector_tile.encode(
+            [{"name": name, "features": fs} for name, fs in layers.items()],
+            default_options={"quantize_bounds": (minx, maxy - size, minx + size, maxy), "extents": extent,
+                             "on_invalid_geometry": mapbox_vector_tile.encoder.on_invalid_geometry_make_valid})
+        result.append((z, x, int(ys[b]), gzip.compress(data)))
+    return result
+
+
+def tasks(layers: List[Layer]) -> Iterator[Tuple[int, int, int, int]]:
+    bounds = np.array([shapely.total_bounds(geoms) for _, geoms, _ in layers])
+    gesamt = np.array([bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()])
+    for z in zoomstufen:
+        x0, y0, x1, y1 = tile_range(gesamt, z)
+        for x in range(x0, x1 + 1):
+            yield z, x, y0, y1
+
+
+def write_mbtiles(path: str, name: str, layers: List[Layer]) -> int:
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    con.executescript('''
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+    ''')
+    bounds = shapely.total_bounds(np.concatenate([geoms for _, geoms, _ in layers]))
+    lon0, lat0, lon1, lat1 = (math.degrees(bounds[0] / 6378137), math.degrees(2 * math.atan(math.exp(bounds[1] / 6378137)) - math.pi / 2),
+                              math.degrees(bounds[2] / 6378137), math.degrees(2 * math.atan(math.exp(bounds[3] / 6378137)) - math.pi / 2))
+    vector_layers = [{
+        "id": layer_name,
+        "fields": {k: "Number" if isinstance(v, (int, float)) else "String"
+                   for p in properties for k, v in sorted(p.items())},
+        "minzoom": min(zoomstufen), "maxzoom": max(zoomstufen),
+    } for layer_name, _, properties in layers]
+    con.executemany("INSERT INTO metadata VALUES (?, ?)", [
+        ("name", name), ("format", "pbf"), ("type", "overlay"),
+        ("minzoom", str(min(zoomstufen))), ("maxzoom", str(max(zoomstufen))),
+        ("bounds", f"{lon0:.6f},{lat0:.6f},{lon1:.6f},{lat1:.6f}"),
+        ("center", f"{(lon0 + lon1) / 2:.6f},{(lat0 + lat1) / 2:.6f},{min(zoomstufen) + 2}"),
+        ("json", json.dumps({"vector_layers": vector_layers}, ensure_ascii=False)),
+    ])
+
+    anzahl = 0
+    with Pool(prozesse, initializer=_init, initargs=(layers,)) as pool:
+        for result in pool.imap_unordered(_spalte, tasks(layers), chunksize=4):
+            # MBTiles zählt die Zeilen von unten (TMS)
+            con.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", ((z, x, 2 ** z - 1 - y, data) for z, x, y, data in result))
+            anzahl += len(result)
+    con.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    con.commit()
+    con.close()
+    os.replace(tmp_path, path)
+    return anzahl
+
+
+def main() -> None:
+    for termin in wahltermine():
+        if termine and not any(_ in termin["baseUrl"] for _ in termine):
+            continue
+        layers: List[Layer] = []
+        for wahl in termin["wahlen"]:
+            for name, ebene in wahl["ebenen"].items():
+                path = ebene_geojson(termin, ebene, "dissolvedGeoJson") or ebene_geojson(termin, ebene)
+                if not path or any(_[0] == name for _ in layers):
+                    continue
+                layers.append(read_layer(name, path, [p for p in (ebene.get("keyProp"), ebene.get("gsProp")) if p]))
+        if not layers:
+            continue
+        start = perf_counter()
+        outpath = os.path.join(termin_dir(termin), ausgabe)
+        anzahl = write_mbtiles(outpath, termin["name"], layers)
+        print(f"{termin['name']}: {len(layers)} Layer, {anzahl} Kacheln, {os.path.getsize(outpath) // 1024} KiB, "
+              f"{perf_counter() - start:.1f} s -> {os.path.relpath(outpath)}")
+
+
+if __name__ == "__main__":
+    main()
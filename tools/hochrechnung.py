@@ -0,0 +1,376 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Hochrechnung während der Auszählung: aus den bisher gemeldeten Bezirken und den Ergebnissen einer Vorwahl in denselben
+Bezirken wird das Gesamtergebnis geschätzt.
+
+Verhältnisschätzer je Partei und Schicht (Bezirke gleicher Art, optional je Gebiet einer Ebene, z. B. Stadtbezirk):
+    Schätzung = gemeldet + (Vorwahl gesamt - Vorwahl gemeldet) * gemeldet / Vorwahl gemeldet
+Parteien ohne Vorwahlergebnis werden mit dem Verhältnis der gültigen Stimmen hochgerechnet, Schichten ohne Meldung mit
+dem Verhältnis über alle gemeldeten Bezirke. Je Schicht werden nur die Summen geführt, eine Meldung (oder Korrektur)
+ändert die Summen ihrer Schicht und deren Beitrag zur Schätzung, unabhängig von der Zahl der Bezirke.
+
+Die Vorwahl wird über die bezirk-nr zugeordnet oder, wenn sich die Geometrien der Bezirke unterscheiden, aus der
+Ausgabe von tools/geo/umrechnung.py gelesen, das dafür vorher laufen muss (Bezirke ohne Geometrie, z. B.
+Briefwahlbezirke, weiter über die bezirk-nr).
+Bezirke ohne Vorwahl gehen nur mit ihren gemeldeten Stimmen ein.
+
+Als Skript: liest alle `intervall` Sekunden die neueste Wahlergebnisse-Datei (Ausgabe von api-to-owd.py) der Wahl
+`aktuell`, meldet nur geänderte Zeilen mit Ergebnis (api-to-owd.py schreibt offene Bezirke als Zeilen mit Nullen) und
+schreibt <Wahlergebnisse>.hochrechnung.json. Mit `simulation` werden stattdessen die vorhandenen Ergebnisse in
+zufälliger Reihenfolge gemeldet und die Abweichung vom Endergebnis gezeigt, dazu wird eine teilweise gemeldete Datei
+eingelesen und mit den gemeldeten Zeilen allein verglichen.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+from csv import DictWriter
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ergebnisse import GesammeltesFeld, WahlDaten, iter_wahldaten
+from katalog import dateiname_lesen
+from wahlconfig import ebene_geojson, read_owd_csv, termin_dir, umrechnung_pfad
+
+# (Ordner unter src/data, wahl-name)
+aktuell = ("hagen-btw2025", "Wahl zum Deutschen Bundestag")
+vorwahl = ("hagen-btw2021", "Wahl zum Deutschen Bundestag")
+# Vorwahl auf den aktuellen Bezirken aus tools/geo/umrechnung.py (vorher laufen lassen): True: dessen Ausgabe für
+# aktuell/vorwahl, wenn sich die Geometrien unterscheiden, str: Pfad zu einer Ausgabe, False: nur über die bezirk-nr
+umgerechnet: Union[bool, str] = True
+# propName der Stimmen, None: das letzte Stimmenfeld (bei Bundestagswahlen die Zweitstimmen)
+stimmen_feld: Optional[str] = None
+# Schichten zusätzlich zur bezirk-art nach gebiet-ebene-N-nr, None: nur nach bezirk-art
+schicht_ebene: Optional[int] = 3
+# Parteinamen, die sich seit der Vorwahl geändert haben: aktueller Name -> Name in der Vorwahl
+umbenannt: Dict[str, str] = {
+    "Die Gerechtigkeitspartei – Team Todenhöfer": "Team Todenhöfer",
+}
+intervall = 30  # Sekunden, 0: nur einmal
+simulation = False
+
+
+class Hochrechnung:
+    '''
+    Schätzung für Bezirke x Parteien. vorwahl: Stimmen der Vorwahl je Bezirk und Partei, letzte Spalte gültige
+    Stimmen (Zeile NaN: keine Vorwahl), schicht: je Bezirk die Nummer der Schicht.
+    '''
+
+    def __init__(self, vorwahl: np.ndarray, schicht: np.ndarray):
+        self.mit_vorwahl = ~np.isnan(vorwahl).all(axis=1)
+        self.vorwahl = np.nan_to_num(vorwahl)
+        self.schicht = schicht
+        anzahl = int(schicht.max()) + 1 if len(schicht) else 0
+        spalten = vorwahl.shape[1]
+        self.vorwahl_gesamt = np.zeros((anzahl, spalten))
+        np.add.at(self.vorwahl_gesamt, schicht[self.mit_vorwahl], self.vorwahl[self.mit_vorwahl])
+        # Summen der gemeldeten Bezirke je Schicht: aktuell und Vorwahl
+        self.gemeldet_stimmen = np.zeros((anzahl, spalten))
+        self.gemeldet_vorwahl = np.zeros((anzahl, spalten))
+        self.stimmen = np.zeros(vorwahl.shape)
+        self.gemeldet = np.zeros(len(vorwahl), dtype=bool)
+        # Beitrag der Schichten mit Meldungen und deren Summe, Vorwahl der Schichten ohne Meldung
+        self.schicht_gemeldet = np.zeros(anzahl, dtype=bool)
+        self.beitrag = np.zeros((anzahl, spalten))
+        self.summe = np.zeros(spalten)
+        self.offen = self.vorwahl_gesamt.sum(axis=0)
+        # Summen über alle Schichten
+        self.stimmen_summe = np.zeros(spalten)
+        self.vorwahl_summe = np.zeros(spalten)
+        self.ohne_vorwahl = np.zeros(spalten)
+
+    def melden(self, i: int, stimmen: np.ndarray) -> None:
+        '''Ergebnis von Bezirk i (Parteien und gültige Stimmen) melden oder korrigieren'''
+        differenz = stimmen - self.stimmen[i]
+        if not self.mit_vorwahl[i]:
+            self.ohne_vorwahl += differenz
+        else:
+            s = self.schicht[i]
+            if not self.schicht_gemeldet[s]:
+                self.schicht_gemeldet[s] = True
+                self.offen -= self.vorwahl_gesamt[s]
+            self.gemeldet_stimmen[s] += differenz
+            self.stimmen_summe += differenz
+            if not self.gemeldet[i]:
+                self.gemeldet_vorwahl[s] += self.vorwahl[i]
+                self.vorwahl_summe += self.vorwahl[i]
+            neu = _verhaeltnis(self.gemeldet_stimmen[s], self.gemeldet_vorwahl[s], self.vorwahl_gesamt[s])
+            self.summe += neu - self.beitrag[s]
+            self.beitrag[s] = neu
+        self.stimmen[i] = stimmen
+        self.gemeldet[i] = True
+
+    def schaetzung(self) -> np.ndarray:
+        '''geschätzte Stimmen je Partei, letzte Spalte gültige Stimmen'''
+        # Schichten ohne Meldung: mit dem Verhältnis über alle gemeldeten Bezirke
+        rest = _verhaeltnis(self.stimmen_summe, self.vorwahl_summe, self.offen + self.vorwahl_summe)
+        return self.summe + rest - self.stimmen_summe + self.ohne_vorwahl
+
+
+def _verhaeltnis(a: np.ndarray, b: np.ndarray, p: np.ndarray) -> np.ndarray:
+    '''a + (p - b) * a / b je Spalte, Spalten ohne Vorwahl (b = 0) mit dem Verhältnis der gültigen Stimmen'''
+    if b[-1] <= 0:
+        return a.copy()
+    gesamt = a * p[-1] / b[-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(b > 0, a + (p - b) * a / b, gesamt)
+
+
+def _name(name: str) -> str:
+    return re.sub(r"\s+", " ", name).strip().casefold()
+
+
+def _feld(wahl: WahlDaten) -> GesammeltesFeld:
+    felder = [_ for _ in wahl.typ.felder if isinstance(_, GesammeltesFeld)]
+    return next((_ for _ in felder if _.propName == stimmen_feld), felder[-1])
+
+
+def _geometrie(wahl: WahlDaten) -> Optional[str]:
+    config = wahl.config["ebenen"].get(wahl.parameter["bezirk-bezeichnung"], {})
+    path = ebene_geojson(wahl.termin, config) if config else None
+    return path if path and os.path.exists(path) else None
+
+
+def umgerechnet_pfad(wahl: WahlDaten, vor: WahlDaten, einstellung: Union[bool, str]) -> Optional[str]:
+    '''
+    Ausgabe von umrechnung.py mit der Vorwahl auf den Bezirken von wahl, einstellung wie `umgerechnet`. Bei True None,
+    wenn beide Wahlen dieselbe Geometrie haben; fehlt die Datei, obwohl sich die Geometrien unterscheiden, wird nicht
+    still über die bezirk-nr zugeordnet, sondern abgebrochen.
+    '''
+    if einstellung is not True:
+        pfad = einstellung or None
+    else:
+        ziel, quelle = _geometrie(wahl), _geometrie(vor)
+        if ziel is None or quelle is None or ziel == quelle:
+            return None
+        pfad = umrechnung_pfad(ziel, vor.termin, vor.name)
+    if pfad and not os.path.exists(pfad):
+        raise FileNotFoundError(f"{pfad} fehlt, zuerst tools/geo/umrechnung.py laufen lassen "
+                                f"(oder umgerechnet = False für die Zuordnung über die bezirk-nr)")
+    return pfad
+
+
+def vorwahl_matrix(wahl: WahlDaten, parteien: List[str], vor: WahlDaten,
+                   einstellung: Union[bool, str, None] = None) -> np.ndarray:
+    '''
+    Vorwahl je aktuellem Bezirk: Parteien und gültige Stimmen (NaN: keine Vorwahl), einstellung wie `umgerechnet`
+    (None: `umgerechnet`)
+    '''
+    pfad = umgerechnet_pfad(wahl, vor, umgerechnet if einstellung is None else einstellung)
+    feld = _feld(vor)
+    vor_parteien, vor_stimmen = vor.stimmen(feld)
+    spalte = {_name(p): i for i, p in enumerate(vor_parteien)}
+    zuordnung = [spalte.get(_name(umbenannt.get(p, p)), -1) for p in parteien]
+    werte = np.hstack([np.nan_to_num(vor_stimmen), vor.gueltig(feld)[:, None]])
+    result = np.full((len(wahl.bezirke), len(parteien) + 1), np.nan)
+    for i, key in enumerate(wahl.bezirke):
+        j = vor.index.get(key)
+        if j is not None and vor.vorhanden[j]:
+            result[i] = [werte[j, k] if k >= 0 else 0 for k in zuordnung] + [werte[j, -1]]
+    if pfad:
+        with open(pfad, "r", encoding="utf-8") as f:
+            daten = json.load(f)
+        stimmen = daten["stimmen"][feld.propName]
+        spalte = {_name(p): i for i, p in enumerate(stimmen["parteien"])}
+        umgerechnet_zuordnung = [spalte.get(_name(umbenannt.get(p, p)), -1) for p in parteien]
+        gs = daten.get("gs") or [None] * len(daten["gebiete"])
+        # ohne gs (uniqueId) nur über die Nummer
+        bezirke = {(b_gs if daten.get("gs") else None, nr): i for i, (b_gs, nr) in enumerate(wahl.bezirke)}
+        for g, (nr, gebiet_gs) in enumerate(zip(daten["gebiete"], gs)):
+            i = bezirke.get((gebiet_gs, nr))
+            if i is None or stimmen["gueltig"][g] is None:
+                continue
+            result[i] = [stimmen["werte"][k][g] or 0 if k >= 0 else 0 for k in umgerechnet_zuordnung] + \
+                [stimmen["gueltig"][g]]
+    return result
+
+
+def schichten(wahl: WahlDaten) -> np.ndarray:
+    index: Dict[Tuple[str, str], int] = {}
+    spalte = f"gebiet-ebene-{schicht_ebene}-nr" if schicht_ebene else None
+    return np.array([index.setdefault((row.get("bezirk-art") or "", row.get(spalte, "") if spalte else ""), len(index))
+                     for row in wahl.gebiete], dtype=np.int64)
+
+
+class Zeilenleser:
+    '''Wahlergebnisse-Zeilen -> Stimmen je Partei und gültige Stimmen, wie WahlDaten.stimmen()'''
+
+    def __init__(self, wahl: WahlDaten, feld: GesammeltesFeld):
+        self.wahl = wahl
+        self.feld = feld
+        self.parteien, _ = wahl.stimmen(feld)
+        index = {p: i for i, p in enumerate(self.parteien)}
+        # je stimmzettel-gebiet-nr: (Spalte, Partei)
+        self.spalten = {gebiet: [(f"{feld.base}{pos}", index[p]) for pos, p in positionen.items() if p in index]
+                        for gebiet, positionen in wahl.stimmzettel.items()}
+        self.waehler = wahl.typ.spalte("waehlendeGesamt")
+
+    def gemeldet(self, row: Dict[str, str]) -> bool:
+        '''Zeile mit Ergebnis: api-to-owd.py schreibt noch nicht gemeldete Bezirke als Zeilen mit Nullen'''
+        return _zahl(row.get(self.feld.valid or self.feld.base)) > 0 or _zahl(row.get(self.waehler)) > 0
+
+    def stimmen(self, i: int, row: Dict[str, str]) -> np.ndarray:
+        result = np.zeros(len(self.parteien) + 1)
+        for spalte, p in self.spalten.get(self.wahl.gebiete[i].get("stimmzettel-gebiet-nr") or None, []):
+            result[p] = _zahl(row.get(spalte))
+        result[-1] = _zahl(row.get(self.feld.valid or self.feld.base))
+        return result
+
+
+def _zahl(value: Optional[str]) -> float:
+    m = re.match(r"\s*(\d+)", value or "")
+    return float(m.group(1)) if m else 0.0
+
+
+def neueste_ergebnisse(wahl: WahlDaten) -> str:
+    '''neueste Wahlergebnisse-Datei derselben Wahl im Ordner (api-to-owd.py schreibt je Stand eine neue)'''
+    path = wahl.pfad("ergebnisPath")
+    info = dateiname_lesen(os.path.basename(path))
+    if not info:
+        return path
+    result, rang = path, None
+    for eintrag in os.scandir(os.path.dirname(path)):
+        other = dateiname_lesen(eintrag.name)
+        if not other or other["typ"] != "Wahlergebnisse" or \
+                (other["gs"], other["datum"], other["wahl"]) != (info["gs"], info["datum"], info["wahl"]):
+            continue
+        r = (other["zeitpunkt"] or "", eintrag.stat().st_mtime_ns, other["teil"])
+        if rang is None or r > rang:
+            result, rang = eintrag.path, r
+    return result
+
+
+def _finden(ordner: str, name: str) -> WahlDaten:
+    for wahl in iter_wahldaten():
+        if os.path.basename(termin_dir(wahl.termin)) == ordner and wahl.name == name:
+            return wahl
+    raise ValueError(f"{ordner} / {name} nicht in config.js")
+
+
+def _ausgabe(wahl: WahlDaten, leser: Zeilenleser, hr: Hochrechnung) -> Dict[str, Any]:
+    schaetzung = hr.schaetzung()
+    return {
+        "wahl": wahl.name,
+        "vorwahl": list(vorwahl),
+        "zeitpunkt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "gemeldet": int(hr.gemeldet.sum()),
+        "bezirke": len(hr.gemeldet),
+        "parteien": leser.parteien,
+        "stimmen": [round(float(_)) for _ in schaetzung[:-1]],
+        "gueltig": round(float(schaetzung[-1])),
+        "anteile": [round(float(_) / float(schaetzung[-1]) * 100, 2) if schaetzung[-1] > 0 else None
+                    for _ in schaetzung[:-1]],
+    }
+
+
+def einlesen(wahl: WahlDaten, leser: Zeilenleser, hr: Hochrechnung, path: str,
+             bisher: Dict[int, Tuple[str, ...]]) -> int:
+    '''
+    Geänderte Zeilen einer Wahlergebnisse-Datei melden, bisher: je Bezirk die zuletzt gelesene Zeile. Zeilen ohne
+    Ergebnis werden übergangen, außer der Bezirk war schon gemeldet (dann ist es eine Korrektur). Anzahl der Meldungen.
+    '''
+    geaendert = 0
+    for row in read_owd_csv(path, wahl.name):
+        i = wahl.index.get((row["wahl-behoerde-gs"], row["bezirk-nr"]))
+        if i is None or not (leser.gemeldet(row) or hr.gemeldet[i]):
+            continue
+        werte = tuple(row.values())
+        if bisher.get(i) != werte:
+            bisher[i] = werte
+            hr.melden(i, leser.stimmen(i, row))
+            geaendert += 1
+    return geaendert
+
+
+def _teilweise(wahl: WahlDaten, leser: Zeilenleser, vorwahl_stimmen: np.ndarray, schicht: np.ndarray,
+               zeilen: List[Tuple[int, Dict[str, str]]], reihenfolge: np.ndarray, anteil: float = 0.25) -> None:
+    '''
+    Prüfung mit einer teilweise gemeldeten Datei wie von api-to-owd.py: die ersten `anteil` der Bezirke mit Ergebnis,
+    die übrigen mit Nullen in den Zahlenspalten. Eingelesen muss sie dasselbe ergeben wie nur die gemeldeten Zeilen.
+    '''
+    gemeldet = {int(k) for k in reihenfolge[:int(len(zeilen) * anteil)]}
+    spalten = list(zeilen[0][1])
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = DictWriter(f, spalten, delimiter=";")
+            writer.writeheader()
+            for k, (_, row) in enumerate(zeilen):
+                writer.writerow(row if k in gemeldet else
+                                {key: "0" if re.fullmatch(r"[A-Z]\d*", key) else v for key, v in row.items()})
+        datei = Hochrechnung(vorwahl_stimmen, schicht)
+        einlesen(wahl, leser, datei, path, {})
+    finally:
+        os.remove(path)
+    nur = Hochrechnung(vorwahl_stimmen, schicht)
+    for k in gemeldet:
+        nur.melden(zeilen[k][0], leser.stimmen(*zeilen[k]))
+    a, b = datei.schaetzung(), nur.schaetzung()
+    print(f"teilweise gemeldete Datei: {int(datei.gemeldet.sum())} von {len(zeilen)} Bezirken gemeldet, "
+          f"{a[-1]:.0f} gültige Stimmen geschätzt (nur gemeldete Zeilen: {b[-1]:.0f})")
+    assert datei.gemeldet.sum() == len(gemeldet) and np.allclose(a, b), "Zeilen ohne Ergebnis wurden gemeldet"
+
+
+def _simulieren(wahl: WahlDaten, leser: Zeilenleser, vorwahl_stimmen: np.ndarray, schicht: np.ndarray) -> None:
+    hr = Hochrechnung(vorwahl_stimmen, schicht)
+    alle = [(wahl.index[(row["wahl-behoerde-gs"], row["bezirk-nr"])], row)
+            for row in read_owd_csv(wahl.pfad("ergebnisPath"), wahl.name)]
+    zeilen = [(i, row) for i, row in alle if leser.gemeldet(row)]
+    stimmen = [leser.stimmen(i, row) for i, row in zeilen]
+    ende = np.sum(stimmen, axis=0)
+    ende_anteile = ende[:-1] / ende[-1] * 100
+    reihenfolge = np.random.default_rng(0).permutation(len(zeilen))
+    punkte = {int(len(zeilen) * q) for q in (0.05, 0.1, 0.25, 0.5, 0.75)}
+    dauer = 0.0
+    for n, k in enumerate(reihenfolge, 1):
+        start = perf_counter()
+        hr.melden(zeilen[k][0], stimmen[k])
+        schaetzung = hr.schaetzung()
+        dauer += perf_counter() - start
+        if n in punkte:
+            abweichung = np.abs(schaetzung[:-1] / schaetzung[-1] * 100 - ende_anteile).max()
+            print(f"{n} von {len(zeilen)} Bezirken: größte Abweichung {abweichung:.2f} Prozentpunkte")
+    print(f"{dauer / len(zeilen) * 1e6:.0f} µs je Meldung mit Schätzung")
+    _teilweise(wahl, leser, vorwahl_stimmen, schicht, alle, np.random.default_rng(1).permutation(len(alle)))
+
+
+def main() -> None:
+    wahl = _finden(*aktuell)
+    vor = _finden(*vorwahl)
+    leser = Zeilenleser(wahl, _feld(wahl))
+    vorwahl_stimmen, schicht = vorwahl_matrix(wahl, leser.parteien, vor), schichten(wahl)
+    hr = Hochrechnung(vorwahl_stimmen, schicht)
+    quelle = umgerechnet_pfad(wahl, vor, umgerechnet)
+    print(f"{wahl.termin['name']} / {wahl.name}: Vorwahl für {hr.mit_vorwahl.sum()} von {len(hr.mit_vorwahl)} Bezirken "
+          f"({os.path.basename(quelle) if quelle else 'über die bezirk-nr'})")
+    if simulation:
+        _simulieren(wahl, leser, vorwahl_stimmen, schicht)
+        return
+
+    outpath = f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.hochrechnung.json"
+    bisher: Dict[int, Tuple[str, ...]] = {}
+    while True:
+        path = neueste_ergebnisse(wahl)
+        start = perf_counter()
+        geaendert = einlesen(wahl, leser, hr, path, bisher)
+        result = _ausgabe(wahl, leser, hr)
+        with open(outpath, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        anteile = ", ".join(f"{p} {a:.1f}" for p, a in zip(result["parteien"], result["anteile"]) if a and a >= 1)
+        print(f"{result['zeitpunkt']}: {geaendert} geändert, {result['gemeldet']}/{result['bezirke']} gemeldet, "
+              f"{perf_counter() - start:.3f} s: {anteile}")
+        if not intervall:
+            break
+        time.sleep(intervall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Katalog aller Datenverzeichnisse unter src/data (<src/data>/katalog.json), damit nach einem neuen Export nicht die
+Dateinamen mit Zeitstempel von Hand gesucht und in config.js eingetragen werden müssen.
+
+Die Dateinamen der Offene-Wahldaten-Exporte folgen dem Muster
+    <wahl-behoerde-gs>_<wahl-datum>_<wahl-name>_<Dateityp>_V<Version>_<Stand>[_<Teil>].csv
+mit Stand z. B. "23.02.2025 193352 274" oder "20200930T111111". Je Wahl und Dateityp wird die Datei mit dem neuesten
+Stand ausgewählt. Zu jeder Datei stehen Größe, mtime, SHA-256 und Zeilenanzahl im Katalog, zu den Wahlparametern
+die Ebenen je Wahl. Geometrien (GeoJSON, TopoJSON, Ebenen des Geometriespeichers, auch in Unterverzeichnissen wie
+geometrien/ebenen/...) stehen mit Format und Anzahl Features unter "geo".
+
+Aufbau: {"version": 1, "ordner": {Verzeichnis: {"dateien": {Dateiname: {...}},
+                                               "wahlen": [{"gs", "datum", "wahl", "dateien": {Dateityp: Dateiname},
+                                                           "ebenen": [...]}],
+                                               "geo": [Dateiname relativ zum Verzeichnis, ...]}}}
+
+Der Katalog wird inkrementell erneuert: Dateien mit unveränderter Größe und mtime werden nicht gelesen, bei
+geänderter mtime, aber gleichem Hash bleiben die übrigen Angaben erhalten. Am Ende werden Einträge in config.js
+gemeldet, die auf keine Datei im Katalog (Wahldateien, geoJson, dissolvedGeoJson, geometrien der Ebenen) oder nicht
+auf die neueste Datei zeigen; dann ist der Exit-Code 1.
+'''
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from wahlconfig import datapath, ergebnis_csv, iter_wahlen, read_owd_csv, termin_dir
+
+katalogpath = os.path.join(datapath, "data", "katalog.json")
+VERSION = 1
+
+dateitypen = ("Wahlparameter", "Wahlgebietseinteilungen", "Stimmzettel", "Kandidaten", "Wahlergebnisse")
+# config.js-Schlüssel der Wahl je Dateityp
+config_keys = {
+    "Wahlparameter": "parameterPath",
+    "Wahlgebietseinteilungen": "gebietePath",
+    "Stimmzettel": "stimmzettelPath",
+    "Kandidaten": "kandidatPath",
+    "Wahlergebnisse": "ergebnisPath",
+}
+# weitere Dateien der Wahl und der Ebenen in config.js, die vorhanden sein müssen
+wahl_keys = ("parameterPath", "gebietePath", "stimmzettelPath", "kandidatPath", "ergebnisPath", "klassenPath")
+ebene_keys = ("geoJson", "dissolvedGeoJson", "geometrien")
+# Dateien im Katalog, .json nur mit Geometrien (type wie in fetchGeoJson) als "geo", .owdb: tools/owdbin.py
+endungen = (".csv", ".geojson", ".topojson", ".json", ".owdb")
+geo_typen = ("FeatureCollection", "Topology", "Geometrien")
+
+_dateiname = re.compile(rf'''^(?P<gs>\d+)_(?P<datum>[^_]+)_(?P<wahl>.+)_(?P<typ>{"|".join(dateitypen)})
+                              _V(?P<version>[\d-]+)_(?P<stand>[^_]+?)(?:_(?P<teil>\d+))?\.csv$''', re.VERBOSE)
+_staende = (
+    (re.compile(r"^\d{2}\.\d{2}\.\d{4} \d{6} \d{3}$"), "%d.%m.%Y %H%M%S %f"),
+    (re.compile(r"^\d{8}T\d{6}$"), "%Y%m%dT%H%M%S"),
+    (re.compile(r"^\d{2}\.\d{2}\.\d{4} \d{6}$"), "%d.%m.%Y %H%M%S"),
+)
+
+
+def dateiname_lesen(name: str) -> Optional[Dict[str, Any]]:
+    '''Bestandteile eines OWD-Dateinamens, None wenn der Name nicht dem Muster folgt'''
+    m = _dateiname.match(name)
+    if not m:
+        return None
+    result: Dict[str, Any] = m.groupdict()
+    result["teil"] = int(result["teil"]) if result["teil"] else 0
+    result["zeitpunkt"] = None
+    for muster, fmt in _staende:
+        if muster.match(result["stand"]):
+            # Millisekunden: %f liest "274" als 274000 µs, das passt
+            result["zeitpunkt"] = datetime.strptime(result["stand"], fmt).isoformat()
+            break
+    return result
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _inhalt(path: str) -> Dict[str, Any]:
+    '''Angaben, die das Lesen der Datei erfordern'''
+    name = os.path.basename(path)
+    if name.endswith(".csv"):
+        zeilen = read_owd_csv(path)
+        result: Dict[str, Any] = {"zeilen": len(zeilen)}
+        info = dateiname_lesen(name)
+        if info and info["typ"] == "Wahlparameter":
+            result["ebenen"] = {}
+            for row in zeilen:
+                ebenen = [row.get("bezirk-bezeichnung")]
+                ebenen += [row.get(f"gebiet-ebene-{level}-bezeichnung") for level in range(2, 6)]
+                result["ebenen"][row.get("wahl-name", "")] = [_ for _ in ebenen if _]
+        return result
+    if name.endswith((".geojson", ".topojson", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("type") not in geo_typen:
+            return {}
+        if data["type"] == "Topology":
+            features = len(next(iter(data.get("objects", {}).values()), {}).get("geometries", []))
+        else:
+            features = len(data.get("features", []))
+        return {"geo": data["type"], "features": features}
+    return {}
+
+
+def datei_eintrag(path: str, vorher: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    '''(Katalogeintrag, ob die Datei gelesen wurde)'''
+    st = os.stat(path)
+    if vorher and vorher["groesse"] == st.st_size and vorher["mtime"] == st.st_mtime_ns:
+        return vorher, False
+    sha = _sha256(path)
+    if vorher and vorher["sha256"] == sha:
+        return {**vorher, "mtime": st.st_mtime_ns}, True
+    eintrag = {"groesse": st.st_size, "mtime": st.st_mtime_ns, "sha256": sha}
+    eintrag.update(_inhalt(path))
+    info = dateiname_lesen(os.path.basename(path))
+    if info:
+        eintrag["typ"] = info["typ"]
+        eintrag["stand"] = info["zeitpunkt"]
+    return eintrag, True
+
+
+def ordner_katalog(ordner: str, vorher: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    dateien: Dict[str, Any] = {}
+    gelesen = 0
+    for wurzel, unterordner, namen in os.walk(ordner):
+        unterordner.sort()
+        for name in sorted(namen):
+            if not name.endswith(endungen):
+                continue
+            path = os.path.join(wurzel, name)
+            rel = os.path.relpath(path, ordner).replace(os.sep, "/")
+            dateien[rel], neu = datei_eintrag(path, vorher.get("dateien", {}).get(rel))
+            gelesen += neu
+
+    # je Wahl und Dateityp die neueste Datei; ohne lesbaren Stand entscheidet die mtime
+    wahlen: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    neueste: Dict[Tuple[str, str, str, str], Tuple[Any, ...]] = {}
+    for name, eintrag in dateien.items():
+        info = dateiname_lesen(name)
+        if not info:
+            continue
+        key = (info["gs"], info["datum"], info["wahl"])
+        wahl = wahlen.setdefault(key, {"gs": info["gs"], "datum": info["datum"], "wahl": info["wahl"], "dateien": {}})
+        rang = (info["zeitpunkt"] or "", eintrag["mtime"], info["teil"])
+        if rang > neueste.get(key + (info["typ"],), ()):
+            neueste[key + (info["typ"],)] = rang
+            wahl["dateien"][info["typ"]] = name
+    for wahl in wahlen.values():
+        parameter = dateien.get(wahl["dateien"].get("Wahlparameter", ""), {})
+        ebenen = parameter.get("ebenen", {})
+        # wahl-name in der Datei und im Dateinamen stimmen nicht immer überein
+        wahl["ebenen"] = ebenen.get(wahl["wahl"]) or next(iter(ebenen.values()), [])
+
+    return {
+        "dateien": dateien,
+        "wahlen": list(wahlen.values()),
+        "geo": [name for name, eintrag in dateien.items() if eintrag.get("geo")],
+    }, gelesen
+
+
+def katalog(vorher: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    basis = os.path.dirname(katalogpath)
+    result: Dict[str, Any] = {"version": VERSION, "ordner": {}}
+    gelesen = 0
+    for name in sorted(os.listdir(basis)):
+        ordner = os.path.join(basis, name)
+        if os.path.isdir(ordner):
+            result["ordner"][name], n = ordner_katalog(ordner, vorher.get("ordner", {}).get(name, {}))
+            gelesen += n
+    return result, gelesen
+
+
+def _im_katalog(kat: Dict[str, Any], path: str) -> bool:
+    rel = os.path.relpath(path, os.path.dirname(katalogpath)).replace(os.sep, "/")
+    ordner, _, name = rel.partition("/")
+    return name in kat["ordner"].get(ordner, {}).get("dateien", {})
+
+
+def fehlend(kat: Dict[str, Any]) -> List[str]:
+    '''Einträge in config.js, deren Datei nicht im Katalog steht'''
+    meldungen = []
+    for termin, wahl in iter_wahlen():
+        eintraege = [(key, wahl[key]) for key in wahl_keys if wahl.get(key)]
+        # zu kompilierten Ergebnissen muss auch die csv da sein, aus der sie entstehen
+        if ergebnis_csv(wahl["ergebnisPath"]) != wahl["ergebnisPath"]:
+            eintraege.append(("ergebnisPath (csv)", ergebnis_csv(wahl["ergebnisPath"])))
+        eintraege += [(f"{name}.{key}", ebene[key]) for name, ebene in wahl["ebenen"].items()
+                      for key in ebene_keys if ebene.get(key)]
+        for key, wert in eintraege:
+            if not _im_katalog(kat, os.path.normpath(os.path.join(termin_dir(termin), wert))):
+                meldungen.append(f"{termin['name']} / {wahl['name']}: {key} {wert}")
+    return meldungen
+
+
+def veraltet(kat: Dict[str, Any]) -> List[str]:
+    '''Einträge in config.js, die nicht die neueste Datei ihres Typs verwenden'''
+    meldungen = []
+    for termin, wahl in iter_wahlen():
+        ordner = os.path.relpath(termin_dir(termin), os.path.dirname(katalogpath))
+        eintrag = kat["ordner"].get(ordner)
+        if not eintrag:
+            continue
+        for typ, key in config_keys.items():
+            name = ergebnis_csv(wahl.get(key) or "")
+            info = dateiname_lesen(name)
+            if not info:
+                continue
+            for w in eintrag["wahlen"]:
+                if (w["gs"], w["datum"], w["wahl"]) == (info["gs"], info["datum"], info["wahl"]) \
+                        and w["dateien"].get(typ) not in (None, name):
+                    meldungen.append(f"{termin['name']} / {wahl['name']}: {key} -> {w['dateien'][typ]}")
+    return meldungen
+
+
+def main() -> int:
+    start = perf_counter()
+    vorher: Dict[str, Any] = {}
+    if os.path.exists(katalogpath):
+        with open(katalogpath, "r", encoding="utf-8") as f:
+            vorher = json.load(f)
+        if vorher.get("version") != VERSION:
+            vorher = {}
+    kat, gelesen = katalog(vorher)
+    tmp_path = katalogpath + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(kat, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, katalogpath)
+    anzahl = sum(len(o["dateien"]) for o in kat["ordner"].values())
+    print(f"{os.path.relpath(katalogpath)}: {len(kat['ordner'])} Verzeichnisse, {anzahl} Dateien, "
+          f"{gelesen} gelesen, {perf_counter() - start:.2f} s")
+    meldungen = [f"fehlt: {_}" for _ in fehlend(kat)] + [f"neuere Datei: {_}" for _ in veraltet(kat)]
+    for meldung in meldungen:
+        print(meldung)
+    return 1 if meldungen else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Vorberechnete Klassengrenzen für die Kartendarstellung: je Wahl eine JSON-Datei neben den Wahlergebnissen
+(<Wahlergebnisse>.klassen.json, siehe ausgabepfad), in config.js als `klassenPath` der Wahl eintragen. Berechnet
+werden nur die Wahlen mit `klassenPath`, geschrieben wird die dort angegebene Datei.
+
+Die Webanwendung teilt die Werte eines Felds sonst bei jedem Wechsel von Ebene oder Feld mit geostats getClassJenks
+in Klassen ein, das ist O(n²·k) und bei großen Ebenen spürbar. Hier werden dieselben Werte wie in
+ErgebnisAnalysisCollection berechnet (Felder ohne Datentyp, Anteil und Platzierung je Partei) und für jede in Frage
+kommende Klassenanzahl die Grenzen nach Jenks (wie geostats), Quantilen und gleichen Intervallen abgelegt.
+
+Aufbau: {Ebene: {propName: {Datentyp ("" ohne): {Argument ("" ohne): {"n": Anzahl Werte, "jenks"/"quantile"/"eq":
+{Klassenanzahl: Grenzen}}}}}}. Bei jenks und quantile sind die inneren Grenzen Indizes in die aufsteigend sortierten
+Werte (die Grenzen sind immer Werte der Reihe, so bleibt die Zuordnung exakt), bei eq gerundete Werte. Die
+Webanwendung nutzt die Grenzen nur, wenn n zu ihren Daten passt (kein Stimmzettel-Filter, gleicher Datenstand), sonst
+rechnet sie wie bisher selbst.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from ergebnisse import BerechnetesFeld, Ebene, GesammeltesFeld, KonstantesFeld, WahlDaten, iter_wahldaten
+
+# wie defaultBinNum in WahlController.applyData
+max_klassen = 7
+# Nachkommastellen der Grenzen bei gleichen Intervallen (Anteile in Prozent)
+stellen = 4
+# Speicher je Block der Jenks-Matrix (Startpunkte x Endpunkte)
+blockgroesse = 2 ** 22
+
+
+def jenks(werte: np.ndarray, klassen: int) -> Dict[int, List[int]]:
+    '''
+    Natürliche Grenzen nach Fisher-Jenks für 2..klassen Klassen, als Index des Maximums jeder Klasse außer der letzten
+    in den sortierten Werten (geostats: [min, Maximum der 1. Klasse, ..., max]). Die dynamische Programmierung rechnet
+    je Klassenanzahl alle (Start, Ende) auf einmal.
+    '''
+    x = np.sort(werte)
+    n = len(x)
+    s1 = np.concatenate(([0.0], np.cumsum(x)))
+    s2 = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    def abweichung(start: np.ndarray, ende: np.ndarray) -> np.ndarray:
+        '''Quadratsumme der Abweichungen von x[start:ende]'''
+        anzahl = ende - start
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return s2[ende] - s2[start] - (s1[ende] - s1[start]) ** 2 / anzahl
+
+    # kosten[e]: minimale Summe für x[:e] bei k Klassen, starts[k][e]: Beginn der letzten Klasse
+    enden = np.arange(n + 1)
+    kosten = abweichung(np.zeros(n + 1, dtype=np.int64), enden)
+    # geostats lässt die erste Klasse nie aus nur einem Wert bestehen (mat2[1][1] bleibt Infinity), hier genauso
+    kosten[1] = np.inf
+    starts: Dict[int, np.ndarray] = {}
+    for k in range(2, klassen + 1):
+        neu = np.full(n + 1, np.inf)
+        start_k = np.zeros(n + 1, dtype=np.int64)
+        kandidaten = np.arange(k - 1, n)[:, None]  # Beginn der letzten Klasse
+        schritt = max(1, blockgroesse // max(1, len(kandidaten)))
+        for b in range(k, n + 1, schritt):
+            e = enden[b:b + schritt][None, :]
+            summe = np.where(kandidaten < e, kosten[kandidaten] + abweichung(kandidaten, e), np.inf)
+            # bei Gleichstand der früheste Beginn, wie die Schleife in geostats
+            arg = np.argmin(summe, axis=0)
+            neu[b:b + schritt] = summe[arg, np.arange(summe.shape[1])]
+            start_k[b:b + schritt] = arg + k - 1
+        kosten = neu
+        starts[k] = start_k
+
+    result = {}
+    for k in range(2, klassen + 1):
+        indizes = []
+        ende = n
+        for j in range(k, 1, -1):
+            ende = int(starts[j][ende])
+            indizes.append(ende - 1)
+        result[k] = indizes[::-1]
+    return result
+
+
+def quantile(werte: np.ndarray, klassen: int) -> Dict[int, List[int]]:
+    '''wie geostats getClassQuantile, Indizes wie bei jenks'''
+    n = len(werte)
+    return {k: [min(i * round(n / k), n - 1) for i in range(1, k)] for k in range(2, klassen + 1)}
+
+
+def gleiche_intervalle(werte: np.ndarray, klassen: int) -> Dict[int, List[float]]:
+    lo, hi = float(werte.min()), float(werte.max())
+    return {k: [lo + (hi - lo) * i / k for i in range(k)] + [hi] for k in range(2, klassen + 1)}
+
+
+def grenzen(werte: np.ndarray) -> Dict[str, Any]:
+    werte = werte[np.isfinite(werte)]
+    # wie binNum in applyData: höchstens halb so viele Klassen wie Werte ungleich 0, höchstens so viele wie verschiedene Werte
+    klassen = min(max(1, min(int(np.count_nonzero(werte)) // 2, max_klassen)), len(np.unique(werte)))
+    result: Dict[str, Any] = {"n": int(len(werte))}
+    if klassen < 2:
+        return result
+    result["jenks"] = {str(k): v for k, v in jenks(werte, klassen).items()}
+    result["quantile"] = {str(k): v for k, v in quantile(werte, klassen).items()}
+    result["eq"] = {str(k): [round(g, stellen) for g in v] for k, v in gleiche_intervalle(werte, klassen).items()}
+    return result
+
+
+def _prozent(zaehler: np.ndarray, nenner: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return zaehler / nenner * 100
+
+
+def felder(wahl: WahlDaten, ebene: Ebene) -> Iterator[Tuple[str, str, str, np.ndarray]]:
+    '''(propName, Datentyp, Argument, Werte je angezeigtem Gebiet) wie ErgebnisAnalysisCollection'''
+    angezeigt = ebene.geo_erwartet
+    for feld in wahl.typ.felder:
+        if isinstance(feld, KonstantesFeld):
+            yield feld.propName, "", "", ebene.summe(wahl.konstante(feld.propName))[angezeigt]
+        elif isinstance(feld, BerechnetesFeld):
+            zaehler, nenner = (ebene.summe(wahl.konstante(arg))[angezeigt] for arg in feld.args)
+            yield feld.propName, "", "", _prozent(zaehler, nenner)
+        elif isinstance(feld, GesammeltesFeld):
+            gueltig = ebene.summe(wahl.gueltig(feld))[angezeigt]
+            yield feld.propName, "", "", gueltig
+            parteien, stimmen = wahl.stimmen(feld)
+            stimmen = ebene.summe(stimmen)[angezeigt]
+            # Anteil: Gebiete mit 0 gültigen Stimmen zählen als 0 %
+            anteile = np.where(gueltig[:, None] > 0, _prozent(stimmen, gueltig[:, None]), 0)
+            anteile[np.isnan(stimmen)] = np.nan
+            for p, partei in enumerate(parteien):
+                if not np.isnan(stimmen[:, p]).all():
+                    yield feld.propName, "proportion", partei, anteile[:, p]
+            # Platzierung: k-t höchste Stimmenzahl, bei Gleichstand nur für den ersten der gleichauf liegenden Plätze
+            sortiert = -np.sort(np.where(np.isnan(stimmen), np.inf, -stimmen), axis=1)
+            sortiert[np.isinf(sortiert)] = np.nan
+            gleichauf = np.zeros_like(sortiert, dtype=bool)
+            gleichauf[:, 1:] = sortiert[:, 1:] == sortiert[:, :-1]
+            platz_anteile = np.where(gueltig[:, None] > 0, _prozent(sortiert, gueltig[:, None]), 0)
+            platz_anteile[np.isnan(sortiert) | gleichauf] = np.nan
+            for platz in range(sortiert.shape[1]):
+                yield feld.propName, "place", str(platz + 1), platz_anteile[:, platz]
+
+
+def klassen(wahl: WahlDaten) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for ebene in wahl.ebenen():
+        if not ebene.geo_erwartet.any():
+            continue
+        eintrag: Dict[str, Any] = result.setdefault(ebene.name, {})
+        for prop, datentyp, arg, werte in felder(wahl, ebene):
+            eintrag.setdefault(prop, {}).setdefault(datentyp, {})[arg] = grenzen(werte)
+    return result
+
+
+def ausgabepfad(wahl: WahlDaten) -> str:
+    '''Vorschlag für klassenPath: neben den Wahlergebnissen'''
+    return os.path.splitext(wahl.pfad("ergebnisPath"))[0] + ".klassen.json"
+
+
+def main() -> None:
+    for wahl in iter_wahldaten():
+        # nur Wahlen, die die Webanwendung mit Klassengrenzen lädt
+        if not wahl.config.get("klassenPath"):
+            continue
+        start = perf_counter()
+        result = klassen(wahl)
+        outpath = wahl.pfad("klassenPath")
+        with open(outpath, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"{wahl.termin['name']} / {wahl.name}: {os.path.getsize(outpath) // 1024} KiB, "
+              f"{perf_counter() - start:.2f} s -> {os.path.basename(outpath)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Binärformat für Wahlergebnisse (<Wahlergebnisse>.owdb): eine Offene-Wahldaten-csv als Spalten ganzer Zahlen, die
+ohne Umwandlung als Typed Array (Int8Array, Int16Array, Int32Array) oder NumPy-Array gelesen werden können.
+
+Aufbau:
+    4 Byte   Kennung b"OWDB"
+    4 Byte   Länge L des Kopfs (uint32, little endian)
+    L Byte   Kopf, JSON (UTF-8): {"version": 2, "zeilen": n,
+             "spalten": [{"name": "A1", "typ": "i2", "offset": Byte-Offset ab Dateianfang}, ...],
+             "text": [{"name": "bezirk-name", "typ": "i2", "offset": Byte-Offset, "werte": [Wert je Code]}, ...]}
+    ...      mit Leerzeichen auf ein Vielfaches von 8 Byte aufgefüllt (der Kopf endet damit auf Leerzeichen)
+    je Spalte n Werte vom Typ "typ" (i1, i2 oder i4: int8, int16, int32, little endian), in der Reihenfolge von
+             "spalten", dann "text", jede Spalte mit Nullbytes auf ein Vielfaches von 8 Byte aufgefüllt
+
+Zahlenspalten sind die Ergebnisspalten (A1, A, B, C, D, D1, D1_1, ...), leere Zellen werden als kleinster Wert des
+Typs abgelegt (FEHLEND). Jede Spalte bekommt den kleinsten Typ, in den ihre Werte passen; die meisten Ergebnisse
+eines Stimmbezirks brauchen nur 1 oder 2 Byte.
+Alle anderen Spalten (bezirk-nr, bezirk-name, wahl-name, ...) sind Textspalten und werden als Wörterbuch abgelegt:
+je Zeile ein Code, der Index in "werte" der Spalte (fehlende Felder am Zeilenende wie leere Zellen als "").
+So steht ein Wert, der sich über alle Zeilen wiederholt (wahl-name, wahl-datum, ...), nur einmal in der Datei.
+
+Version 1 legte alle Zahlen als int32 und die Textspalten als JSON-Listen mit einem Wert je Zeile im Kopf ab, die
+Dateien waren damit größer als die csv. Sie müssen neu übersetzt werden.
+'''
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import struct
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wahlconfig import ergebnis_csv, iter_wahlen, read_owd_csv, termin_dir
+
+KENNUNG = b"OWDB"
+VERSION = 2
+TYPEN = ("i1", "i2", "i4")
+# wie bei den Typed Arrays: kleinster Wert des Typs als Markierung für leere Zellen
+FEHLEND = {typ: int(np.iinfo("<" + typ).min) for typ in TYPEN}
+
+_zahlenspalte = re.compile(r"^[A-Z]\d*(_\d+)?$")
+
+
+def _typ(werte: np.ndarray, fehlend: bool) -> str:
+    '''kleinster Typ für die Werte, bei fehlenden Werten muss der kleinste Wert des Typs frei bleiben'''
+    for typ in TYPEN:
+        info = np.iinfo("<" + typ)
+        if not len(werte) or (werte.min() > info.min - (not fehlend) and werte.max() <= info.max):
+            return typ
+    raise ValueError(f"Werte außerhalb von int32 ({werte.min()} bis {werte.max()})")
+
+
+def _zahlen(zeilen: List[Dict[str, str]], spalte: str) -> Tuple[str, np.ndarray]:
+    werte = [row[spalte] for row in zeilen]
+    vorhanden = [i for i, v in enumerate(werte) if v not in ("", None)]
+    try:
+        zahlen = np.array([int(werte[i]) for i in vorhanden], dtype=np.int64)
+    except ValueError as e:
+        raise ValueError(f"Spalte {spalte}: keine ganze Zahl ({e})") from None
+    typ = _typ(zahlen, len(vorhanden) < len(werte))
+    daten = np.full(len(werte), FEHLEND[typ], dtype="<" + typ)
+    daten[vorhanden] = zahlen
+    return typ, daten
+
+
+def _codes(zeilen: List[Dict[str, str]], spalte: str) -> Tuple[str, np.ndarray, List[str]]:
+    codes: Dict[str, int] = {}
+    werte = np.array([codes.setdefault(row[spalte] or "", len(codes)) for row in zeilen], dtype=np.int64)
+    typ = _typ(werte, False)
+    return typ, werte.astype("<" + typ), list(codes)
+
+
+def kompilieren(zeilen: List[Dict[str, str]], outpath: str) -> None:
+    spalten = list(zeilen[0].keys()) if zeilen else []
+    zahlen = [s for s in spalten if s and _zahlenspalte.match(s)]
+    texte = [s for s in spalten if s not in zahlen]
+    n = len(zeilen)
+
+    daten: List[Tuple[str, np.ndarray]] = [_zahlen(zeilen, s) for s in zahlen]
+    woerterbuecher: List[List[str]] = []
+    for s in texte:
+        typ, codes, werte = _codes(zeilen, s)
+        daten.append((typ, codes))
+        woerterbuecher.append(werte)
+    # jede Spalte auf 8 Byte ausrichten, damit sie direkt als Typed Array gelesen werden kann
+    bloecke = [d.tobytes().ljust(-(-d.nbytes // 8) * 8, b"\0") for _, d in daten]
+
+    def _kopf(offsets: List[int]) -> bytes:
+        eintraege = [{"name": s, "typ": t, "offset": o} for s, (t, _), o in zip(zahlen + texte, daten, offsets)]
+        for eintrag, werte in zip(eintraege[len(zahlen):], woerterbuecher):
+            eintrag["werte"] = werte
+        return json.dumps({
+            "version": VERSION, "zeilen": n,
+            "spalten": eintraege[:len(zahlen)],
+            "text": eintraege[len(zahlen):],
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # die Offsets stehen im Kopf und hängen von seiner Länge ab: so lange rechnen, bis sie sich nicht mehr ändern
+    offsets = [0] * len(daten)
+    while True:
+        kopf = _kopf(offsets)
+        pos = -(-(8 + len(kopf)) // 8) * 8
+        beginn = pos
+        neu = []
+        for block in bloecke:
+            neu.append(pos)
+            pos += len(block)
+        if neu == offsets:
+            break
+        offsets = neu
+    kopf = kopf.ljust(beginn - 8)
+
+    tmp_path = outpath + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(KENNUNG)
+        f.write(struct.pack("<I", len(kopf)))
+        f.write(kopf)
+        for block in bloecke:
+            f.write(block)
+    os.replace(tmp_path, outpath)
+
+
+class OwdBin:
+    '''Liest eine .owdb-Datei per mmap, spalte() und codes() liefern Sichten ohne Kopie.'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != KENNUNG:
+            raise ValueError(f"{path}: keine OWDB-Datei")
+        (laenge,) = struct.unpack_from("<I", self._mmap, 4)
+        self.kopf: Dict[str, Any] = json.loads(self._mmap[8:8 + laenge])
+        if self.kopf["version"] != VERSION:
+            raise ValueError(f"{path}: Version {self.kopf['version']} wird nicht unterstützt")
+        self.zeilen: int = self.kopf["zeilen"]
+        self._zahlen: Dict[str, Dict[str, Any]] = {s["name"]: s for s in self.kopf["spalten"]}
+        self._text: Dict[str, Dict[str, Any]] = {s["name"]: s for s in self.kopf["text"]}
+
+    def __enter__(self) -> OwdBin:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    @property
+    def spalten(self) -> List[str]:
+        return list(self._zahlen)
+
+    @property
+    def textspalten(self) -> List[str]:
+        return list(self._text)
+
+    def _sicht(self, eintrag: Dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(self._mmap, dtype="<" + eintrag["typ"], count=self.zeilen, offset=eintrag["offset"])
+
+    def spalte(self, name: str) -> np.ndarray:
+        '''Werte je Zeile im Typ der Spalte, leere Zellen: fehlend(name)'''
+        return self._sicht(self._zahlen[name])
+
+    def fehlend(self, name: str) -> int:
+        return FEHLEND[self._zahlen[name]["typ"]]
+
+    def werte(self, name: str) -> np.ndarray:
+        '''float64-Werte je Zeile, leere Zellen: NaN (Kopie)'''
+        spalte = self.spalte(name)
+        return np.where(spalte == self.fehlend(name), np.nan, spalte)
+
+    def codes(self, name: str) -> np.ndarray:
+        '''Codes je Zeile einer Textspalte, Index in woerterbuch(name)'''
+        return self._sicht(self._text[name])
+
+    def woerterbuch(self, name: str) -> List[str]:
+        return self._text[name]["werte"]
+
+    def text(self, name: str) -> List[str]:
+        '''Werte je Zeile einer Textspalte'''
+        werte = self.woerterbuch(name)
+        return [werte[c] for c in self.codes(name)]
+
+    def zeile(self, i: int) -> Dict[str, str]:
+        '''Eine Zeile wie aus der csv (leere Zellen als "")'''
+        result = {s: self.woerterbuch(s)[self.codes(s)[i]] for s in self._text}
+        for s in self._zahlen:
+            v = int(self.spalte(s)[i])
+            result[s] = "" if v == self.fehlend(s) else str(v)
+        return result
+
+
+def ausgabepfad(csvpath: str) -> str:
+    return os.path.splitext(csvpath)[0] + ".owdb"
+
+
+def _erwartet(row: Dict[str, Optional[str]], zahlen: List[str]) -> Dict[str, str]:
+    '''Zeile der csv so, wie sie aus der .owdb wieder herauskommt'''
+    # fehlende Felder am Zeilenende liest DictReader als None, Zahlen werden ohne Leerzeichen abgelegt
+    return {k: "" if v is None else v.strip() if k in zahlen else v for k, v in row.items()}
+
+
+def main() -> None:
+    erledigt = set()
+    for termin, wahl in iter_wahlen():
+        # ergebnisPath kann schon auf die .owdb zeigen, übersetzt wird immer die csv daneben
+        csvpath = ergebnis_csv(os.path.join(termin_dir(termin), wahl["ergebnisPath"]))
+        if csvpath in erledigt:
+            continue
+        erledigt.add(csvpath)
+        if not os.path.exists(csvpath):
+            print(f"{os.path.relpath(csvpath)}: fehlt")
+            continue
+        start = perf_counter()
+        zeilen = read_owd_csv(csvpath)
+        outpath = ausgabepfad(csvpath)
+        kompilieren(zeilen, outpath)
+        dauer = perf_counter() - start
+        with OwdBin(outpath) as owdb:
+            # jede Zeile muss wieder herauskommen
+            for i, row in enumerate(zeilen):
+                if owdb.zeile(i) != _erwartet(row, owdb.spalten):
+                    raise ValueError(f"{outpath}: Zeile {i + 1} weicht von der csv ab")
+            spalten = len(owdb.spalten)
+        print(f"{os.path.relpath(csvpath)}: {len(zeilen)} Zeilen, {spalten} Zahlenspalten, "
+              f"{os.path.getsize(csvpath) // 1024} -> {os.path.getsize(outpath) // 1024} KiB, {dauer:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
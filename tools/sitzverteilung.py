@@ -0,0 +1,305 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Sitzverteilung für Rats-, Kreistags- und Bezirksvertretungswahlen aus den Offene-Wahldaten (Wahlergebnisse und
+Stimmzettel), mit Direktmandaten aus den Wahlbezirken (kandidat-gebiet-nr) sowie Überhang- und Ausgleichsmandaten.
+
+Die Verfahren arbeiten auf Arrays Szenarien x Parteien, so lassen sich viele Varianten (Stimmenverschiebungen,
+Sperrklauseln) in einem Aufruf durchrechnen:
+    sainte-lague: Sainte-Laguë/Schepers (Divisoren 0,5; 1,5; 2,5; ...), in NRW für Rat, Kreistag und BV
+    dhondt: D'Hondt (Divisoren 1, 2, 3, ...)
+    hare-niemeyer: Quoten mit größten Resten
+Die Divisorverfahren starten mit einer sicheren Unterschätzung aus der Quote und vergeben die übrigen Sitze einzeln
+über die nächste Höchstzahl, statt alle Höchstzahlen zu sortieren. Bei Gleichstand entscheidet im Gesetz das Los, hier
+die Stimmzettel-Reihenfolge (der Sitz geht an die vordere Partei).
+
+Ablauf wie § 33 KWahlG NRW: Sitze von Einzelbewerbern (partei-typ E) mit Direktmandat werden vorab abgezogen, die
+übrigen nach dem Verfahren auf die Parteien verteilt. Hat eine Partei mehr Direktmandate als Sitze, behält sie sie
+(Überhang); mit Ausgleich wird die Gesamtzahl so lange erhöht, bis alle Direktmandate gedeckt sind. Ob eine Partei
+eine Reserveliste eingereicht hat, steht nicht in den Offene-Wahldaten, angenommen wird es für alle.
+
+Als Skript: Sitzverteilung je Wahl aus `gremien`, geschrieben als <Wahlergebnisse>.sitze.json, und die Zahl der
+Szenarien je Sekunde für `szenarien` zufällige Stimmenverschiebungen.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from ergebnisse import GesammeltesFeld, WahlDaten, iter_wahldaten
+from wahlconfig import read_owd_csv
+
+
+@dataclass
+class Gremium:
+    # None: zwei je Wahlbezirk (NRW: die Hälfte der Sitze wird in den Wahlbezirken vergeben),
+    # dict: je stimmzettel-gebiet-nr (Bezirksvertretungen)
+    sitze: Union[None, int, Dict[str, int]] = None
+    verfahren: str = "sainte-lague"
+    direktmandate: bool = True
+    ausgleich: bool = True
+    sperrklausel: float = 0.0  # Anteil an den gültigen Stimmen
+    ungerade: bool = False  # nach dem Ausgleich gerade Gesamtzahl um einen Sitz erhöhen
+    kandidat_gebiet: str = "kandidat-gebiet-nr"  # Spalte der Wahlgebietseinteilungen mit dem Wahlbezirk
+
+
+# wahl-name -> Gremium, andere Wahlen werden übergangen
+gremien: Dict[str, Gremium] = {
+    "Ratswahl": Gremium(),
+    "Ratswahl NRW": Gremium(),
+    "Kreistagswahl NRW": Gremium(),
+    # vorläufige Daten ohne kandidat-gebiet-nr
+    "Wahl der Vertretung der Gemeinde (Rat der Stadt Hagen)": Gremium(kandidat_gebiet="gebiet-ebene-2-nr"),
+    "Bezirksvertretungswahl NRW": Gremium(sitze=19, direktmandate=False),
+    # "BV-Wahl": Gremium(sitze={"Hagen-Mitte": 19, "Hagen-Nord": 19, ...}, direktmandate=False),
+}
+# Benchmark: zufällige Verschiebungen der Stimmenanteile (Standardabweichung in Prozentpunkten)
+szenarien = 10000
+streuung = 2.0
+
+Verfahren = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+@dataclass
+class Divisorverfahren:
+    '''Höchstzahlverfahren mit den Divisoren versatz, versatz + 1, versatz + 2, ...'''
+    versatz: float
+
+    def __call__(self, stimmen: np.ndarray, sitze: np.ndarray) -> np.ndarray:
+        '''stimmen: Szenarien x Parteien, sitze: je Szenario -> Sitze Szenarien x Parteien'''
+        # Startwert: alle Höchstzahlen über einer oberen Grenze der letzten, die zum Zug kommt. Je Partei sind
+        # höchstens stimmen / h - versatz + 1 Höchstzahlen >= h, die letzte ist also höchstens
+        # Summe / (sitze - Parteien * (1 - versatz)). Die Höchstzahlen darüber gehören sicher zur Verteilung.
+        summe = stimmen.sum(axis=1, keepdims=True)
+        rest = sitze[:, None] - stimmen.shape[1] * (1 - self.versatz)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            anzahl = np.where((summe > 0) & (rest > 0), stimmen * rest / summe - self.versatz, 0)
+        result = np.maximum(np.ceil(anzahl - 1e-9), 0).astype(np.int64)
+        zeilen = np.arange(len(stimmen))
+        verteilbar = (stimmen > 0).any(axis=1)
+        # die übrigen Sitze einzeln nach der nächsten Höchstzahl, bei Gleichstand (argmax) an die vordere Partei
+        while True:
+            mehr = (result.sum(axis=1) < sitze) & verteilbar
+            if not mehr.any():
+                return result
+            with np.errstate(divide="ignore", invalid="ignore"):
+                naechste = np.where(stimmen[mehr] > 0, stimmen[mehr] / (result[mehr] + self.versatz), -np.inf)
+            result[zeilen[mehr], np.argmax(naechste, axis=1)] += 1
+
+    def mindestsitze(self, stimmen: np.ndarray, direkt: np.ndarray) -> np.ndarray:
+        '''je Szenario eine untere Grenze der Sitzzahl, ab der jede Partei ihre Direktmandate über die Liste erhält'''
+        # die kleinste Höchstzahl, die noch zum Zug kommen muss, und alle Höchstzahlen darüber (bei Gleichstand kann
+        # sie schon vorher zum Zug kommen, daher nur die echt größeren)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            noetig = np.where(direkt > 0, stimmen / (direkt - 1 + self.versatz), np.inf).min(axis=1, keepdims=True)
+            anzahl = np.ceil(stimmen / noetig - self.versatz - 1e-9)
+        return np.where(np.isfinite(noetig[:, 0]), np.maximum(anzahl, 0).sum(axis=1) + 1, 0).astype(np.int64)
+
+
+def hare_niemeyer(stimmen: np.ndarray, sitze: np.ndarray) -> np.ndarray:
+    summe = stimmen.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        quote = np.where(summe > 0, stimmen * sitze[:, None] / summe, 0)
+    result = np.floor(quote).astype(np.int64)
+    rest = sitze - result.sum(axis=1)
+    reihenfolge = np.argsort(-(quote - result), axis=1, kind="stable")
+    rang = np.empty_like(reihenfolge)
+    np.put_along_axis(rang, reihenfolge, np.arange(stimmen.shape[1])[None, :].repeat(len(stimmen), 0), axis=1)
+    return result + ((rang < rest[:, None]) & (stimmen > 0))
+
+
+VERFAHREN: Dict[str, Verfahren] = {
+    "sainte-lague": Divisorverfahren(0.5),
+    "dhondt": Divisorverfahren(1.0),
+    "hare-niemeyer": hare_niemeyer,
+}
+
+
+def sitzverteilung(stimmen: np.ndarray, sitze: Union[int, np.ndarray], verfahren: str = "sainte-lague",
+                   direkt: Optional[np.ndarray] = None, ausgleich: bool = True,
+                   sperrklausel: Union[float, np.ndarray] = 0.0, ungerade: bool = False,
+                   vorab: Union[int, np.ndarray] = 0) -> np.ndarray:
+    '''
+    Sitze je Partei (Szenarien x Parteien, bei eindimensionalen stimmen nur Parteien).
+
+    stimmen, direkt: (Szenarien x) Parteien; sitze, sperrklausel, vorab: je Szenario oder für alle.
+    vorab: Sitze, die nicht über die Liste vergeben werden (Einzelbewerber mit Direktmandat).
+    '''
+    stimmen = np.asarray(stimmen, dtype=float)
+    einzeln = stimmen.ndim == 1
+    stimmen = np.atleast_2d(stimmen)
+    n, p = stimmen.shape
+    direkt = np.zeros((n, p), dtype=np.int64) if direkt is None else np.broadcast_to(direkt, (n, p))
+    sitze = np.broadcast_to(np.asarray(sitze, dtype=np.int64), (n,)).copy()
+    vorab = np.broadcast_to(np.asarray(vorab, dtype=np.int64), (n,))
+    verteilen = VERFAHREN[verfahren]
+
+    summe = stimmen.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unter = stimmen / summe < np.broadcast_to(np.asarray(sperrklausel, dtype=float), (n,))[:, None]
+    unter |= stimmen <= 0
+    # Direktmandate von Parteien unter der Sperrklausel bleiben, sie zählen wie die der Einzelbewerber vorab
+    listen = np.where(unter, 0, stimmen)
+    vorab = vorab + np.where(unter, direkt, 0).sum(axis=1)
+    listensitze = np.maximum(sitze - vorab, 0)
+    result = verteilen(listen, listensitze)
+    if ausgleich:
+        offen = ((result < direkt) & ~unter).any(axis=1)
+        if offen.any() and isinstance(verteilen, Divisorverfahren):
+            # zur nötigen Sitzzahl springen statt von Anfang an sitzweise zu erhöhen
+            mindest = verteilen.mindestsitze(listen[offen], np.where(unter, 0, direkt)[offen])
+            listensitze[offen] = np.maximum(listensitze[offen], mindest)
+            result[offen] = verteilen(listen[offen], listensitze[offen])
+            offen = ((result < direkt) & ~unter).any(axis=1)
+        while offen.any():
+            listensitze[offen] += 1
+            result[offen] = verteilen(listen[offen], listensitze[offen])
+            offen = ((result < direkt) & ~unter).any(axis=1)
+        if ungerade:
+            gerade = (listensitze + vorab) % 2 == 0
+            gerade &= listensitze + vorab > sitze
+            listensitze[gerade] += 1
+            if gerade.any():
+                result[gerade] = verteilen(listen[gerade], listensitze[gerade])
+    result = np.maximum(result, direkt)
+    return result[0] if einzeln else result
+
+
+@dataclass
+class Ergebnis:
+    '''Stimmen je Partei für ein Gremium (bei Bezirksvertretungen je stimmzettel-gebiet-nr)'''
+    gebiet: Optional[str]
+    parteien: List[str]
+    einzelbewerber: np.ndarray  # je Partei: partei-typ E
+    stimmen: np.ndarray
+    direkt: np.ndarray  # gewonnene Wahlbezirke je Partei
+    wahlbezirke: int
+
+
+def ergebnisse(wahl: WahlDaten, feld: GesammeltesFeld, gremium: Gremium) -> List[Ergebnis]:
+    parteien, roh = wahl.stimmen(feld)
+    typ: Dict[str, str] = {}
+    for row in read_owd_csv(wahl.pfad("stimmzettelPath"), wahl.name):
+        typ[row.get("partei-kurzname") or row.get("partei-langname")] = row.get("partei-typ", "")
+    einzelbewerber = np.array([typ.get(_) == "E" for _ in parteien], dtype=bool)
+    stimmen = np.nan_to_num(roh)
+    gebiete = [row.get("stimmzettel-gebiet-nr") or None for row in wahl.gebiete]
+    wahlbezirke = [row.get(gremium.kandidat_gebiet) or "" for row in wahl.gebiete]
+    result = []
+    for gebiet in dict.fromkeys(gebiete):
+        zeilen = np.array([_ == gebiet for _ in gebiete])
+        im_gebiet = stimmen[zeilen]
+        # nur Parteien, die in diesem Gebiet auf dem Stimmzettel stehen
+        spalten = np.flatnonzero(~np.isnan(roh[zeilen]).all(axis=0))
+        direkt = np.zeros(len(spalten), dtype=np.int64)
+        anzahl = 0
+        if gremium.direktmandate:
+            nummern = [nr for nr, z in zip(wahlbezirke, zeilen) if z]
+            gueltig = [nr for nr in dict.fromkeys(nummern) if nr and not nr.startswith("???")]
+            index = {nr: i for i, nr in enumerate(gueltig)}
+            je_bezirk = np.zeros((len(gueltig), len(spalten)))
+            zuordnung = np.array([index.get(nr, -1) for nr in nummern])
+            np.add.at(je_bezirk, zuordnung[zuordnung >= 0], im_gebiet[zuordnung >= 0][:, spalten])
+            gewonnen = je_bezirk.max(axis=1) > 0
+            direkt = np.bincount(np.argmax(je_bezirk, axis=1)[gewonnen], minlength=len(spalten))
+            anzahl = len(gueltig)
+        result.append(Ergebnis(gebiet, [parteien[_] for _ in spalten], einzelbewerber[spalten],
+                               im_gebiet[:, spalten].sum(axis=0), direkt, anzahl))
+    return result
+
+
+def verteilen(ergebnis: Ergebnis, gremium: Gremium, stimmen: Optional[np.ndarray] = None,
+              direkt: Optional[np.ndarray] = None) -> np.ndarray:
+    '''
+    Sitze je Partei (Einzelbewerber: 0 oder 1), stimmen und direkt: optional Szenarien x Parteien statt der
+    Ergebnisse
+    '''
+    if isinstance(gremium.sitze, dict):
+        sitze = gremium.sitze[ergebnis.gebiet]
+    else:
+        sitze = gremium.sitze if gremium.sitze is not None else 2 * ergebnis.wahlbezirke
+    stimmen = ergebnis.stimmen if stimmen is None else stimmen
+    direkt = ergebnis.direkt if direkt is None else direkt
+    # Einzelbewerber gehen nicht in die Verteilung ein, ihre Direktmandate werden vorab abgezogen
+    eb = ergebnis.einzelbewerber
+    listensitze = sitzverteilung(stimmen[..., ~eb], sitze, gremium.verfahren, direkt[..., ~eb],
+                                 gremium.ausgleich, gremium.sperrklausel, gremium.ungerade,
+                                 vorab=direkt[..., eb].sum(axis=-1))
+    result = np.zeros(stimmen.shape, dtype=np.int64)
+    result[..., ~eb] = listensitze
+    result[..., eb] = direkt[..., eb]
+    return result
+
+
+def ausgabepfad(wahl: WahlDaten) -> str:
+    return f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.sitze.json"
+
+
+def _benchmark(ergebnis: Ergebnis, gremium: Gremium) -> float:
+    '''Szenarien je Sekunde: Stimmenanteile normalverteilt verschoben'''
+    rng = np.random.default_rng(0)
+    anteile = ergebnis.stimmen / ergebnis.stimmen.sum()
+    verschoben = np.maximum(anteile + rng.normal(0, streuung / 100, (szenarien, len(anteile))), 0)
+    start = perf_counter()
+    verteilen(ergebnis, gremium, verschoben * ergebnis.stimmen.sum())
+    return szenarien / (perf_counter() - start)
+
+
+def _pruefen(faelle: int = 3000) -> None:
+    '''Divisorverfahren gegen das Sortieren aller Höchstzahlen (Gleichstand: vordere Partei), mit Gleichständen'''
+    # Quoten genau auf ,5: Sainte-Laguë vergibt die letzten Sitze nach der Stimmzettel-Reihenfolge
+    gleichstand = sitzverteilung([2500, 3000, 1500, 3500, 2500, 1500, 500], 45, ausgleich=False)
+    assert gleichstand.tolist() == [8, 9, 5, 11, 7, 4, 1], gleichstand
+    rng = np.random.default_rng(seed=0)
+    for _ in range(faelle):
+        # wenige verschiedene Stimmenzahlen, damit Gleichstände häufig sind
+        stimmen = rng.integers(0, 40, rng.integers(2, 12)) * rng.choice([1, 100, 500])
+        sitze = int(rng.integers(1, 80))
+        for name, verfahren in VERFAHREN.items():
+            if not isinstance(verfahren, Divisorverfahren) or not stimmen.any():
+                continue
+            hoechstzahlen = sorted((-v / (j + verfahren.versatz), i) for i, v in enumerate(stimmen) if v > 0
+                                   for j in range(sitze))
+            erwartet = np.bincount([i for _, i in hoechstzahlen[:sitze]], minlength=len(stimmen))
+            result = sitzverteilung(stimmen, sitze, name, ausgleich=False)
+            assert (result == erwartet).all(), (name, stimmen, sitze, result, erwartet)
+
+
+def main() -> None:
+    _pruefen()
+    for wahl in iter_wahldaten():
+        gremium = gremien.get(wahl.name)
+        if gremium is None:
+            continue
+        felder = [_ for _ in wahl.typ.felder if isinstance(_, GesammeltesFeld)]
+        result: Dict[str, Any] = {"wahl": wahl.name, "verfahren": gremium.verfahren, "gremien": []}
+        for ergebnis in ergebnisse(wahl, felder[0], gremium):
+            if isinstance(gremium.sitze, dict) and ergebnis.gebiet not in gremium.sitze:
+                print(f"{wahl.termin['name']} / {wahl.name} / {ergebnis.gebiet}: Sitzzahl fehlt in gremien")
+                continue
+            sitze = verteilen(ergebnis, gremium)
+            result["gremien"].append({
+                "gebiet": ergebnis.gebiet,
+                "wahlbezirke": ergebnis.wahlbezirke,
+                "sitze": int(sitze.sum()),
+                "parteien": ergebnis.parteien,
+                "stimmen": [int(_) for _ in ergebnis.stimmen],
+                "direkt": [int(_) for _ in ergebnis.direkt],
+                "verteilung": [int(_) for _ in sitze],
+            })
+            verteilung = ", ".join(f"{p} {s}" for p, s in zip(ergebnis.parteien, sitze) if s)
+            print(f"{wahl.termin['name']} / {wahl.name}{' / ' + ergebnis.gebiet if ergebnis.gebiet else ''}: "
+                  f"{sitze.sum()} Sitze ({verteilung}), {_benchmark(ergebnis, gremium):,.0f} Szenarien/s")
+        with open(ausgabepfad(wahl), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
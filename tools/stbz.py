@@ -0,0 +1,346 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Liest aus dem HTML5-Frontend von votemanager die Zuordnung der Stimmbezirke zu den übergeordneten Gebieten
+(Stadtbezirk, Wahlkreis, Ortsbezirk, ...) und schreibt sie als Spalten einer Wahlgebietseinteilungen-csv.
+
+Ersetzt tools/archived/stbz/{stbz,stbz-karlsruhe,stbz-wiesbaden}.py: was dort je Stadt im Code stand, steht hier in
+`seiten`. Je Seite wird angegeben, welcher card-header auf der Seite eines Stimmbezirks welche Ebene (gebiet-ebene-N)
+liefert und wie aus dem Link die Nummer wird. Die Seiten der Stimmbezirke werden mit asyncio über eine gemeinsame
+Session geladen, höchstens `gleichzeitig` auf einmal, und mit tools/vmhtml.py ausgelesen.
+
+Ist `api_base` gesetzt, kommen die Stimmbezirke aus der JSON-API (daten/api/, wie in tools/api-to-owd.py): die Liste
+aus der Übersichtstabelle der untersten Ebene (uebersicht_<Ebene>_0.json, eine Anfrage), die Zuordnung aus der
+gebietsverlinkung in ergebnis_<Bezirk>_0.json, einer kleinen JSON-Datei statt einer HTML-Seite. Die Karten werden dann
+mit dem titel der gebietsverlinkung verglichen. Nur für Stimmbezirke, bei denen dort Ebenen fehlen, wird die
+HTML-Seite gelesen (sofern stbz_path gesetzt ist).
+
+Jeder fertige Stimmbezirk wird sofort in <outpath>.teile.jsonl festgehalten. Fehlgeschlagene Anfragen werden mit
+wachsender Pause wiederholt (`versuche`, `pause`); ein erneuter Aufruf lädt nur noch die Stimmbezirke, die dort fehlen
+oder fehlgeschlagen sind. Für einen ganz neuen Durchlauf die Datei löschen.
+
+Benötigt: pip install aiohttp
+'''
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+from csv import writer
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from vmhtml import karten_links, tabelle_erste_spalte
+
+# höchstens so viele Anfragen auf einmal
+gleichzeitig = 20
+timeout = 30
+# Anfragen je Seite, dazwischen pause, 2*pause, 4*pause, ... Sekunden (plus Zufall)
+versuche = 4
+pause = 1.0
+
+
+def _name_to_id(name: str) -> str:
+    '''wie in tools/api-to-owd.py'''
+    return ''.join(_ for _ in name.split(" ")[0] if _.isdigit()) or ''.join(_ for _ in name.split(" ")[-1] if _.isdigit()) or name
+
+
+@dataclass
+class Karte:
+    '''Eine card auf der Seite eines Stimmbezirks, deren Link das Gebiet einer Ebene angibt'''
+    header: str  # Text des card-header, mit "..." am Ende: Präfix (z. B. "Ortsbezirk...")
+    level: int  # 2-5: gebiet-ebene-N
+    # Nummer aus dem Linktext, sonst der Linktext selbst
+    nummer: Callable[[str], str] = lambda text: text
+    # Name aus dem title des Links (Hagen: Linktext ist die Nummer), sonst der Linktext
+    name_aus_title: bool = False
+    # JSON-API: Nummer aus dem title des Gebietslinks
+    nummer_json: Callable[[str], str] = _name_to_id
+
+    def passt(self, text: str) -> bool:
+        text = text.strip()
+        if self.header.endswith("..."):
+            return text.startswith(self.header[:-3])
+        return text == self.header
+
+
+@dataclass
+class Seite:
+    base_url: str  # HTML5-Frontend (.../html5/)
+    stbz_path: Optional[str]  # Übersicht aller Stimmbezirke, None: nur JSON-API
+    outpath: str
+    karten: List[Karte]
+    # JSON-API (.../daten/api/), None: nur HTML
+    api_base: Optional[str] = None
+    # Titel der Wahl in wahl.json, None: die erste Wahl des Termins
+    wahl_titel: Optional[str] = None
+    # letzte Tabellenzeile ist das Gesamtergebnis der Gemeinde
+    gemeinde_zeile: bool = True
+    # Ebene, die auch als kandidat-gebiet bzw. stimmzettel-gebiet eingetragen wird
+    kandidat_level: Optional[int] = None
+    stimmzettel_level: Optional[int] = None
+
+
+_hagen_stadtbezirke = {"Hagen-Mitte": "1", "Hagen-Nord": "2", "Hohenlimburg": "3", "Eilpe/Dahl": "4", "Haspe": "5"}
+
+seiten: Dict[str, Seite] = {
+    # Ratswahl: Bezirk=Stimmbezirk, 2=Wahlbezirk, 3=Stadtbezirk
+    "hagen-kw2020": Seite(
+        "http://www.wahlergebnisse.stadt-hagen.de/prod/KW2020/05914000/html5/",
+        "Ratswahl_NRW_205_Uebersicht_stbz.html", "./scrape-stimmbezirke.csv",
+        [Karte("Stadtbezirk", 3, lambda text: _hagen_stadtbezirke.get(text, ""),
+               nummer_json=lambda title: _hagen_stadtbezirke.get(title, "")),
+         Karte("Wahlbezirk", 2, name_aus_title=True)],
+        kandidat_level=2),
+    # Landtagswahl: Bezirk=Wahlbezirk, 2=Stadtteil, 3=Wahlkreis
+    "karlsruhe-ltw2021": Seite(
+        "https://wahlergebnisse.komm.one/02/produktion/wahltermin-20210314/08212000/html5/",
+        "Landtagswahl_BW_2021_Land_BW_172_Uebersicht_stbz.html", "./scrape-stbz-karlsruhe.csv",
+        [Karte("Wahlkreise", 3, lambda text: text[10:12]),
+         Karte("Stadtteile", 2)],
+        gemeinde_zeile=False, kandidat_level=3, stimmzettel_level=3),
+    # Bürgerentscheid: Bezirk=Wahlbezirk, 2=Ortsbezirk
+    "wiesbaden-citybahn": Seite(
+        "https://votemanager-wi.ekom21cdn.de/01112020buergerentscheid/06414000/html5/",
+        "Buergerentscheid_Hessen_22_Uebersicht_stbz.html", "./scrape-stbz-wiesbaden.csv",
+        [Karte("Ortsbezirk...", 2)]),
+    # Beispiel JSON-API mit Rückgriff auf HTML (neuere votemanager-Versionen)
+    # "hagen-btw2025": Seite(
+    #     "https://wahlergebnisse.stadt-hagen.de/prod/BW2025/05914000/html5/", None, "./scrape-stbz-hagen-btw2025.csv",
+    #     [Karte("Stadtbezirk", 3, ...), Karte("Wahlbezirk", 2, name_aus_title=True)],
+    #     api_base="https://wahlergebnisse.stadt-hagen.de/prod/BW2025/05914000/daten/api/"),
+}
+seite = seiten["hagen-kw2020"]
+
+
+@dataclass
+class Stimmbezirk:
+    name: str
+    url: str
+    # level -> (Nummer, Name)
+    gebiete: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+
+    @property
+    def nr(self) -> str:
+        return ''.join(_ for _ in self.name if _.isdigit())
+
+    @property
+    def art(self) -> str:
+        return 'B' if 'Briefwahl' in self.name else 'W'
+
+    def gebiet(self, level: Optional[int]) -> Tuple[str, str]:
+        return self.gebiete.get(level, ("", "")) if level else ("", "")
+
+    def OWDrow(self, s: Seite) -> Tuple[str, ...]:
+        return (
+            *(_ for level in range(5, 1, -1) for _ in self.gebiet(level)),
+            self.nr, self.name, self.art,
+            "",
+            *self.gebiet(s.kandidat_level),
+            *self.gebiet(s.stimmzettel_level),
+        )
+
+    @staticmethod
+    def writeOWDcsv(s: Seite, stimmbezirke: List[Stimmbezirk]) -> None:
+        '''nur die Kernfelder, die anderen kann man mit einem modernen Editor ergänzen'''
+        with open(s.outpath, "w", newline="", encoding="utf-8") as csvf:
+            csvw = writer(csvf, delimiter=";")
+            csvw.writerow((
+                "gebiet-ebene-5-nr", "gebiet-ebene-5-name",
+                "gebiet-ebene-4-nr", "gebiet-ebene-4-name",
+                "gebiet-ebene-3-nr", "gebiet-ebene-3-name",
+                "gebiet-ebene-2-nr", "gebiet-ebene-2-name",
+                "bezirk-nr", "bezirk-name", "bezirk-art",
+                "bezirk-repräsentativ",
+                "kandidat-gebiet-nr", "kandidat-gebiet-bezeichnung",
+                "stimmzettel-gebiet-nr", "stimmzettel-gebiet-bezeichnung"
+            ))
+            csvw.writerows((sb.OWDrow(s) for sb in stimmbezirke))
+
+
+def stimmbezirke_lesen(s: Seite, html: str) -> List[Stimmbezirk]:
+    '''Stimmbezirke (Name und URL) aus der ersten Spalte der Übersichtstabelle'''
+    tabellen, zeilen = tabelle_erste_spalte(html)
+    if tabellen != 1:
+        raise ValueError(f"{s.stbz_path}: {tabellen} Tabellen statt einer")
+    if s.gemeinde_zeile:
+        if zeilen and any("Gemeinde" in (_ or "") for _ in zeilen[-1]):
+            del zeilen[-1]
+        else:
+            print("Achtung: Letzter Tabelleneintrag _kein_ Gemeinde-Link?")
+    return [Stimmbezirk(name=text, url=s.base_url + href) for text, href in zeilen if href]
+
+
+def gebiete_lesen(s: Seite, html: str) -> Dict[int, Tuple[str, str]]:
+    '''level -> (Nummer, Name) aus den cards der Seite eines Stimmbezirks'''
+    result: Dict[int, Tuple[str, str]] = {}
+    for link in karten_links(html, lambda header: any(k.passt(header) for k in s.karten), len(s.karten)):
+        karte = next(k for k in s.karten if k.passt(link.header))
+        if karte.level in result:
+            continue
+        name = link.title if karte.name_aus_title and link.title is not None else link.text
+        result[karte.level] = (karte.nummer(link.text), name)
+    fehlend = [k.header for k in s.karten if k.level not in result]
+    if fehlend:
+        raise ValueError(f"keine card {', '.join(fehlend)}")
+    return result
+
+
+def _wiederholen(e: Exception) -> bool:
+    '''vorübergehende Fehler: Netzwerk, Zeitüberschreitung, Serverfehler, zu viele Anfragen'''
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500 or e.status == 429
+    return isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+async def _get(session: aiohttp.ClientSession, url: str) -> str:
+    versuch = 1
+    while True:
+        try:
+            async with session.get(url) as r:
+                r.raise_for_status()
+                return await r.text()
+        except Exception as e:
+            if versuch >= versuche or not _wiederholen(e):
+                raise
+        await asyncio.sleep(pause * 2 ** (versuch - 1) * (1 + random.random() / 2))
+        versuch += 1
+
+
+def gebiete_aus_json(s: Seite, data: Dict[str, Any]) -> Dict[int, Tuple[str, str]]:
+    '''level -> (Nummer, Name) aus der gebietsverlinkung eines Bezirks, ValueError wenn Ebenen fehlen'''
+    result: Dict[int, Tuple[str, str]] = {}
+    for gv in data['Komponente'].get('gebietsverlinkung') or []:
+        karte = next((k for k in s.karten if k.passt(gv['titel'])), None)
+        if karte is None or karte.level in result or not gv['gebietslinks']:
+            continue
+        title = gv['gebietslinks'][0]['title']
+        result[karte.level] = (karte.nummer_json(title), title)
+    fehlend = [k.header for k in s.karten if k.level not in result]
+    if fehlend:
+        raise ValueError(f"keine gebietsverlinkung {', '.join(fehlend)}")
+    return result
+
+
+async def _json(session: aiohttp.ClientSession, url: str) -> Any:
+    return json.loads(await _get(session, url))
+
+
+async def stimmbezirke_api(s: Seite, session: aiohttp.ClientSession) -> List[Stimmbezirk]:
+    '''Stimmbezirke aus der Übersichtstabelle der untersten Ebene, url: ergebnis_<Bezirk>_0.json'''
+    termin = await _json(session, f"{s.api_base}termin.json")
+    wahl_ids = list(dict.fromkeys(eintrag['wahl']['id'] for eintrag in termin['wahleintraege']))
+    for wahl_id in wahl_ids:
+        wahl_base = f"{s.api_base}wahl_{wahl_id}/"
+        wahl_json = await _json(session, f"{wahl_base}wahl.json")
+        if s.wahl_titel in (None, wahl_json['titel']):
+            break
+    else:
+        raise ValueError(f"keine Wahl {s.wahl_titel} in {s.api_base}termin.json")
+    ebene_id = wahl_json['menu_links'][-1]['id']
+    uebersicht = await _json(session, f"{wahl_base}uebersicht_{ebene_id}_0.json")
+    return [Stimmbezirk(name=zeile['label'] or zeile['link'].get('title'),
+                        url=f"{wahl_base}ergebnis_{zeile['link']['id']}_0.json")
+            for zeile in uebersicht['tabelle']['zeilen'] if zeile['stimmbezirk'] and zeile.get('link')]
+
+
+def teile_pfad(s: Seite) -> str:
+    return s.outpath + ".teile.jsonl"
+
+
+def teile_lesen(s: Seite) -> Dict[str, Dict[int, Tuple[str, str]]]:
+    '''Name -> Gebiete der bisher erfolgreich gelesenen Stimmbezirke (spätere Zeilen gewinnen)'''
+    result: Dict[str, Dict[int, Tuple[str, str]]] = {}
+    if not os.path.exists(teile_pfad(s)):
+        return result
+    with open(teile_pfad(s), "r", encoding="utf-8") as f:
+        for zeile in f:
+            try:
+                eintrag = json.loads(zeile)
+            except ValueError:
+                continue  # abgebrochen mitten in der Zeile
+            if eintrag.get("gebiete"):
+                result[eintrag["name"]] = {int(level): tuple(g) for level, g in eintrag["gebiete"].items()}
+            else:
+                result.pop(eintrag["name"], None)
+    return result
+
+
+async def scrape(s: Seite) -> List[Stimmbezirk]:
+    connector = aiohttp.TCPConnector(limit=gleichzeitig)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        if s.api_base:
+            stimmbezirke = await stimmbezirke_api(s, session)
+        else:
+            stimmbezirke = stimmbezirke_lesen(s, await _get(session, s.base_url + s.stbz_path))
+        html_urls: Optional[asyncio.Future] = None
+
+        async def _html_urls() -> Dict[str, str]:
+            return {sb.name: sb.url for sb in stimmbezirke_lesen(s, await _get(session, s.base_url + s.stbz_path))}
+
+        fertig = teile_lesen(s)
+        offen = []
+        for sb in stimmbezirke:
+            if sb.name in fertig:
+                sb.gebiete = fertig[sb.name]
+            else:
+                offen.append(sb)
+        if fertig:
+            print(f"{len(stimmbezirke) - len(offen)} Stimmbezirke aus {teile_pfad(s)}, {len(offen)} offen")
+
+        async def _html(sb: Stimmbezirk) -> Dict[int, Tuple[str, str]]:
+            '''Rückgriff auf die HTML-Seite eines Stimmbezirks aus der JSON-API'''
+            nonlocal html_urls
+            if html_urls is None:
+                # Übersicht erst laden, wenn der erste Stimmbezirk sie braucht, und nur einmal
+                html_urls = asyncio.ensure_future(_html_urls())
+            url = (await html_urls).get(sb.name)
+            if url is None:
+                raise ValueError("nicht in der HTML-Übersicht")
+            return gebiete_lesen(s, await _get(session, url))
+
+        with open(teile_pfad(s), "a", encoding="utf-8") as teile:
+            def _festhalten(sb: Stimmbezirk, fehler: Optional[str] = None) -> None:
+                eintrag = {"name": sb.name, "url": sb.url}
+                eintrag.update({"fehler": fehler} if fehler else {"gebiete": sb.gebiete})
+                teile.write(json.dumps(eintrag, ensure_ascii=False) + "\n")
+                teile.flush()
+
+            async def _sb(sb: Stimmbezirk) -> None:
+                try:
+                    if s.api_base:
+                        try:
+                            sb.gebiete = gebiete_aus_json(s, await _json(session, sb.url))
+                        except ValueError:
+                            if s.stbz_path is None:
+                                raise
+                            sb.gebiete = await _html(sb)
+                    else:
+                        sb.gebiete = gebiete_lesen(s, await _get(session, sb.url))
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                    print(f'fail on stimmbezirk {sb.name}: {e!r}')
+                    _festhalten(sb, repr(e))
+                else:
+                    _festhalten(sb)
+
+            await asyncio.gather(*(_sb(sb) for sb in offen))
+    return stimmbezirke
+
+
+def main() -> None:
+    start = perf_counter()
+    stimmbezirke = asyncio.run(scrape(seite))
+    Stimmbezirk.writeOWDcsv(seite, stimmbezirke)
+    fehler = sum(1 for sb in stimmbezirke if not sb.gebiete)
+    print(f"{len(stimmbezirke)} Stimmbezirke, {fehler} fehlgeschlagen{' (erneut aufrufen)' if fehler else ''}, "
+          f"{perf_counter() - start:.2f} s -> {seite.outpath}")
+
+
+if __name__ == "__main__":
+    main()
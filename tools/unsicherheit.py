@@ -0,0 +1,279 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Unsicherheitsbereiche für Hochrechnung und Sitzverteilung: die noch nicht gemeldeten Bezirke werden vielfach zufällig
+ergänzt, daraus ergeben sich Quantile der Stimmenanteile, Siegwahrscheinlichkeiten (z. B. für eine OB-Stichwahl) und
+Quantile der Sitze (mit tools/sitzverteilung.py, Direktmandate je Ziehung aus den Wahlbezirken).
+
+Grundlage ist die Schätzung von tools/hochrechnung.py (Verhältnis zur Vorwahl je Schicht) für jeden offenen Bezirk.
+Je Ziehung kommen zwei Fehler dazu, beide aus den Abweichungen der gemeldeten Bezirke von der Schätzung ohne sie
+selbst (Anteile der Parteien und Faktor der gültigen Stimmen):
+    je Schicht das Mittel über so viele zufällig gezogene Abweichungen, wie in der Schicht gemeldet sind
+    je Bezirk eine zufällig gezogene Abweichung
+Offene Bezirke ohne Vorwahl bekommen das Ergebnis eines gezogenen gemeldeten Bezirks derselben Schicht. Räumliche
+Zusammenhänge über die Schichten hinaus sind nicht abgebildet, früh am Abend sind die Bereiche daher eher zu eng.
+
+Alle Ziehungen eines Blocks werden gemeinsam als Arrays (Ziehungen x offene Bezirke x Parteien) berechnet, die Summen
+je Wahlbezirk über np.add.reduceat; Python-Schleifen gibt es nur über die Blöcke.
+
+Als Skript: mit `anteil_gemeldet` wird ein zufälliger Teil der vorhandenen Ergebnisse als gemeldet behandelt und
+geprüft, ob das Endergebnis in den Bereichen liegt; ohne liest es die neueste Wahlergebnisse-Datei (wie
+hochrechnung.py) und schreibt <Wahlergebnisse>.unsicherheit.json.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+import hochrechnung
+import sitzverteilung
+from ergebnisse import WahlDaten
+from hochrechnung import Zeilenleser, neueste_ergebnisse, schichten, vorwahl_matrix
+from wahlconfig import read_owd_csv
+
+# (Ordner unter src/data, wahl-name)
+aktuell = ("duesseldorf-kommunal2020", "Oberbürgermeisterstichwahl NRW")
+vorwahl = ("duesseldorf-kommunal2020", "Oberbürgermeisterwahl NRW")
+# aktuell = ("hagen-kommunal2025", "Wahl der Vertretung der Gemeinde (Rat der Stadt Hagen)")
+# vorwahl = ("hagen-kommunal2020", "Ratswahl")
+ziehungen = 100000
+block = 2000  # Ziehungen je Block, begrenzt den Speicher
+quantile = (0.05, 0.5, 0.95)
+# Prüfung: dieser Anteil der vorhandenen Ergebnisse gilt als gemeldet, None: die neueste Datei wie gemeldet verwenden
+anteil_gemeldet: Optional[float] = 0.3
+seed = 0
+
+
+def _summen(werte: np.ndarray, zeile: np.ndarray, anzahl: int) -> np.ndarray:
+    '''Summen je Schicht (zeile je gemeldetem Bezirk), letzte Zeile: über alle Schichten'''
+    result = np.zeros((anzahl + 1, werte.shape[1]))
+    np.add.at(result, zeile, werte)
+    result[-1] = werte.sum(axis=0)
+    return result
+
+
+def _verhaeltnis(zaehler: np.ndarray, nenner: np.ndarray, gesamt: np.ndarray) -> np.ndarray:
+    '''zaehler / nenner wie in hochrechnung.py, ohne Vorwahl (nenner <= 0) das Verhältnis gesamt'''
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(nenner > 0, zaehler / nenner, gesamt)
+
+
+def _anteile(stimmen: np.ndarray) -> np.ndarray:
+    '''Bezirke x (Parteien, übrige, gültige) -> Anteile der Parteien und übrigen, Summe 1'''
+    summe = stimmen[..., :-1].sum(axis=-1, keepdims=True)
+    return stimmen[..., :-1] / np.maximum(summe, 1e-6)
+
+
+def ziehen(stimmen: np.ndarray, gemeldet: np.ndarray, vorwahl: np.ndarray, schicht: np.ndarray,
+           gruppe: Optional[np.ndarray], anzahl: int,
+           rng: np.random.Generator) -> Iterator[Tuple[np.ndarray, Optional[np.ndarray]]]:
+    '''
+    Je Block (Ziehungen x Spalten) Gesamtstimmen und mit gruppe (je Bezirk, -1: keine) zusätzlich
+    (Ziehungen x Gruppen x Spalten). stimmen, vorwahl: Bezirke x (Parteien, gültige Stimmen).
+    '''
+    mit_vorwahl = ~np.isnan(vorwahl).all(axis=1)
+    vorwahl = np.nan_to_num(vorwahl)
+    # Spalte für die übrigen gültigen Stimmen, damit die Anteile je Bezirk zusammen 1 ergeben
+    stimmen = np.insert(stimmen, -1, np.maximum(stimmen[:, -1] - stimmen[:, :-1].sum(axis=1), 0), axis=1)
+    vorwahl = np.insert(vorwahl, -1, np.maximum(vorwahl[:, -1] - vorwahl[:, :-1].sum(axis=1), 0), axis=1)
+    gem = np.flatnonzero(gemeldet)
+    quelle = gem[mit_vorwahl[gem] & (vorwahl[gem, -1] > 0)]
+    if not len(quelle):
+        raise ValueError("noch kein gemeldeter Bezirk mit Vorwahl")
+    offen = np.flatnonzero(~gemeldet & mit_vorwahl)
+    offen_ohne = np.flatnonzero(~gemeldet & ~mit_vorwahl)
+
+    # Spalten ohne Stimmen in der Vorwahl werden wie in hochrechnung.py auf die gültigen Stimmen bezogen
+    neu_partei = vorwahl[quelle].sum(axis=0) <= 0
+    basis = np.where(neu_partei, vorwahl[:, -1:], vorwahl).astype(np.float32)
+    stimmen = stimmen.astype(np.float32)
+
+    # Schätzung je Schicht wie in hochrechnung.py und Abweichung der gemeldeten Bezirke von der Schätzung ohne sie
+    # selbst (als einzige Meldung ihrer Schicht: über alle Schichten): Anteile und Faktor der gültigen Stimmen
+    besetzt, zeile = np.unique(schicht[quelle], return_inverse=True)
+    zaehler = _summen(stimmen[quelle], zeile, len(besetzt))
+    nenner = _summen(basis[quelle], zeile, len(besetzt))
+    gesamt = np.nan_to_num(_verhaeltnis(zaehler[-1], nenner[-1], 0.0))
+    mittel = _verhaeltnis(zaehler, nenner, gesamt)
+    zeile_ohne = np.where(np.bincount(zeile)[zeile] == 1, len(besetzt), zeile)
+    ohne = _verhaeltnis(zaehler[zeile_ohne] - stimmen[quelle], nenner[zeile_ohne] - basis[quelle], gesamt)
+    erwartet = basis[quelle] * ohne
+    rest_anteile = np.ascontiguousarray((_anteile(stimmen[quelle]) - _anteile(erwartet)).T, dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rest_faktor = np.nan_to_num(stimmen[quelle, -1] / erwartet[:, -1], nan=1.0, posinf=1.0).astype(np.float32)
+    # Mittel je Schicht (gewichtet mit den gültigen Stimmen der Vorwahl) als Matrix, letzte Spalte: alle Schichten
+    mittelung = np.zeros((len(quelle), len(besetzt) + 1), dtype=np.float32)
+    mittelung[np.arange(len(quelle)), zeile] = vorwahl[quelle, -1]
+    mittelung[:, -1] = vorwahl[quelle, -1]
+    mittelung /= mittelung.sum(axis=0)
+    # offene Bezirke: Schätzung ihrer Schicht, ohne Meldung in der Schicht über alle
+    position = np.full(int(schicht.max()) + 1, len(besetzt))
+    position[besetzt] = np.arange(len(besetzt))
+    position = position[schicht[offen]]
+    erwartet = basis[offen] * mittel[position]
+    # in der Schleife stehen die Spalten vorne (Spalten x Ziehungen x Bezirke), so sind Summen über die wenigen
+    # Spalten Additionen zusammenhängender Ebenen
+    anteile_offen = _anteile(erwartet).T[:, None, :].astype(np.float32)
+    gueltig_offen = erwartet[:, -1].astype(np.float32)
+    # offene Bezirke ohne Vorwahl: Bereich der gemeldeten Bezirke derselben Schicht (sonst alle), aus dem gezogen wird
+    gem_sortiert = gem[np.argsort(schicht[gem], kind="stable")]
+    groesse = np.bincount(schicht[gem], minlength=int(schicht.max()) + 1)[schicht[offen_ohne]]
+    von = np.where(groesse > 0, np.searchsorted(schicht[gem_sortiert], schicht[offen_ohne]), 0)
+    breite = np.where(groesse > 0, groesse, len(gem))
+
+    basis_summe = stimmen[gem].sum(axis=0, dtype=np.float64)
+    if gruppe is not None:
+        anzahl_gruppen = int(gruppe.max()) + 1
+        basis_gruppe = np.zeros((anzahl_gruppen, stimmen.shape[1]))
+        zugeordnet = gem[gruppe[gem] >= 0]
+        np.add.at(basis_gruppe, gruppe[zugeordnet], stimmen[zugeordnet])
+        # offene Bezirke nach Gruppe sortiert für reduceat
+        neu = np.concatenate([offen, offen_ohne])
+        reihenfolge = np.argsort(gruppe[neu], kind="stable")
+        # Bezirke ohne Gruppe (-1) stehen vorne und fallen weg
+        reihenfolge = reihenfolge[np.searchsorted(gruppe[neu][reihenfolge], 0):]
+        sortiert = gruppe[neu][reihenfolge]
+        grenzen = np.flatnonzero(np.r_[True, sortiert[1:] != sortiert[:-1]]) if len(sortiert) else sortiert
+        gruppen = sortiert[grenzen]
+
+    for start in range(0, anzahl, block):
+        n = min(block, anzahl - start)
+        # Fehler der Schätzung je Schicht: Mittel über zufällig gezogene Abweichungen, so viele wie gemeldet sind
+        j = rng.integers(0, len(quelle), (n, len(quelle)))
+        fehler_anteile = (rest_anteile[:, j] @ mittelung)[:, :, position]
+        fehler_faktor = (rest_faktor[j] @ mittelung)[:, position]
+        # dazu die Abweichung des Bezirks selbst, ebenfalls gezogen
+        k = rng.integers(0, len(quelle), (n, len(offen)))
+        anteile = anteile_offen + fehler_anteile
+        anteile += rest_anteile[:, k]
+        np.maximum(anteile, 0, out=anteile)
+        anteile /= np.maximum(anteile.sum(axis=0), 1e-6)
+        g = gueltig_offen * fehler_faktor * rest_faktor[k]
+        neu_stimmen = np.empty((stimmen.shape[1], n, len(offen) + len(offen_ohne)), dtype=np.float32)
+        neu_stimmen[:-1, :, :len(offen)] = anteile * g
+        neu_stimmen[-1, :, :len(offen)] = g
+        if len(offen_ohne):
+            k_ohne = gem_sortiert[von + (rng.random((n, len(offen_ohne))) * breite).astype(np.int64)]
+            neu_stimmen[:, :, len(offen):] = stimmen[k_ohne].transpose(2, 0, 1)
+        summe = basis_summe + neu_stimmen.sum(axis=2, dtype=np.float64).T
+        je_gruppe = None
+        if gruppe is not None:
+            je_gruppe = np.broadcast_to(basis_gruppe, (n,) + basis_gruppe.shape).copy()
+            if len(grenzen):
+                je_gruppe[:, gruppen] += np.add.reduceat(neu_stimmen[:, :, reihenfolge], grenzen,
+                                                         axis=2).transpose(1, 2, 0)
+            je_gruppe = np.delete(je_gruppe, -2, axis=2)
+        yield np.delete(summe, -2, axis=1), je_gruppe
+
+
+def direktmandate(je_gruppe: np.ndarray) -> np.ndarray:
+    '''(Ziehungen x Wahlbezirke x Parteien) -> gewonnene Wahlbezirke je Ziehung und Partei'''
+    sieger = np.argmax(je_gruppe, axis=2)
+    gewonnen = je_gruppe.max(axis=2) > 0
+    return ((sieger[..., None] == np.arange(je_gruppe.shape[2])) & gewonnen[..., None]).sum(axis=1)
+
+
+def bereiche(wahl: WahlDaten, leser: Zeilenleser, stimmen: np.ndarray, gemeldet: np.ndarray,
+             vor: WahlDaten) -> Dict[str, Any]:
+    '''Quantile der Anteile und Sitze, Siegwahrscheinlichkeiten'''
+    vorwahl_m = vorwahl_matrix(wahl, leser.parteien, vor)
+    gremium = sitzverteilung.gremien.get(wahl.name)
+    ergebnis = None
+    gruppe = None
+    if gremium is not None:
+        ergebnisse = sitzverteilung.ergebnisse(wahl, leser.feld, gremium)
+        if len(ergebnisse) == 1:
+            ergebnis = ergebnisse[0]
+            if gremium.direktmandate:
+                nummern = [row.get(gremium.kandidat_gebiet) or "" for row in wahl.gebiete]
+                index: Dict[str, int] = {}
+                gruppe = np.array([index.setdefault(nr, len(index)) if nr and not nr.startswith("???") else -1
+                                   for nr in nummern], dtype=np.int64)
+    spalten = [leser.parteien.index(p) for p in ergebnis.parteien] if ergebnis else []
+
+    rng = np.random.default_rng(seed)
+    anteile = []
+    sitze = []
+    for summe, je_gruppe in ziehen(stimmen, gemeldet, vorwahl_m, schichten(wahl), gruppe, ziehungen, rng):
+        anteile.append((summe[:, :-1] / summe[:, -1:] * 100).astype(np.float32))
+        if ergebnis is not None:
+            direkt = direktmandate(je_gruppe[:, :, spalten]) if je_gruppe is not None else None
+            sitze.append(sitzverteilung.verteilen(ergebnis, gremium, summe[:, spalten], direkt).astype(np.int16))
+    anteile = np.concatenate(anteile)
+    sieger = np.bincount(np.argmax(anteile, axis=1), minlength=anteile.shape[1]) / len(anteile)
+    result: Dict[str, Any] = {
+        "wahl": wahl.name,
+        "gemeldet": int(gemeldet.sum()),
+        "bezirke": len(gemeldet),
+        "ziehungen": len(anteile),
+        "quantile": list(quantile),
+        "parteien": leser.parteien,
+        "anteile": np.round(np.quantile(anteile, quantile, axis=0).T, 2).tolist(),
+        "sieg": np.round(sieger, 4).tolist(),
+    }
+    if sitze:
+        sitze = np.concatenate(sitze)
+        result["sitze"] = {
+            "parteien": ergebnis.parteien,
+            "quantile": np.quantile(sitze, quantile, axis=0).T.astype(int).tolist(),
+            "gesamt": np.quantile(sitze.sum(axis=1), quantile).astype(int).tolist(),
+        }
+    return result
+
+
+def _stimmen(wahl: WahlDaten, leser: Zeilenleser, path: str) -> Tuple[np.ndarray, np.ndarray]:
+    '''Stimmen je Bezirk und ob er gemeldet ist (Zeilen mit Nullen von api-to-owd.py zählen nicht)'''
+    stimmen = np.zeros((len(wahl.bezirke), len(leser.parteien) + 1))
+    gemeldet = np.zeros(len(wahl.bezirke), dtype=bool)
+    for row in read_owd_csv(path, wahl.name):
+        i = wahl.index.get((row["wahl-behoerde-gs"], row["bezirk-nr"]))
+        if i is not None and leser.gemeldet(row):
+            stimmen[i] = leser.stimmen(i, row)
+            gemeldet[i] = True
+    return stimmen, gemeldet
+
+
+def main() -> None:
+    wahl = hochrechnung._finden(*aktuell)
+    vor = hochrechnung._finden(*vorwahl)
+    leser = Zeilenleser(wahl, hochrechnung._feld(wahl))
+    if anteil_gemeldet is None:
+        stimmen, gemeldet = _stimmen(wahl, leser, neueste_ergebnisse(wahl))
+        ende = None
+    else:
+        stimmen, vorhanden = _stimmen(wahl, leser, wahl.pfad("ergebnisPath"))
+        rng = np.random.default_rng(seed)
+        gemeldet = vorhanden & (rng.random(len(vorhanden)) < anteil_gemeldet)
+        ende = stimmen.sum(axis=0)
+
+    start = perf_counter()
+    result = bereiche(wahl, leser, stimmen, gemeldet, vor)
+    dauer = perf_counter() - start
+    print(f"{wahl.termin['name']} / {wahl.name}: {result['gemeldet']} von {result['bezirke']} Bezirken gemeldet, "
+          f"{result['ziehungen']} Ziehungen in {dauer:.2f} s")
+    for p, (partei, bereich, sieg) in enumerate(zip(result["parteien"], result["anteile"], result["sieg"])):
+        if bereich[-1] < 1:
+            continue
+        zeile = f"    {partei}: {bereich[0]:.1f} - {bereich[-1]:.1f} %, Sieg {sieg * 100:.1f} %"
+        if ende is not None:
+            zeile += f", Endergebnis {ende[p] / ende[-1] * 100:.1f} %"
+        if "sitze" in result and partei in result["sitze"]["parteien"]:
+            s = result["sitze"]["quantile"][result["sitze"]["parteien"].index(partei)]
+            zeile += f", Sitze {s[0]} - {s[-1]}"
+        print(zeile)
+    if "sitze" in result:
+        print(f"    Sitze gesamt: {result['sitze']['gesamt'][0]} - {result['sitze']['gesamt'][-1]}")
+    if anteil_gemeldet is None:
+        outpath = f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.unsicherheit.json"
+        with open(outpath, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
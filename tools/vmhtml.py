@@ -0,0 +1,211 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Gezieltes Auslesen der HTML5-Seiten von votemanager, für tools/stbz.py.
+
+Statt die ganze Seite in einen BeautifulSoup-Baum zu übernehmen und ihn mehrmals mit soup.find(lambda ...) zu
+durchlaufen (dabei wird für jedes div noch einmal nach seinem card-header gesucht), läuft ein Tokenizer
+(html.parser aus der Standardbibliothek) einmal über den Text, merkt sich nur die cards und bricht ab, sobald alle
+gesuchten cards gefunden sind. Was danach kommt (Ergebnistabellen, Skripte), wird nicht mehr gelesen.
+
+Als Skript aufgerufen: Benchmark gegen das bisherige Vorgehen (BeautifulSoup mit html.parser) an Seiten von
+Stimmbezirken, entweder aus `dateien` oder die ersten `anzahl` Stimmbezirke der in tools/stbz.py eingestellten Seite.
+'''
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Benchmark: lokale Dateien (None: von der Seite in tools/stbz.py laden)
+dateien: Optional[List[str]] = None
+anzahl = 50
+wiederholungen = 5
+
+
+@dataclass
+class KartenLink:
+    '''erster Link einer card'''
+    header: str
+    text: str
+    title: Optional[str]
+    href: Optional[str]
+
+
+class _Fertig(Exception):
+    pass
+
+
+@dataclass
+class _Karte:
+    tiefe: int  # Index des card-div in _KartenParser.divs
+    header: List[str]
+    attrs: Optional[Dict[str, Optional[str]]] = None
+    text: Optional[List[str]] = None
+    link_offen: bool = False
+
+
+class _KartenParser(HTMLParser):
+    def __init__(self, gesucht: Callable[[str], bool], anzahl: int):
+        super().__init__()
+        self.gesucht = gesucht
+        self.anzahl = anzahl
+        self.result: List[KartenLink] = []
+        # je offenem div: "card", "header" oder ""
+        self.divs: List[str] = []
+        self.karten: List[_Karte] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "div":
+            klassen = (dict(attrs).get("class") or "").split()
+            rolle = "card" if "card" in klassen else "header" if "card-header" in klassen else ""
+            if rolle == "card":
+                self.karten.append(_Karte(len(self.divs), []))
+            self.divs.append(rolle)
+        elif tag == "a" and self.karten and self.karten[-1].attrs is None:
+            self.karten[-1].attrs = dict(attrs)
+            self.karten[-1].text = []
+            self.karten[-1].link_offen = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "a" and self.karten:
+            self.karten[-1].link_offen = False
+        elif tag == "div" and self.divs:
+            if self.divs.pop() == "card" and self.karten:
+                karte = self.karten.pop()
+                header = "".join(karte.header)
+                if karte.attrs is not None and self.gesucht(header):
+                    self.result.append(KartenLink(header, "".join(karte.text or []), karte.attrs.get("title"),
+                                                  karte.attrs.get("href")))
+                    if len(self.result) >= self.anzahl:
+                        raise _Fertig()
+
+    def handle_data(self, data: str) -> None:
+        if not self.karten:
+            return
+        karte = self.karten[-1]
+        if "header" in self.divs[karte.tiefe:]:
+            karte.header.append(data)
+        if karte.link_offen:
+            karte.text.append(data)
+
+
+def karten_links(html: str, gesucht: Callable[[str], bool], anzahl: int) -> List[KartenLink]:
+    '''erste Links der cards, deren card-header-Text gesucht() erfüllt; Abbruch nach anzahl Treffern'''
+    parser = _KartenParser(gesucht, anzahl)
+    try:
+        parser.feed(html)
+        parser.close()
+    except _Fertig:
+        pass
+    return parser.result
+
+
+class _TabellenParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.tabellen = 0
+        self.zeilen: List[Tuple[str, Optional[str]]] = []
+        self.in_tbody = False
+        self.zelle: Optional[List] = None  # [Textteile, href] der ersten Zelle der aktuellen Zeile
+        self.erste_zelle_fertig = False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "table":
+            self.tabellen += 1
+        elif tag == "tbody" and self.tabellen == 1:
+            self.in_tbody = True
+        elif not self.in_tbody:
+            return
+        elif tag == "tr":
+            self.erste_zelle_fertig = False
+        elif tag == "td" and not self.erste_zelle_fertig and self.zelle is None:
+            self.zelle = [[], None]
+        elif tag == "a" and self.zelle is not None and self.zelle[1] is None:
+            self.zelle[1] = dict(attrs).get("href")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "tbody":
+            self.in_tbody = False
+        elif tag == "td" and self.zelle is not None:
+            self.zeilen.append(("".join(self.zelle[0]), self.zelle[1]))
+            self.zelle = None
+            self.erste_zelle_fertig = True
+
+    def handle_data(self, data: str) -> None:
+        if self.zelle is not None:
+            self.zelle[0].append(data)
+
+
+def tabelle_erste_spalte(html: str) -> Tuple[int, List[Tuple[str, Optional[str]]]]:
+    '''(Anzahl Tabellen, [(Text, href des ersten Links)] der ersten Zelle jeder Zeile im tbody der ersten Tabelle)'''
+    parser = _TabellenParser()
+    parser.feed(html)
+    parser.close()
+    return parser.tabellen, parser.zeilen
+
+
+def _bisher(html: str, headers: List[str]) -> List[Tuple[str, str]]:
+    '''das bisherige Vorgehen der stbz-Skripte, als Vergleich'''
+    from bs4 import BeautifulSoup as BS
+    soup = BS(html, features="html.parser")
+    result = []
+    for header in headers:
+        a = soup.find(lambda x:
+                      x.name == 'div'
+                      and x.has_attr('class')
+                      and "card" in x['class']
+                      and (_h := x.find("div", class_="card-header"))
+                      and _h.text == header
+                      ).find('a')
+        result.append((a.text, a.get('href')))
+    return result
+
+
+def _seiten() -> Tuple[List[str], List[str]]:
+    '''(HTML der Seiten, exakte card-header) für den Benchmark'''
+    from urllib.request import urlopen
+
+    import stbz
+    headers = [k.header for k in stbz.seite.karten if not k.header.endswith("...")]
+    if dateien:
+        texte = []
+        for path in dateien:
+            with open(path, "r", encoding="utf-8") as f:
+                texte.append(f.read())
+        return texte, headers
+    with urlopen(stbz.seite.base_url + stbz.seite.stbz_path) as r:
+        _, zeilen = tabelle_erste_spalte(r.read().decode("utf-8"))
+    texte = []
+    for _, href in zeilen[:anzahl]:
+        with urlopen(stbz.seite.base_url + href) as r:
+            texte.append(r.read().decode("utf-8"))
+    return texte, headers
+
+
+def main() -> None:
+    texte, headers = _seiten()
+    zeiten: Dict[str, float] = {}
+
+    def _messen(name: str, f: Callable[[str], object]) -> None:
+        start = perf_counter()
+        for _ in range(wiederholungen):
+            for html in texte:
+                f(html)
+        zeiten[name] = (perf_counter() - start) / wiederholungen / len(texte) * 1000
+
+    _messen("Tokenizer", lambda html: karten_links(html, lambda h: h.strip() in headers, len(headers)))
+    try:
+        _messen("BeautifulSoup", lambda html: _bisher(html, headers))
+    except ImportError:
+        pass
+    groesse = sum(len(_) for _ in texte) // len(texte) // 1024
+    for name, ms in zeiten.items():
+        print(f"{name}: {ms:.2f} ms je Seite ({len(texte)} Seiten, je {groesse} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Liest die Wahltermin-Konfiguration der Webanwendung (src/js/config.js) für die Build-Skripte unter tools/.
+
+Es wird nur der Teil von JavaScript verstanden, der in config.js vorkommt: `let name: Typ = Ausdruck;` mit Objekt-
+und Array-Literalen, Strings, Zahlen, true/false/undefined/null, `new Map([...])` und Verweisen auf vorher definierte
+Variablen. Unbekannte Bezeichner (z. B. Ergebnis-Klassen) bleiben als Name (str) erhalten.
+'''
+
+from __future__ import annotations
+
+import os
+import re
+from csv import DictReader
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+configpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "js", "config.js")
+datapath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_token = re.compile(r'''
+    (?P<ws>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<str>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+  | (?P<num>-?\d+(?:\.\d+)?)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}\[\]().,:;=<>?|])
+''', re.VERBOSE | re.DOTALL)
+
+
+def _tokenize(src: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    while pos < len(src):
+        m = _token.match(src, pos)
+        if not m:
+            raise ValueError(f"config.js: unerwartetes Zeichen bei {src[pos:pos + 30]!r}")
+        pos = m.end()
+        if m.lastgroup != "ws":
+            tokens.append((m.lastgroup, m.group()))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, src: str):
+        self.tokens = _tokenize(src)
+        self.pos = 0
+        self.variables: Dict[str, Any] = {}
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("eof", "")
+
+    def next(self) -> Tuple[str, str]:
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def expect(self, value: str) -> None:
+        tok = self.next()
+        if tok[1] != value:
+            raise ValueError(f"config.js: {value!r} erwartet, {tok[1]!r} gefunden")
+
+    def statements(self) -> Dict[str, Any]:
+        while self.peek()[0] != "eof":
+            kind, value = self.next()
+            if value not in ("let", "var", "const"):
+                continue  # import, export usw.
+            name = self.next()[1]
+            # Typannotation überspringen
+            while self.peek()[1] not in ("=", ";"):
+                self.next()
+            if self.next()[1] == "=":
+                self.variables[name] = self.expression()
+        return self.variables
+
+    def expression(self) -> Any:
+        kind, value = self.next()
+        if kind == "str":
+            return re.sub(r"\\(.)", r"\1", value[1:-1])
+        if kind == "num":
+            return float(value) if "." in value else int(value)
+        if value == "{":
+            obj = {}
+            while self.peek()[1] != "}":
+                key = self.next()[1]
+                if key[0] in "\"'":
+                    key = key[1:-1]
+                self.expect(":")
+                obj[key] = self.expression()
+                if self.peek()[1] == ",":
+                    self.next()
+            self.next()
+            return obj
+        if value == "[":
+            arr = []
+            while self.peek()[1] != "]":
+                arr.append(self.expression())
+                if self.peek()[1] == ",":
+                    self.next()
+            self.next()
+            return arr
+        if value == "new":
+            cls = self.next()[1]
+            self.expect("(")
+            arg = self.expression() if self.peek()[1] != ")" else []
+            self.expect(")")
+            if cls != "Map":
+                raise ValueError(f"config.js: new {cls} wird nicht unterstützt")
+            return dict((k, v) for k, v in arg)
+        if value in ("true", "false"):
+            return value == "true"
+        if value in ("undefined", "null"):
+            return None
+        if kind == "name":
+            return self.variables.get(value, value)
+        raise ValueError(f"config.js: unerwartetes {value!r}")
+
+
+def load_config(path: str = configpath) -> Dict[str, Any]:
+    '''Alle Variablen aus config.js, darunter wahlenConfig.'''
+    with open(path, "r", encoding="utf-8") as f:
+        return _Parser(f.read()).statements()
+
+
+def wahltermine(path: str = configpath) -> List[Dict[str, Any]]:
+    return load_config(path)["wahlenConfig"]["wahltermine"]
+
+
+def termin_dir(termin: Dict[str, Any], base: str = datapath) -> str:
+    '''Verzeichnis der Daten eines Wahltermins (baseUrl ist relativ zu src/).'''
+    return os.path.normpath(os.path.join(base, termin["baseUrl"]))
+
+
+def iter_wahlen(path: str = configpath) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    '''(Wahltermin, Wahl) für alle konfigurierten Wahlen.'''
+    for termin in wahltermine(path):
+        for wahl in termin["wahlen"]:
+            yield termin, wahl
+
+
+def ebene_geojson(termin: Dict[str, Any], ebene: Dict[str, Any], key: str = "geoJson") -> Optional[str]:
+    '''Pfad der GeoJSON-Quelldatei einer Ebene, für kompiliertes TopoJSON (tools/geo/topologie.py) die Datei daneben.'''
+    if not ebene.get(key):
+        return None
+    path = os.path.normpath(os.path.join(termin_dir(termin), ebene[key]))
+    if path.endswith(".topojson"):
+        path = re.sub(r"(\.[\d.]+m)?\.topojson$", "", path) + ".geojson"
+        if not os.path.exists(path):
+            return None
+    return path
+
+
+def config_dateien(path: str = configpath) -> List[str]:
+    '''GeoJSON-Quelldateien aller Ebenen (geoJson und dissolvedGeoJson), jede einmal.'''
+    result: List[str] = []
+    for termin, wahl in iter_wahlen(path):
+        for ebene in wahl["ebenen"].values():
+            for key in ("geoJson", "dissolvedGeoJson"):
+                geojson = ebene_geojson(termin, ebene, key)
+                if geojson and geojson not in result:
+                    result.append(geojson)
+    return result
+
+
+def ergebnis_csv(path: str) -> str:
+    '''Offene-Wahldaten-csv zu einem ergebnisPath, für kompilierte Ergebnisse (.owdb, tools/owdbin.py) die csv daneben.'''
+    if path.endswith(".owdb"):
+        return os.path.splitext(path)[0] + ".csv"
+    return path
+
+
+def umrechnung_pfad(ziel_geojson: str, termin: Dict[str, Any], wahl_name: str) -> str:
+    '''Ausgabe von tools/geo/umrechnung.py: Wahl eines Wahltermins auf die Bezirke der Geometrie ziel_geojson.'''
+    ordner = os.path.basename(termin_dir(termin))
+    return f"{os.path.splitext(ziel_geojson)[0]}.{ordner}.{wahl_name.replace('/', '-')}.json"
+
+
+def js_str(value: Any) -> str:
+    '''wie toString() in JavaScript für die Werte, die in GeoJSON-Properties vorkommen (57101.0 -> "57101")'''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def koordinate(value: str, prefix: str = "") -> float:
+    '''Koordinate aus einer csv (Dezimalkomma), bei UTM ohne die vorangestellte Zonennummer prefix'''
+    value = value.replace(",", ".")
+    if prefix and value.startswith(prefix) and len(value.split(".")[0]) > 6 + len(prefix) - 1:
+        value = value[len(prefix):]
+    return float(value)
+
+
+def read_owd_csv(path: str, wahl_name: Optional[str] = None) -> List[Dict[str, str]]:
+    '''Offene-Wahldaten-csv einlesen, optional gefiltert auf eine wahl-name (wie in der Webanwendung).'''
+    with open(path, "r", encoding="utf-8-sig", newline="") as csvf:
+        rows = list(DictReader(csvf, delimiter=";"))
+    if wahl_name is not None:
+        rows = [row for row in rows if row.get("wahl-name") == wahl_name]
+    return rows
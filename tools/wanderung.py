@@ -0,0 +1,187 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+'''
+Wählerwanderung zwischen zwei Wahlen in denselben Bezirken, geschätzt durch ökologische Regression: gesucht ist die
+Übergangsmatrix B (Parteien der Vorwahl x Parteien der Wahl, Zeilen nicht negativ mit Summe 1), so dass für jeden
+Bezirk die Anteile der Wahl möglichst gut den mit B umgelegten Anteilen der Vorwahl entsprechen:
+    min Summe über Bezirke  gültige Stimmen * |Anteile - Anteile der Vorwahl @ B|^2
+
+Gelöst mit beschleunigtem projiziertem Gradientenverfahren (FISTA, Projektion jeder Zeile auf den Simplex), für viele
+Probleme gleichzeitig als Arrays Ziehungen x Parteien x Parteien. Die Vertrauensbereiche kommen aus einem Bootstrap
+über die Bezirke, die Ziehungen werden auf mehrere Prozesse verteilt.
+
+Die Vorwahl wird wie in tools/hochrechnung.py zugeordnet: bei unterschiedlichen Geometrien der Bezirke aus der Ausgabe
+von tools/geo/umrechnung.py (das vorher laufen muss), sonst über die bezirk-nr.
+Nichtwähler sind nicht abgebildet, weil die Briefwahlbezirke keine Wahlberechtigten haben; die Matrix beschreibt also
+nur, wohin die gültigen Stimmen der Vorwahl bei denen gegangen sind, die wieder gewählt haben. Wie jede ökologische
+Schätzung setzt sie voraus, dass die Wanderung in allen Bezirken ähnlich ist.
+
+Als Skript: je Paar in `paare` wird <Wahlergebnisse>.wanderung.<Ordner der Vorwahl>.json geschrieben.
+'''
+
+from __future__ import annotations
+
+import json
+import os
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+import hochrechnung
+from ergebnisse import WahlDaten
+from hochrechnung import vorwahl_matrix
+from wahlconfig import termin_dir
+
+# (Vorwahl, Wahl) als (Ordner unter src/data, wahl-name), dazu die Vorwahl auf den Bezirken der Wahl wie
+# hochrechnung.umgerechnet (True: Ausgabe von tools/geo/umrechnung.py, wenn sich die Geometrien unterscheiden)
+paare: List[Tuple[Tuple[str, str], Tuple[str, str], Union[bool, str]]] = [
+    (("hagen-eu2019", "Europawahl"), ("hagen-eu2024", "Europawahl"), True),
+    (("hagen-btw2021", "Wahl zum Deutschen Bundestag"), ("hagen-btw2025", "Wahl zum Deutschen Bundestag"), True),
+]
+# Parteien unter diesem Anteil (Prozent der gültigen Stimmen) werden zu "Sonstige" zusammengefasst
+mindestanteil = 3.0
+ziehungen = 1000  # Bootstrap
+quantile = (0.05, 0.95)
+iterationen = 5000
+toleranz = 1e-5  # größte Änderung eines Übergangsanteils je Iteration
+# None: alle Prozessoren
+prozesse: Optional[int] = None
+seed = 0
+
+SONSTIGE = "Sonstige"
+
+
+def zusammenfassen(parteien: List[str], stimmen: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    '''Parteien unter `mindestanteil` als letzte Spalte "Sonstige", stimmen: Bezirke x Parteien'''
+    summe = stimmen.sum(axis=0)
+    gross = summe / max(summe.sum(), 1) * 100 >= mindestanteil
+    if gross.all():
+        return parteien, stimmen
+    namen = [p for p, g in zip(parteien, gross) if g] + [SONSTIGE]
+    return namen, np.hstack([stimmen[:, gross], stimmen[:, ~gross].sum(axis=1, keepdims=True)])
+
+
+def simplex(v: np.ndarray) -> np.ndarray:
+    '''Projektion jeder Zeile (letzte Achse) auf {x >= 0, Summe x = 1}'''
+    u = -np.sort(-v, axis=-1)
+    kum = np.cumsum(u, axis=-1) - 1
+    anzahl = np.sum(u - kum / np.arange(1, v.shape[-1] + 1) > 0, axis=-1, keepdims=True)
+    return np.maximum(v - np.take_along_axis(kum, anzahl - 1, axis=-1) / anzahl, 0)
+
+
+def schaetzen(x: np.ndarray, y: np.ndarray, gewichte: np.ndarray,
+              start: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int]:
+    '''
+    Übergangsmatrizen (Ziehungen x Parteien der Vorwahl x Parteien der Wahl) und Zahl der Iterationen.
+    x, y: Anteile je Bezirk (Bezirke x Parteien), gewichte: Ziehungen x Bezirke, start: Matrix zum Anfangen
+    (None: jede Partei der Vorwahl verteilt sich wie das Gesamtergebnis)
+    '''
+    gram = np.einsum("rn,ni,nj->rij", gewichte, x, x)
+    rechts = np.einsum("rn,ni,nk->rik", gewichte, x, y)
+    # Schrittweite aus dem größten Eigenwert je Ziehung
+    schritt = 1 / np.maximum(np.linalg.eigvalsh(gram)[:, -1], 1e-12)[:, None, None]
+    b = np.broadcast_to(y.mean(axis=0) if start is None else start, rechts.shape).copy()
+    z = b
+    t = np.ones((len(b), 1, 1))
+    for n in range(1, iterationen + 1):
+        neu = simplex(z - schritt * (gram @ z - rechts))
+        # Neustart des Impulses, wo er gegen den Gradienten läuft (O'Donoghue/Candès)
+        t = np.where(np.sum((z - neu) * (neu - b), axis=(1, 2), keepdims=True) > 0, 1.0, t)
+        t_neu = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        z = neu + (t - 1) / t_neu * (neu - b)
+        aenderung = np.abs(neu - b).max()
+        b, t = neu, t_neu
+        if aenderung < toleranz:
+            break
+    return b, n
+
+
+_daten: Tuple[np.ndarray, ...] = ()
+
+
+def _init(x: np.ndarray, y: np.ndarray, gewicht: np.ndarray, start: np.ndarray) -> None:
+    global _daten
+    _daten = (x, y, gewicht, start)
+
+
+def _bootstrap(task: Tuple[int, int]) -> np.ndarray:
+    '''task: (seed, Anzahl Ziehungen), Bezirke mit Zurücklegen gezogen'''
+    x, y, gewicht, start = _daten
+    rng = np.random.default_rng(task[0])
+    anzahl = rng.multinomial(len(x), np.full(len(x), 1 / len(x)), size=task[1])
+    return schaetzen(x, y, anzahl * gewicht, start)[0]
+
+
+def daten(vor: WahlDaten, wahl: WahlDaten, umgerechnet: Union[bool, str]) -> Dict[str, Any]:
+    '''Anteile je Bezirk mit Ergebnis in beiden Wahlen, zusammengefasste Parteien und gültige Stimmen'''
+    vor_parteien, _ = vor.stimmen(hochrechnung._feld(vor))
+    vorher = vorwahl_matrix(wahl, vor_parteien, vor, umgerechnet)
+    feld = hochrechnung._feld(wahl)
+    parteien, nachher = wahl.stimmen(feld)
+    gueltig = np.nan_to_num(wahl.gueltig(feld))
+    bezirke = ~np.isnan(vorher).all(axis=1) & wahl.vorhanden & (gueltig > 0) & (np.nan_to_num(vorher[:, -1]) > 0)
+    vor_namen, vorher = zusammenfassen(vor_parteien, np.nan_to_num(vorher[bezirke, :-1]))
+    namen, nachher = zusammenfassen(parteien, np.nan_to_num(nachher[bezirke]))
+    return {
+        "vorwahl_parteien": vor_namen,
+        "parteien": namen,
+        "x": vorher / np.maximum(vorher.sum(axis=1, keepdims=True), 1),
+        "y": nachher / np.maximum(nachher.sum(axis=1, keepdims=True), 1),
+        "gewicht": gueltig[bezirke],
+        "vorwahl_stimmen": vorher.sum(axis=0),
+    }
+
+
+def wanderung(d: Dict[str, Any]) -> Dict[str, Any]:
+    x, y, gewicht = d["x"], d["y"], d["gewicht"]
+    b, schritte = schaetzen(x, y, gewicht[None, :])
+    b = b[0]
+    anzahl = prozesse or os.cpu_count() or 1
+    teile = [ziehungen // anzahl] * anzahl
+    teile[0] += ziehungen - sum(teile)
+    seeds = np.random.SeedSequence(seed).generate_state(len(teile))
+    with Pool(prozesse, initializer=_init, initargs=(x, y, gewicht, b)) as pool:
+        bootstrap = np.concatenate(pool.map(_bootstrap, [(int(s), n) for s, n in zip(seeds, teile) if n > 0]))
+    bereich = np.quantile(bootstrap, quantile, axis=0)
+    rest = y - x @ b
+    gesamt = y - np.average(y, axis=0, weights=gewicht)
+    return {
+        "vorwahl_parteien": d["vorwahl_parteien"],
+        "parteien": d["parteien"],
+        "bezirke": len(x),
+        "iterationen": schritte,
+        "bestimmtheit": round(float(1 - (gewicht @ (rest ** 2).sum(axis=1)) / (gewicht @ (gesamt ** 2).sum(axis=1))),
+                              4),
+        "anteile": np.round(b * 100, 2).tolist(),
+        "quantile": list(quantile),
+        "bereiche": np.round(bereich.transpose(1, 2, 0) * 100, 2).tolist(),
+        "stimmen": np.round(b * d["vorwahl_stimmen"][:, None]).astype(int).tolist(),
+    }
+
+
+def main() -> None:
+    for (vor_ordner, vor_name), (ordner, name), umgerechnet in paare:
+        start = perf_counter()
+        vor = hochrechnung._finden(vor_ordner, vor_name)
+        wahl = hochrechnung._finden(ordner, name)
+        result = wanderung(daten(vor, wahl, umgerechnet))
+        result["vorwahl"] = {"wahltermin": vor.termin["name"], "wahl": vor.name}
+        result["wahl"] = {"wahltermin": wahl.termin["name"], "wahl": wahl.name}
+        print(f"{vor.termin['name']} -> {wahl.termin['name']}: {result['bezirke']} Bezirke, "
+              f"R² {result['bestimmtheit']:.3f}, {result['iterationen']} Iterationen, {ziehungen} Ziehungen, "
+              f"{perf_counter() - start:.2f} s")
+        breite = max(len(_) for _ in result["vorwahl_parteien"])
+        print(" " * (breite + 3) + " ".join(f"{p[:8]:>8}" for p in result["parteien"]))
+        for partei, zeile in zip(result["vorwahl_parteien"], result["anteile"]):
+            print(f"    {partei:<{breite}}" + " ".join(f"{_:8.1f}" for _ in zeile))
+        ordner_vorwahl = os.path.basename(termin_dir(vor.termin))
+        outpath = f"{os.path.splitext(wahl.pfad('ergebnisPath'))[0]}.wanderung.{ordner_vorwahl}.json"
+        with open(outpath, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()